@@ -0,0 +1,139 @@
+import contextlib
+import threading
+import pyaudio
+
+from metrics import METRICS
+
+class AudioDevice:
+    def __init__(self, max_idle=2):
+        """
+        Owns the process-wide PortAudio session and a pool of warm output streams.
+        PortAudio is initialized on first use, once, instead of by every
+        microphone, audio processor and speaker. Output streams are kept open
+        between plays (stopped, not closed) so playback skips the open latency.
+
+        Parameters:
+        - max_idle: Idle output streams kept per (format, channels, rate).
+        """
+        self.max_idle = max_idle
+        self._pa = None
+        self.idle = {}
+        self.stream_keys = {}
+        # Output streams handed out and not yet released.
+        self.in_use = set()
+        self.lock = threading.Lock()
+        self.released = threading.Condition(self.lock)
+
+    @property
+    def pa(self):
+        """
+        The shared pyaudio.PyAudio instance.
+        """
+        with self.lock:
+            if self._pa is None:
+                with METRICS.timer("audio_init_seconds", "PortAudio initialization time"):
+                    self._pa = pyaudio.PyAudio()
+            return self._pa
+
+    def open(self, **kwargs):
+        """
+        Open a stream that the caller closes itself (e.g. microphone input).
+        """
+        return self.pa.open(**kwargs)
+
+    def acquire_output(self, format, channels, rate):
+        """
+        A started output stream, taken from the pool when one is idle.
+        Give it back with release_output().
+        """
+        key = (format, channels, rate)
+        with self.lock:
+            streams = self.idle.get(key)
+            stream = streams.pop() if streams else None
+            if stream is not None:
+                self.in_use.add(stream)
+        if stream is not None:
+            stream.start_stream()
+            METRICS.counter("audio_streams_total", "Output streams handed out", source="pool").inc()
+            return stream
+        with METRICS.timer("audio_stream_open_seconds", "Output stream open time"):
+            stream = self.pa.open(format=format, channels=channels, rate=rate, output=True)
+        METRICS.counter("audio_streams_total", "Output streams handed out", source="open").inc()
+        with self.lock:
+            self.stream_keys[stream] = key
+            self.in_use.add(stream)
+        return stream
+
+    def release_output(self, stream):
+        """
+        Return a stream from acquire_output(); it is stopped (remaining audio
+        is played out) and kept for reuse, or closed if the pool is full.
+        Streams that terminate() has already closed are left alone.
+        """
+        with self.lock:
+            if stream not in self.in_use:
+                return
+        try:
+            stream.stop_stream()
+        except OSError as e:
+            print(f"Failed to stop the output stream: {e}")
+        with self.lock:
+            if stream not in self.in_use:
+                return
+            self.in_use.discard(stream)
+            self.released.notify_all()
+            key = self.stream_keys.get(stream)
+            if key is not None and len(self.idle.setdefault(key, [])) < self.max_idle:
+                self.idle[key].append(stream)
+                return
+            self.stream_keys.pop(stream, None)
+            # Closed under the lock, so terminate() cannot end PortAudio first.
+            try:
+                stream.close()
+            except OSError as e:
+                print(f"Failed to close the output stream: {e}")
+
+    def warm(self, format, channels, rate):
+        """
+        Open an output stream ahead of the first play, if there is an output device.
+        """
+        try:
+            self.release_output(self.acquire_output(format, channels, rate))
+        except OSError as e:
+            print(f"No audio output stream available: {e}")
+
+    @contextlib.contextmanager
+    def output(self, format, channels, rate):
+        """
+        `with AUDIO.output(format, channels, rate) as stream: stream.write(...)`.
+        """
+        stream = self.acquire_output(format, channels, rate)
+        try:
+            yield stream
+        finally:
+            self.release_output(stream)
+
+    def terminate(self, timeout=2.0):
+        """
+        Close the pooled streams and PortAudio. A later use starts a new session.
+        Streams still in use get `timeout` seconds to be released, then they are
+        closed as well, always before PortAudio itself.
+        """
+        with self.lock:
+            self.released.wait_for(lambda: not self.in_use, timeout)
+            streams = [stream for pool in self.idle.values() for stream in pool] + list(self.in_use)
+            self.idle.clear()
+            self.in_use.clear()
+            self.stream_keys.clear()
+            pa, self._pa = self._pa, None
+        for stream in streams:
+            try:
+                stream.close()
+            except OSError as e:
+                print(f"Failed to close the output stream: {e}")
+        if pa is not None:
+            pa.terminate()
+
+
+# Process-wide audio device shared by all components.
+AUDIO = AudioDevice()
@@ -0,0 +1,368 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+import numpy as np
+import pyaudio
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from homespeaker import HomeSpeaker
+from mic.recognizers import StubBackend
+from mic.source import ArraySource, WavFileSource
+from speaker.scheduler import shared_scheduler
+from speaker.speechcache import SpeechCache
+from speaker.tts import TTSWorker
+
+STAGES = ["vad_close", "stt", "queue", "intent", "llm", "tts_first_byte", "total"]
+
+
+class DelayedStubBackend(StubBackend):
+    """
+    Stub recognizer that takes a fixed time per utterance, like a real engine.
+    """
+    def __init__(self, delay=0.0, **options):
+        super().__init__(**options)
+        self.delay = delay
+
+    def transcribe(self, audio):
+        time.sleep(self.delay)
+        return super().transcribe(audio)
+
+
+class StubGPT:
+    """
+    Stand-in for GPTClient that answers after a fixed delay and records its calls.
+    """
+    def __init__(self, delay=0.0, answer="This is a benchmark answer."):
+        self.delay = delay
+        self.answer = answer
+        self.calls = []
+
+    def ask(self, question, *args, stream=False, **kwargs):
+        started = time.time()
+        time.sleep(self.delay)
+        # For streamed answers the delay is the time to the first token.
+        self.calls.append((started, time.time()))
+        if stream:
+            words = self.answer.split(" ")
+            return iter([words[0]] + [" " + word for word in words[1:]])
+        return self.answer
+
+    async def ask_async(self, question, *args, stream=False, **kwargs):
+        started = time.time()
+        await asyncio.sleep(self.delay)
+        self.calls.append((started, time.time()))
+        if stream:
+            words = self.answer.split(" ")
+            return iter([words[0]] + [" " + word for word in words[1:]])
+        return self.answer
+
+
+class StubEngine:
+    """
+    Stand-in for a pyttsx3 engine: speech starts `delay` seconds after
+    runAndWait() and lasts `duration` seconds. on_audio() is called when the
+    first audio of an utterance would be heard.
+    """
+    def __init__(self, delay=0.1, duration=0.3, on_audio=None):
+        self.delay = delay
+        self.duration = duration
+        self.on_audio = on_audio
+        self.callbacks = {}
+        self.pending = []
+        self.stopped = threading.Event()
+
+    def setProperty(self, name, value):
+        pass
+
+    def getProperty(self, name):
+        return [] if name == "voices" else None
+
+    def connect(self, name, callback):
+        self.callbacks.setdefault(name, []).append(callback)
+
+    def say(self, text):
+        self.pending.append((text, None))
+
+    def save_to_file(self, text, path):
+        self.pending.append((text, path))
+
+    def runAndWait(self):
+        self.stopped.clear()
+        pending, self.pending = self.pending, []
+        for text, path in pending:
+            if self.stopped.wait(self.delay):
+                return
+            if path is not None:
+                # A short silent clip, like a rendered phrase.
+                with wave.open(path, "wb") as wav:
+                    wav.setnchannels(1)
+                    wav.setsampwidth(2)
+                    wav.setframerate(16000)
+                    wav.writeframes(bytes(3200))
+                continue
+            for callback in self.callbacks.get("started-utterance", []):
+                callback(text)
+            if self.on_audio is not None:
+                self.on_audio()
+            if self.stopped.wait(self.duration):
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+class StubYouTube:
+    def play_video(self, query, enqueue=False):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def close_video(self):
+        pass
+
+
+class StubCalendar:
+    def stop_all(self):
+        pass
+
+
+class BenchSpeaker(HomeSpeaker):
+    def __init__(self, *args, **kwargs):
+        """
+        HomeSpeaker recording when each command reaches the intent dispatch
+        and when its first audio is heard. Speech goes through the real
+        playback scheduler and TTS worker; only the engine is a StubEngine.
+        """
+        self.records = []
+        self.current = None
+        self.lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def get_audio(self, block=True, timeout=None):
+        utterance = super().get_audio(block=block, timeout=timeout)
+        if utterance is not None:
+            self.current = {"utterance": utterance}
+        return utterance
+
+    def analysis_command(self, command_text):
+        record = self.current
+        record["dispatch"] = time.time()
+        calls = len(self.chatgpt.calls)
+
+        def finished(future=None):
+            if len(self.chatgpt.calls) > calls:
+                record["llm_start"], record["llm_end"] = self.chatgpt.calls[calls]
+            with self.lock:
+                self.records.append(record)
+
+        future = super().analysis_command(command_text)
+        if future is None:
+            finished()
+        else:
+            future.add_done_callback(finished)
+        return future
+
+    def on_audio(self):
+        record = self.current
+        if record is not None and "tts" not in record:
+            record["tts"] = time.time()
+
+
+def synthetic_commands(rate, count, speech=1.2, gap=2.5, noise=100, seed=0):
+    """
+    Speech-like tone bursts separated by quiet background noise.
+
+    Returns:
+      tuple: (int16 samples, list of sample positions where each burst ends)
+    """
+    rng = np.random.default_rng(seed)
+    parts = [rng.normal(0, noise, int(rate * gap))]
+    speech_ends = []
+    position = len(parts[0])
+    for index in range(count):
+        t = np.arange(int(rate * speech)) / rate
+        pitch = 140 + 20 * index % 80
+        burst = 6000 * np.sin(2 * np.pi * pitch * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+        burst += rng.normal(0, noise, len(burst))
+        position += len(burst)
+        speech_ends.append(position)
+        quiet = rng.normal(0, noise, int(rate * gap))
+        parts.extend((burst, quiet))
+        position += len(quiet)
+    samples = np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+    return samples, speech_ends
+
+
+def percentiles(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"n": len(values), "mean": round(float(np.mean(values)), 4), "p50": round(float(p50), 4),
+            "p95": round(float(p95), 4), "p99": round(float(p99), 4)}
+
+
+def stage_times(record, source, speech_ends, silence_samples):
+    """
+    Per-stage latencies (seconds) of one command.
+    """
+    utterance = record["utterance"]
+    ends = [end for end in speech_ends if utterance.audio.start < end <= utterance.audio.end]
+    speech_end = ends[-1] if ends else max(utterance.audio.start, utterance.audio.end - silence_samples)
+    spoken = source.wall_time(speech_end - 1)
+    llm_start = record.get("llm_start")
+    llm_end = record.get("llm_end")
+    tts = record.get("tts")
+
+    def between(start, end):
+        return end - start if start is not None and end is not None else None
+
+    return {
+        "vad_close": between(spoken, utterance.captured_at),
+        "stt": between(utterance.captured_at, utterance.recognized_at),
+        "queue": between(utterance.recognized_at, record.get("dispatch")),
+        "intent": between(record.get("dispatch"), llm_start),
+        "llm": between(llm_start, llm_end),
+        "tts_first_byte": between(llm_end, tts),
+        "total": between(spoken, tts),
+    }
+
+
+def usage():
+    if resource is not None:
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return ru.ru_utime + ru.ru_stime, ru.ru_maxrss / scale
+    return time.process_time(), None
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, cwd=os.path.dirname(__file__)).stdout.decode().strip()
+    except OSError:
+        return None
+
+
+def run_benchmark(commands=20, wav=None, speed=1.0, stt_delay=0.3, llm_delay=0.8, tts_delay=0.1,
+                  rate=16000, transcript="hey gpt what is the weather today"):
+    """
+    Drive HomeSpeaker's command path end to end with stubbed services and
+    return the report (see main()).
+    """
+    if wav:
+        source = WavFileSource(wav, speed=speed)
+        speech_ends = []
+    else:
+        samples, speech_ends = synthetic_commands(rate, commands)
+        source = ArraySource(samples, rate, speed=speed)
+    backend = DelayedStubBackend(delay=stt_delay, default=transcript)
+    chatgpt = StubGPT(delay=llm_delay)
+    engine = StubEngine(delay=tts_delay)
+    tts = TTSWorker(engine_factory=lambda: engine)
+    # Set up the shared scheduler before HomeSpeaker does, with the stub engine and no disk cache.
+    shared_scheduler(chunk=1024, format=pyaudio.paInt16, tts=tts, speech_cache=SpeechCache(worker=tts, directory=""))
+
+    cpu_before, _ = usage()
+    started = time.time()
+    speaker = BenchSpeaker(source=source, recognizer_backend=backend, yt=StubYouTube(),
+                           chatgpt=chatgpt, calendar=StubCalendar())
+    engine.on_audio = speaker.on_audio
+    source.wait()
+    # Let the last command finish its way through the pipeline.
+    deadline = time.time() + 2 * (stt_delay + llm_delay) + 5
+    while time.time() < deadline and (speaker.recognition.pending() or not speaker.audio_queue.empty()
+                                      or speaker.pending_commands):
+        time.sleep(0.05)
+    time.sleep(0.2)
+    elapsed = time.time() - started
+    cpu_after, max_rss = usage()
+    speaker.stop()
+
+    silence_samples = int(speaker.silence_duration * speaker.rate) * speaker.channels
+    per_stage = {stage: [] for stage in STAGES}
+    for record in speaker.records:
+        for stage, value in stage_times(record, source, speech_ends, silence_samples).items():
+            per_stage[stage].append(value)
+    audio_seconds = len(source.samples) / source.channels / source.rate
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {"source": os.path.basename(wav) if wav else "synthetic", "speed": speed,
+                   "stt_delay": stt_delay, "llm_delay": llm_delay, "tts_delay": tts_delay,
+                   "rate": source.rate},
+        "commands": len(speaker.records),
+        "stages": {stage: percentiles(values) for stage, values in per_stage.items()},
+        "resources": {
+            "wall_seconds": round(elapsed, 3),
+            "audio_seconds": round(audio_seconds, 3),
+            "cpu_seconds": round(cpu_after - cpu_before, 3),
+            "cpu_percent": round(100.0 * (cpu_after - cpu_before) / elapsed, 1) if elapsed else None,
+            "max_rss_mb": round(max_rss, 1) if max_rss is not None else None,
+        },
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"\nCommands: {report['commands']}  (revision {report['revision']})")
+    print(f"{'stage':<16}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for stage in STAGES:
+        stats = report["stages"].get(stage)
+        if not stats:
+            continue
+        line = f"{stage:<16}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}"
+        old = (baseline or {}).get("stages", {}).get(stage)
+        if old:
+            line += f"   p50 {stats['p50'] - old['p50']:+.3f}  p95 {stats['p95'] - old['p95']:+.3f}"
+        print(line)
+    res = report["resources"]
+    print(f"CPU {res['cpu_seconds']}s ({res['cpu_percent']}%), max RSS {res['max_rss_mb']} MB, "
+          f"{res['audio_seconds']}s of audio in {res['wall_seconds']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark of the voice command "
+                                                 "pipeline (capture -> STT -> intent -> LLM -> TTS) "
+                                                 "with stubbed services.")
+    parser.add_argument("--commands", type=int, default=20, help="Number of synthetic commands.")
+    parser.add_argument("--wav", help="Use a recording instead of synthetic audio.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (1.0 = real time).")
+    parser.add_argument("--stt-delay", type=float, default=0.3, help="Simulated recognition time (s).")
+    parser.add_argument("--llm-delay", type=float, default=0.8, help="Simulated GPT response time (s).")
+    parser.add_argument("--tts-delay", type=float, default=0.1, help="Simulated time to first speech (s).")
+    parser.add_argument("--json", help="Write the report to this file.")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against.")
+    args = parser.parse_args()
+
+    report = run_benchmark(commands=args.commands, wav=args.wav, speed=args.speed,
+                           stt_delay=args.stt_delay, llm_delay=args.llm_delay, tts_delay=args.tts_delay)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from mic.smartmic import SmartMic
+from mic.source import WavFileSource
+
+class ReplayMic(SmartMic):
+    def __init__(self, *args, **kwargs):
+        """
+        SmartMic that keeps every recognized utterance, whether or not it passed
+        the wake-up word check, so segmentation can be reported.
+        """
+        self.recognized = []
+        super().__init__(*args, **kwargs)
+
+    def _on_recognized(self, utterance, result):
+        self.recognized.append(utterance)
+        super()._on_recognized(utterance, result)
+
+    def wait_idle(self, settle=0.05, timeout=60):
+        """
+        Wait until the source is exhausted and every segment has been recognized.
+        """
+        deadline = time.time() + timeout
+        self.source.wait(timeout)
+        idle_checks = 0
+        while idle_checks < 2 and time.time() < deadline:
+            time.sleep(settle)
+            if self.ring.available() == 0 and self.recognition.pending() == 0:
+                idle_checks += 1
+            else:
+                idle_checks = 0
+
+
+def replay_file(path, speed=0.0, chunk=1024, **mic_options):
+    """
+    Run one WAV recording through SmartMic and return its report.
+    """
+    source = WavFileSource(path, chunk=chunk, speed=speed)
+    started = time.time()
+    mic = ReplayMic(chunk=chunk, source=source, **mic_options)
+    mic.wait_idle()
+    elapsed = time.time() - started
+    mic.stop()
+    queued = set()
+    while True:
+        utterance = mic.get_audio(block=False)
+        if utterance is None:
+            break
+        queued.add(id(utterance))
+
+    utterances = []
+    for utterance in mic.recognized:
+        # Wall time at which the last sample of the utterance was delivered.
+        spoken_end = source.wall_time(utterance.audio.end - 1)
+        utterances.append({
+            "start": round(utterance.start_time, 3),
+            "end": round(utterance.end_time, 3),
+            "duration": round(utterance.duration, 3),
+            "text": utterance.text,
+            "confidence": utterance.confidence,
+            "wake_word": utterance.wake_word,
+            "queued": id(utterance) in queued,
+            "segmentation_latency": round(utterance.captured_at - spoken_end, 4) if spoken_end else None,
+            "recognition_latency": (round(utterance.recognized_at - spoken_end, 4)
+                                    if spoken_end and utterance.recognized_at else None),
+        })
+    audio_seconds = len(source.samples) / source.channels / source.rate
+    return {
+        "file": source.name,
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(elapsed, 3),
+        "realtime_factor": round(audio_seconds / elapsed, 2) if elapsed else None,
+        "dropped": mic.recognition.dropped,
+        "utterances": utterances,
+    }
+
+
+def print_report(report):
+    print(f"\n{report['file']}: {report['audio_seconds']}s of audio in {report['wall_seconds']}s "
+          f"({report['realtime_factor']}x real time), {len(report['utterances'])} utterances")
+    for item in report["utterances"]:
+        flag = "*" if item["queued"] else " "
+        print(f" {flag} {item['start']:7.2f}-{item['end']:7.2f}s  seg {item['segmentation_latency']}s  "
+              f"stt {item['recognition_latency']}s  {item['text']!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay WAV recordings through SmartMic and report "
+                                                 "segmentation, wake-up word detection and latency.")
+    parser.add_argument("recordings", help="A WAV file or a directory of WAV files.")
+    parser.add_argument("--backend", default="stub", help="Speech recognition backend (default: stub).")
+    parser.add_argument("--model", help="Model path/name for the vosk or whispercpp backend.")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Replay speed, 1.0 is real time; 0 (default) is as fast as possible.")
+    parser.add_argument("--wake-templates", help="Directory of wake-up word recordings for the keyword spotter.")
+    parser.add_argument("--json", help="Write the full report to this file.")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.recordings):
+        paths = sorted(glob.glob(os.path.join(args.recordings, "*.wav")))
+    else:
+        paths = [args.recordings]
+    options = {}
+    if args.model:
+        options["model_path" if args.backend == "vosk" else "model"] = args.model
+
+    reports = []
+    for path in paths:
+        report = replay_file(path, speed=args.speed, recognizer_backend=args.backend,
+                             recognizer_options=options, wake_templates=args.wake_templates)
+        print_report(report)
+        reports.append(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,10 @@ import threading
 from icalendar import Calendar, Event, Alarm
 import sys
 import os
-# Add the 'src' directory to the Python module search path
+# Add the repository root and the 'src' directory to the Python module search path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.speaker.speaker import Speaker
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from speaker.speaker import Speaker, ALERT
 
 class MyCalendar(Speaker):
     def __init__(self):
@@ -92,7 +93,8 @@ class MyCalendar(Speaker):
         #print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] Starting event '{summary}' - {description}")
         while count < 20 and not self.stop_event.is_set():
             print(f"[Reminder {count+1}: {datetime.datetime.now().strftime('%H:%M:%S')}] Event '{summary}' - {description}")
-            self.read_event_detail(f"Reminder {count+1}:  {summary}. {description}")
+            # The spoken text is the same every time, so it is played from the speech cache.
+            self.read_event_detail(f"Reminder:  {summary}. {description}")
             count += 1
             # Sleep in one-second increments to check the stop flag.
             for _ in range(15):
@@ -175,7 +177,8 @@ class MyCalendar(Speaker):
         """
         # Use a text-to-speech engine to speak the event details.
         print(f"Speaking event: {event_text}")
-        self.play_text(event_text) 
+        # Reminders preempt answers; the answer resumes after the reminder.
+        self.play_text(event_text, cache=True, priority=ALERT)
         # Add code here to speak the event text.
 
     def add_default_events(self):
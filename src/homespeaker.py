@@ -1,16 +1,30 @@
+import asyncio
+import concurrent.futures
+import os
+import re
 import threading
 import time
 
 from mic.smartmic import SmartMic
-from speaker.speaker import Speaker
+from speaker.speaker import Speaker, ANSWER
+from speaker.tts import BACKGROUND
 from service.youtube import YouTube
 from service.chatgpt import GPTClient
 from service.smartnews import SmartNews
+from service.newsprefetch import NewsPrefetcher
 from cald.smartcal import MyCalendar
+from metrics import METRICS
+from audiodevice import AUDIO
+
+# Seconds a command may take before it is abandoned, by intent.
+COMMAND_TIMEOUTS = {"play": 30.0, "news": 60.0, "gpt": 45.0}
 
 class HomeSpeaker(SmartMic, Speaker):
     def __init__(self, chunk=1024, format=None, channels=1, rate=44100,
-                 threshold=500, silence_duration=1.0, wake_words=None):
+                 threshold=500, silence_duration=1.0, wake_words=None,
+                 recognizer_backend=None, recognizer_options=None, wake_templates=None,
+                 source=None, yt=None, chatgpt=None, calendar=None, news=None, command_timeouts=None,
+                 executor_workers=4, news_topics=None, prerender_news=False):
         """
         HomeSpeaker automatically runs SmartMic in the background.
         It monitors for valid audio (i.e. commands following a wake-up word)
@@ -19,18 +33,58 @@ class HomeSpeaker(SmartMic, Speaker):
         Parameters:
         - chunk, channels, rate, threshold, silence_duration: Audio parameters.
         - wake_words: List of wake-up words.
+        - recognizer_backend, recognizer_options: Speech recognition engine (see AudioProc).
+        - wake_templates: Directory of wake-up word recordings for the keyword spotter (see SmartMic).
+        - source: Optional AudioSource replacing the live microphone (see Microphone).
+        - yt, chatgpt, calendar, news: Optional service instances to use instead of the
+          default YouTube, GPTClient, MyCalendar and SmartNews (e.g. stubs for benchmarks).
+        - command_timeouts: Per-intent timeouts overriding COMMAND_TIMEOUTS.
+        - executor_workers: Threads for blocking service calls (NewsAPI, yt_dlp).
+        - news_topics: News topics kept warm in the background (see NewsPrefetcher).
+        - prerender_news: Also render warm news summaries to speech ahead of time.
         """
         if format is None:
             import pyaudio
             format = pyaudio.paInt16
+        if source is not None:
+            # Microphone and Speaker share these attributes, so keep them consistent.
+            rate, channels = source.rate, source.channels
 
         # Initialize SmartMic (which starts microphone monitoring in background).
         SmartMic.__init__(self, chunk=chunk, format=format, channels=channels,
                           rate=rate, threshold=threshold, silence_duration=silence_duration,
-                          wake_words=wake_words)
+                          wake_words=wake_words, recognizer_backend=recognizer_backend,
+                          recognizer_options=recognizer_options, wake_templates=wake_templates,
+                          source=source)
         # Initialize Speaker.
         Speaker.__init__(self, chunk=chunk, format=format, channels=channels, rate=rate)
         
+        self.yt = yt if yt is not None else YouTube()
+        if hasattr(self.yt, "duck"):
+            # Videos get quieter while answers and reminders are spoken.
+            self.scheduler.add_duck_listener(self.yt.duck)
+        self.chatgpt = chatgpt if chatgpt is not None else GPTClient()
+        self.calendar = calendar if calendar is not None else MyCalendar()
+        # Kept for the whole session so its HTTP connections are reused.
+        self.news = news if news is not None else SmartNews()
+        # Summaries of configured and recently asked topics are refreshed in the background.
+        self.prerender_news = prerender_news
+        # Pre-rendering runs at background priority, after live speech.
+        prerender = (lambda summary: self.speech_cache.render(summary, BACKGROUND)) if prerender_news else None
+        self.news_prefetcher = NewsPrefetcher(self.news, topics=news_topics, prerender=prerender).start()
+
+        # Commands run as coroutines on an event loop in its own thread;
+        # blocking libraries are called through the loop's executor.
+        self.command_timeouts = dict(COMMAND_TIMEOUTS, **(command_timeouts or {}))
+        self.pending_commands = set()
+        self.commands_lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=executor_workers,
+                                                              thread_name_prefix="command")
+        self.loop.set_default_executor(self.executor)
+        self.loop_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.loop_thread.start()
+
         self.running = True
         # Start a thread to monitor the SmartMic audio queue.
         self.monitor_thread = threading.Thread(target=self._monitor_commands, daemon=True)
@@ -38,101 +92,250 @@ class HomeSpeaker(SmartMic, Speaker):
         # Start a thread to ask gpt the question every 1 minute
         #self.gpt_thread = threading.Thread(target=self._routine_gpt_ask, daemon=True)
         #self.gpt_thread.start()
-        self.yt = YouTube()
-        self.chatgpt = GPTClient()
-        self.calendar = MyCalendar()
         print("HomeSpeaker started. Awaiting commands after wake-up word...")
 
     def _monitor_commands(self):
         """
-        Continuously monitor for valid audio from SmartMic.
-        When available, convert the command audio to text.
-        If text is recognized, use Speaker to speak it.
-        If no text is recognized, play the raw audio instead.
+        Continuously monitor for valid utterances from SmartMic.
+        SmartMic has already transcribed each utterance for the wake-up word check,
+        so its transcript is reused here instead of recognizing the audio again.
         """
         while self.running:
-            command_audio = self.get_audio(timeout=1)
-            if command_audio is not None:
-                command_text = self.convert_audio_to_text(command_audio).lower()
+            utterance = self.get_audio(timeout=1)
+            if utterance is not None:
+                command_text = (utterance.text or "").lower()
                 # if command_text.strip():
                 #     print("HomeSpeaker recognized command text:", command_text)
                 #     self.play_text(command_text)
                 # else:
                 #     print("HomeSpeaker received audio but could not convert to text. Playing raw audio.")
-                #     self.play_audio(command_audio)
+                #     self.play_audio(utterance.audio)
                 self.analysis_command(command_text)
             else:
                 time.sleep(0.1)
 
     def stop(self):
         """
-        Stop the HomeSpeaker by stopping the monitoring thread,
-        then stopping the microphone stream and speaker functionalities.
+        Stop the HomeSpeaker by stopping the monitoring thread and the
+        speaker functionalities, then the event loop and the audio source.
         The monitor thread is only joined if the current thread is not the monitor thread.
         """
         self.running = False
-        import threading
         if self.monitor_thread is not threading.current_thread():
             self.monitor_thread.join()
-        if hasattr(self, 'stream'):
-            self.stream.stop_stream()
-            self.stream.close()
-        if hasattr(self, 'p'):
-            self.p.terminate()
+        with self.commands_lock:
+            pending = list(self.pending_commands)
+        for future in pending:
+            future.cancel()
         self.calendar.stop_all()
-        self.yt.close_video()
-        # Call Speaker's stop method to interrupt any TTS or audio playback.
+        # Interrupt any TTS or audio playback while the loop still runs, so a
+        # cancelled answer stream can close its HTTP response there.
         Speaker.stop(self)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=2.0)
+        self.executor.shutdown(wait=False)
+        if hasattr(self, 'source'):
+            self.source.close()
+        self.yt.close_video()
+        if hasattr(self.yt, "close"):
+            self.yt.close()
+        self.news_prefetcher.stop()
+        if hasattr(self.news, "close"):
+            self.news.close()
+        # Release PortAudio once everything using it has stopped.
+        AUDIO.terminate()
         self.set_talk_session(False)
         print("HomeSpeaker stopped.")
 
+    def set_talk_session(self, session):
+        """
+        Talk mode also keeps the GPT conversation history, so follow-up
+        questions are answered in context.
+        """
+        SmartMic.set_talk_session(self, session)
+        chatgpt = getattr(self, "chatgpt", None)
+        if chatgpt is not None and hasattr(chatgpt, "start_conversation"):
+            if session:
+                chatgpt.start_conversation()
+            else:
+                chatgpt.end_conversation()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def classify_intent(self, command_text):
+        """
+        The intent of a command: "pause", "resume", "play", "stop", "news" or "gpt".
+        "pause" and "resume" only count as the first word of the command
+        (after any wake-up word) while a video is playing, so questions like
+        "how do i write a good resume" still go to GPT.
+        """
+        if getattr(self.yt, "playing", False):
+            text = command_text.strip()
+            for wake_word in self.wake_words:
+                if text.startswith(wake_word):
+                    text = text[len(wake_word):].lstrip(" ,.")
+                    break
+            media_command = re.match(r"(pause|resume)\b", text)
+            if media_command:
+                return media_command.group(1)
+        if "play" in command_text:
+            return "play"
+        #else if the command text include "stop" or "close" word, then stop the video
+        elif "stop" in command_text or "close" in command_text:
+            return "stop"
+        elif "news" in command_text:
+            return "news"
+        return "gpt"
+
     #Analysis the command text, if the text include "play" word then get the text after "play" word, then call play_vidoe function to play the video. 
-    def analysis_command(self, command_text):        
+    def analysis_command(self, command_text):
+        """
+        Dispatch a command without waiting for it.
+        "stop", "pause" and "resume" are handled right away on the calling
+        thread; everything else runs as a coroutine on the event loop, so a
+        slow request never delays the next command.
+
+        Returns:
+          concurrent.futures.Future: The running command, or None for "stop",
+          "pause" and "resume".
+        """
+        intent = self.classify_intent(command_text)
+        if intent in ("stop", "pause", "resume"):
+            started = time.perf_counter()
+            if intent == "stop":
+                self.stop_commands()
+            elif intent == "pause":
+                self.yt.pause()
+            else:
+                self.yt.resume()
+            self._count_command(intent, started)
+            return None
+        future = asyncio.run_coroutine_threadsafe(self.handle_command(command_text), self.loop)
+        with self.commands_lock:
+            self.pending_commands.add(future)
+        future.add_done_callback(self._command_done)
+        return future
+
+    def _command_done(self, future):
+        with self.commands_lock:
+            self.pending_commands.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Command failed: {future.exception()}")
+
+    def _count_command(self, intent, started, outcome="done"):
+        METRICS.counter("commands_total", "Commands dispatched, by intent", intent=intent).inc()
+        METRICS.histogram("command_seconds", "Time to handle a command, by intent",
+                          intent=intent).observe(time.perf_counter() - started)
+        if outcome != "done":
+            METRICS.counter("commands_aborted_total", "Commands that timed out, failed or were cancelled",
+                            intent=intent, outcome=outcome).inc()
+
+    async def handle_command(self, command_text):
+        """
+        Handle one command on the event loop, within its intent's timeout.
+        """
+        started = time.perf_counter()
         if "talk to you" in command_text:
             self.set_talk_session(True)
-            self.play_text("Hello, I am your home speaker. How can I help you? talk mode is on for 20 minutes")
-        if "play" in command_text:
-            self.yt.close_video()
+            self.play_text("Hello, I am your home speaker. How can I help you? talk mode is on for 20 minutes", cache=True)
+        intent = self.classify_intent(command_text)
+        if intent == "stop":
+            self.stop_commands()
+            self._count_command(intent, started)
+            return
+        if intent == "play":
             video_name = command_text.split("play")[-1].strip()
+            # "play ... next" queues the video after the current one.
+            enqueue = video_name.endswith(" next")
+            if enqueue:
+                video_name = video_name[:-len(" next")].strip()
             print("Playing video: ", video_name)
-            # Call YouTube class to play the video.
-            self.yt.play_video(video_name)
-        #else if the command text include "stop" or "close" word, then stop the video
-        elif "stop" in command_text or "close" in command_text:  
-            self.calendar.stop_all()          
-            self.interrupt_playback()
-            self.yt.close_video()
-        elif "news" in command_text:
+            handler = self.play_video(video_name, enqueue)
+        elif intent == "news":
             topic = command_text #.split("news")[-1].strip()
             print("Searching news for: ", topic)
-            self.search_news(topic)
+            handler = self.search_news(topic)
         else:
-            self.ask_gpt(command_text)
+            handler = self.ask_gpt(command_text)
+        outcome = "done"
+        try:
+            await asyncio.wait_for(handler, self.command_timeouts.get(intent))
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            print(f"Command timed out: {command_text}")
+            if intent != "play":
+                self.play_text("sorry, that took too long", cache=True)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            # A failed service call (OpenAI, NewsAPI, yt_dlp, ...) must still get an answer.
+            outcome = "error"
+            print(f"Command failed: {command_text}: {e}")
+            self.play_text("sorry, something went wrong", cache=True)
+        finally:
+            self._count_command(intent, started, outcome)
+
+    def stop_commands(self):
+        """
+        Fast path for "stop": cancel the running commands and stop playback
+        and media immediately, even while a request is in flight.
+        A blocking call already running in the executor finishes in the
+        background, but its result is dropped.
+        """
+        with self.commands_lock:
+            pending = list(self.pending_commands)
+        for future in pending:
+            future.cancel()
+        self.calendar.stop_all()
+        self.interrupt_playback()
+        self.yt.close_video()
 
-    def ask_gpt(self, question):
+    async def play_video(self, video_name, enqueue=False):
+        loop = asyncio.get_running_loop()
+        if enqueue:
+            await loop.run_in_executor(None, self.yt.play_video, video_name, True)
+            return
+        await loop.run_in_executor(None, self.yt.close_video)
+        # Call YouTube class to play the video.
+        await loop.run_in_executor(None, self.yt.play_video, video_name)
+
+    async def ask_gpt(self, question):
         #call chatgpt class to get the response
         if question and question.strip():
             print("Asking GPT: ", question)
-            response = self.chatgpt.ask(question)
-            #if response is not empty then play the response
-            if response:
-                self.play_text(response)
-            else:
-                #if response is empty then play the command text
-                self.play_text("sorry I can not find the answer for your question")
+            # Stream the answer so speech starts after its first sentence.
+            response = await self.chatgpt.ask_async(question, stream=True)
+            # A new answer replaces the previous one; reminders are kept.
+            self.interrupt_playback(ANSWER)
+            #if the response is empty then play the fallback text
+            self.play_text_stream(response, fallback="sorry I can not find the answer for your question")
 
-    def search_news(self, topic):
+    async def search_news(self, topic):
         #call smartnews class to get the news
-        news = SmartNews().get_news(topic)
+        news = self.news_prefetcher.lookup(topic)
+        if news is None:
+            loop = asyncio.get_running_loop()
+            # NewsAPI and the summary request are blocking calls, so they run in the executor.
+            # A background refresh of the same topic in flight is joined, not repeated.
+            news = await loop.run_in_executor(None, self.news_prefetcher.fetch, topic)
+        # A new answer replaces the previous one; reminders are kept.
+        self.interrupt_playback(ANSWER)
         #if news is not empty then play the news
         if news:
-            self.play_text(news)
+            self.play_text(news, cache=self.prerender_news)
         else:
             #if news is empty then play the command text
-            self.play_text("sorry I can not find the news for your topic")
+            self.play_text("sorry I can not find the news for your topic", cache=True)
 
 if __name__ == "__main__":
     try:
+        # Set VOICEGPT_METRICS_PORT (e.g. 9100) to expose /metrics for Prometheus.
+        metrics_port = os.environ.get("VOICEGPT_METRICS_PORT")
+        if metrics_port:
+            METRICS.serve(int(metrics_port))
         hs = HomeSpeaker()
         print("HomeSpeaker is running. Speak the wake-up word followed by your command.")
         while True:
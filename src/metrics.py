@@ -0,0 +1,224 @@
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default histogram buckets in seconds, from audio-chunk scale up to slow network calls.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self, function=None):
+        """
+        A value that can go up and down. With `function`, the value is read only
+        when metrics are collected, so the measured code pays nothing.
+        """
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """
+        Context manager that observes the duration of its block.
+        """
+        return Timer(self)
+
+
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        """
+        Registry of counters, gauges and histograms, exposed as Prometheus text
+        (serve()) or as periodic JSON dumps (start_json_dump()).
+        Metrics are identified by name plus optional keyword labels.
+        """
+        self.metrics = {}
+        self.help = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def _get(self, kind, name, help, labels, factory):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = factory()
+                    self.metrics[key] = metric
+                    self.help.setdefault(name, (kind, help))
+        return metric
+
+    def counter(self, name, help="", **labels):
+        return self._get("counter", name, help, labels, Counter)
+
+    def gauge(self, name, help="", function=None, **labels):
+        gauge = self._get("gauge", name, help, labels, lambda: Gauge(function))
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels):
+        return self._get("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def timer(self, name, help="", **labels):
+        """
+        Shortcut for `with metrics.timer("stt_seconds"): ...`.
+        """
+        return self.histogram(name, help, **labels).time()
+
+    def render_prometheus(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            items = sorted(self.metrics.items(), key=lambda item: item[0])
+        described = set()
+        for (name, labels), metric in items:
+            kind, help = self.help[name]
+            if name not in described:
+                described.add(name)
+                if help:
+                    lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+            if isinstance(metric, Counter):
+                lines.append(f"{name}{_label_text(labels)} {metric.value}")
+            elif isinstance(metric, Gauge):
+                lines.append(f"{name}{_label_text(labels)} {metric.get()}")
+            else:
+                with metric.lock:
+                    counts = list(metric.counts)
+                    total, count = metric.sum, metric.count
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {total}")
+                lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        All metrics as a JSON-serializable dict.
+        """
+        data = {}
+        with self.lock:
+            items = list(self.metrics.items())
+        for (name, labels), metric in items:
+            key = name + _label_text(labels)
+            if isinstance(metric, Counter):
+                data[key] = metric.value
+            elif isinstance(metric, Gauge):
+                data[key] = metric.get()
+            else:
+                with metric.lock:
+                    data[key] = {"count": metric.count, "sum": round(metric.sum, 6),
+                                 "buckets": dict(zip([str(b) for b in metric.buckets] + ["+Inf"], metric.counts))}
+        return data
+
+    def serve(self, port=9100, host="127.0.0.1"):
+        """
+        Serve /metrics (Prometheus text) and /metrics.json on a background thread.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry.render_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(registry.snapshot(), indent=2).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://{host}:{port}/metrics")
+        return self.server
+
+    def start_json_dump(self, path, interval=60):
+        """
+        Write a JSON snapshot to `path` every `interval` seconds on a background thread.
+        """
+        def dump():
+            while True:
+                time.sleep(interval)
+                with open(path, "w") as f:
+                    json.dump({"time": time.time(), "metrics": self.snapshot()}, f, indent=2)
+
+        thread = threading.Thread(target=dump, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+
+# Process-wide registry used by all components.
+METRICS = Metrics()
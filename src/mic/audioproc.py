@@ -1,54 +1,130 @@
 import wave
+import threading
 import pyaudio
 import numpy as np
 import speech_recognition as sr
 
+from mic.recognizers import make_backend
+from mic.resample import resample
+
 class AudioProc:
-    def __init__(self, chunk=1024, format=pyaudio.paInt16, channels=1, rate=44100):
+    def __init__(self, chunk=1024, format=pyaudio.paInt16, channels=1, rate=44100,
+                 backend=None, backend_options=None, target_rate=16000, resample_method="poly"):
         """
         Provide audio processing features: conversion of audio to text,
         detection of wake-up words, and text-to-speech.
+
+        Parameters:
+        - backend: Speech recognition engine, either a RecognizerBackend or one of
+          "google" (default), "sphinx", "vosk", "whispercpp" or "stub".
+        - backend_options: Keyword options for the backend constructor
+          (e.g. {"model_path": "vosk-model-small-en-us"}).
+        - target_rate: Rate audio is downmixed and resampled to before recognition
+          (speech models do not need more than 16 kHz); None keeps the capture rate.
+        - resample_method: "poly" (polyphase FIR) or "fft".
         """
         self.chunk = chunk
         self.format = format
         self.channels = channels
         self.rate = rate
         
-        # Initialize PyAudio instance (for playback/saving).
-        self.p = pyaudio.PyAudio()
-        
         # Initialize SpeechRecognition and pyttsx3 for text-to-speech.
         self.recognizer = sr.Recognizer()
+        options = dict(backend_options or {})
+        if backend in (None, "google", "sphinx"):
+            options.setdefault("recognizer", self.recognizer)
+        self.backend = make_backend(backend, **options)
+
+        self.target_rate = target_rate
+        self.resample_method = resample_method
+        # Recognizer payload sizes before and after downmixing/resampling.
+        self.audio_stats = {"utterances": 0, "bytes_in": 0, "bytes_out": 0}
+        self.stats_lock = threading.Lock()
 
     def convert_audio_to_text(self, audio_data):
         """
-        Convert raw audio bytes to text using Google's Speech Recognition.
+        Convert raw audio bytes (or an AudioSegment) to text using the configured
+        recognition backend (Google's Speech Recognition by default).
+        """
+        text, confidence = self.transcribe(audio_data)
+        return text
+
+    def transcribe(self, audio_data):
         """
-        sample_width = self.p.get_sample_size(self.format)
-        audio = sr.AudioData(audio_data, self.rate, sample_width)
-        try:
-            text = self.recognizer.recognize_google(audio)
-            return text
-        except sr.UnknownValueError:
-            return ""
-        except sr.RequestError as e:
-            return f"Error: {e}"
+        Like convert_audio_to_text, but also return the recognizer's confidence.
+
+        Returns:
+          tuple: (text, confidence); confidence is None when not reported.
+        """
+        return self.backend.transcribe(self.prepare_audio(audio_data))
+
+    def prepare_audio(self, audio_data):
+        """
+        Turn captured audio (raw bytes or an AudioSegment) into the AudioData sent to
+        the recognizer: mono, 16-bit, resampled to target_rate.
+
+        Returns:
+          speech_recognition.AudioData
+        """
+        if hasattr(audio_data, "samples"):
+            samples = audio_data.samples
+        else:
+            samples = np.frombuffer(bytes(audio_data), dtype=np.int16)
+        bytes_in = samples.nbytes
+        rate = self.rate
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1).astype(np.int16)
+        if self.target_rate is not None and self.target_rate < rate:
+            samples = resample(samples, rate, self.target_rate, method=self.resample_method)
+            rate = self.target_rate
+        # AudioSegment views are only copied out here, where the recognizer needs bytes.
+        payload = samples.tobytes()
+        with self.stats_lock:
+            self.audio_stats["utterances"] += 1
+            self.audio_stats["bytes_in"] += bytes_in
+            self.audio_stats["bytes_out"] += len(payload)
+        return sr.AudioData(payload, rate, pyaudio.get_sample_size(pyaudio.paInt16))
+
+    def bytes_saved(self):
+        """
+        Number of recognizer payload bytes saved by downmixing and resampling so far.
+        """
+        with self.stats_lock:
+            return self.audio_stats["bytes_in"] - self.audio_stats["bytes_out"]
+
+    def report_audio_stats(self):
+        """
+        Print how much recognizer payload the resampling stage has saved.
+        """
+        with self.stats_lock:
+            stats = dict(self.audio_stats)
+        if stats["bytes_in"]:
+            saved = stats["bytes_in"] - stats["bytes_out"]
+            print(f"Recognizer audio: {stats['utterances']} utterances, {stats['bytes_in']} -> "
+                  f"{stats['bytes_out']} bytes ({saved} bytes, {100.0 * saved / stats['bytes_in']:.0f}% saved).")
+        return stats
 
     def detect_wakeup_words(self, text, wake_words=None):
         """
         Check if any wake-up word exists in the provided text.
         """
+        return self.find_wakeup_word(text, wake_words) is not None
+
+    def find_wakeup_word(self, text, wake_words=None):
+        """
+        Return the first wake-up word found in the provided text, or None.
+        """
         if wake_words is None:
             wake_words = ["hey gpt", "wake up", "hello"]
         text_lower = text.lower()
         for word in wake_words:
             if word.lower() in text_lower:
-                return True
-        return False    
+                return word
+        return None
 
     def close(self):
         """
-        Terminate the PyAudio session and stop the TTS engine.
+        Report the audio statistics.
         """
-        self.p.terminate()
+        self.report_audio_stats()
         print("Audio processor closed.")
@@ -0,0 +1,209 @@
+import os
+import glob
+import wave
+import numpy as np
+
+class FeatureExtractor:
+    def __init__(self, rate, frame_ms=25, hop_ms=10, n_mels=26, n_mfcc=13, fmax=8000):
+        """
+        Streaming MFCC features computed with vectorized NumPy.
+
+        Samples are fed in arbitrary chunk sizes; every complete 25 ms frame
+        (10 ms hop) is windowed, transformed and projected onto a mel filterbank
+        in one batch per call. The filterbank is defined in Hz, so features from
+        recordings at different sample rates are comparable.
+
+        Parameters:
+        - rate: Sample rate of the audio.
+        - frame_ms, hop_ms: Analysis window and hop length in milliseconds.
+        - n_mels: Number of mel filters.
+        - n_mfcc: Number of cepstral coefficients kept (c0 is dropped).
+        - fmax: Highest filter frequency in Hz (capped at Nyquist).
+        """
+        self.rate = rate
+        self.frame_len = int(rate * frame_ms / 1000)
+        self.hop = int(rate * hop_ms / 1000)
+        self.n_fft = 1 << (self.frame_len - 1).bit_length()
+        self.window = np.hamming(self.frame_len).astype(np.float32)
+        self.mel_basis = self._mel_filterbank(n_mels, min(fmax, rate / 2))
+        # DCT-II matrix, skipping c0 (overall loudness).
+        n = np.arange(n_mels)
+        k = np.arange(1, n_mfcc + 1)[:, None]
+        self.dct = (np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)).T.astype(np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def _mel_filterbank(self, n_mels, fmax, fmin=80):
+        def hz_to_mel(hz):
+            return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+        def mel_to_hz(mel):
+            return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+        mel_points = np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2)
+        bins = mel_to_hz(mel_points) * self.n_fft / self.rate
+        freqs = np.arange(self.n_fft // 2 + 1)[:, None]
+        left, center, right = bins[:-2], bins[1:-1], bins[2:]
+        rising = (freqs - left) / (center - left)
+        falling = (right - freqs) / (right - center)
+        return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+    def features(self, frames):
+        """
+        MFCCs for a (n_frames, frame_len) array of float samples.
+        """
+        spectrum = np.fft.rfft(frames * self.window, n=self.n_fft)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        mel = np.log(power @ self.mel_basis + 1e-6)
+        return mel @ self.dct
+
+    def process(self, samples):
+        """
+        Feed samples and return the features of every newly completed frame.
+        """
+        data = np.concatenate((self.pending, np.asarray(samples, dtype=np.float32)))
+        if len(data) < self.frame_len:
+            self.pending = data
+            return np.zeros((0, self.dct.shape[1]), dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(data, self.frame_len)[::self.hop]
+        self.pending = data[len(frames) * self.hop:]
+        return self.features(frames)
+
+    def compute(self, samples):
+        """
+        Features of a complete recording (does not touch the streaming state).
+        """
+        data = np.asarray(samples, dtype=np.float32)
+        if len(data) < self.frame_len:
+            return np.zeros((0, self.dct.shape[1]), dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(data, self.frame_len)[::self.hop]
+        return self.features(frames)
+
+    def reset(self):
+        self.pending = np.zeros(0, dtype=np.float32)
+
+
+def _normalize_rows(features):
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.maximum(norms, 1e-6)
+
+
+class KeywordSpotter:
+    def __init__(self, rate, threshold=0.3, mean_decay=0.995, refractory=1.0):
+        """
+        Lightweight streaming wake-word spotter.
+
+        Each wake word is described by one or more enrolled example recordings
+        (templates). Incoming audio is scored against every template frame by
+        frame with subsequence dynamic time warping, so a wake word is reported
+        as soon as its last syllable has been heard, without waiting for the end
+        of the utterance or a full speech recognition pass.
+
+        Parameters:
+        - rate: Sample rate of the streamed audio.
+        - threshold: Maximum average cosine distance along the best warping
+          path for a detection (lower is stricter).
+        - mean_decay: Decay of the running cepstral mean used to normalize the
+          channel (closer to 1 is slower).
+        - refractory: Seconds after a detection during which nothing is reported.
+        """
+        self.rate = rate
+        self.threshold = threshold
+        self.mean_decay = mean_decay
+        self.extractor = FeatureExtractor(rate)
+        self.refractory_frames = int(refractory * 1000 / 10)
+        self.templates = {}
+        self.mean = None
+        self.cooldown = 0
+        # Per template: accumulated path cost and path length for every template frame.
+        self.paths = []
+
+    @classmethod
+    def from_directory(cls, rate, directory, wake_words, **options):
+        """
+        Build a spotter from WAV recordings of the wake words.
+        Recordings of "hey gpt" are looked up as <directory>/hey_gpt*.wav.
+        """
+        spotter = cls(rate, **options)
+        for word in wake_words:
+            pattern = os.path.join(directory, word.lower().replace(" ", "_") + "*.wav")
+            for path in sorted(glob.glob(pattern)):
+                spotter.enroll_wav(word, path)
+        return spotter
+
+    def enroll_wav(self, word, path):
+        """
+        Add a template for `word` from a mono 16-bit WAV file.
+        """
+        with wave.open(path, "rb") as wav:
+            rate = wav.getframerate()
+            channels = wav.getnchannels()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        self.enroll(word, samples[::channels], rate=rate)
+
+    def enroll(self, word, samples, rate=None):
+        """
+        Add a template for `word` from a recording of just the wake word.
+        """
+        extractor = self.extractor if rate in (None, self.rate) else FeatureExtractor(rate)
+        features = extractor.compute(samples)
+        if len(features) < 5:
+            print(f"Wake word recording for '{word}' is too short, ignoring it.")
+            return
+        features = _normalize_rows(features - features.mean(axis=0))
+        self.templates.setdefault(word, []).append(features)
+        self.paths.append((word, features, np.full(len(features), np.inf), np.zeros(len(features))))
+
+    def has_templates(self):
+        return bool(self.templates)
+
+    def reset(self):
+        """
+        Forget partial matches, e.g. after a command has been recorded.
+        """
+        self.extractor.reset()
+        self.paths = [(word, template, np.full(len(template), np.inf), np.zeros(len(template)))
+                      for word, template, cost, length in self.paths]
+
+    def process(self, samples):
+        """
+        Feed a chunk of mono samples. Returns the detected wake word, or None.
+        """
+        features = self.extractor.process(samples)
+        if len(features) == 0 or not self.paths:
+            return None
+        # Running cepstral mean normalization (vectorized over the chunk's frames).
+        if self.mean is None:
+            self.mean = features.mean(axis=0)
+        weights = self.mean_decay ** np.arange(len(features) - 1, -1, -1)[:, None]
+        self.mean = self.mean * self.mean_decay ** len(features) + ((1 - self.mean_decay) * weights * features).sum(axis=0)
+        features = _normalize_rows(features - self.mean)
+
+        detected = None
+        for word, template, cost, length in self.paths:
+            # Local distance of every new frame to every template frame at once.
+            distances = 1.0 - features @ template.T
+            for index, frame_distances in enumerate(distances):
+                # Each template frame can be reached from the same frame (stay),
+                # the previous one (step) or the one before that (skip); a path may
+                # start at template frame 0 at any time (subsequence matching).
+                stay_cost, stay_len = cost, length
+                step_cost = np.concatenate(([0.0], cost[:-1]))
+                step_len = np.concatenate(([0.0], length[:-1]))
+                skip_cost = np.concatenate(([np.inf, np.inf], cost[:-2]))
+                skip_len = np.concatenate(([0.0, 0.0], length[:-2]))
+                candidates_cost = np.stack((stay_cost, step_cost, skip_cost)) + frame_distances
+                candidates_len = np.stack((stay_len, step_len, skip_len)) + 1
+                best = np.argmin(candidates_cost / candidates_len, axis=0)
+                columns = np.arange(len(template))
+                cost[:] = candidates_cost[best, columns]
+                length[:] = candidates_len[best, columns]
+                if index < self.cooldown:
+                    continue
+                # A match ends at the last template frame; require a plausible duration.
+                if length[-1] >= len(template) / 2 and cost[-1] / length[-1] < self.threshold:
+                    detected = word
+        self.cooldown = max(0, self.cooldown - len(features))
+        if detected is not None:
+            self.reset()
+            self.cooldown = self.refractory_frames
+        return detected
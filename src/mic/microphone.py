@@ -4,40 +4,125 @@ import time
 import numpy as np
 import pyaudio
 
+from mic.ringbuffer import RingBuffer, AudioSegment
+from mic.utterance import Utterance
+from mic.vad import VoiceActivityDetector
+from mic.source import PyAudioSource
+from metrics import METRICS
+
 class Microphone:
     def __init__(self, chunk=1024, format=pyaudio.paInt16, channels=1,
-                 rate=44100, threshold=500, silence_duration=1.0):
+                 rate=44100, threshold=500, silence_duration=1.0,
+                 callback_mode=True, buffer_seconds=60, vad=None, preroll=0.3, source=None):
         """
         Continuously monitor the microphone and record audio when voice is detected.
         Recorded audio is saved to an internal queue.
+
+        In callback mode PortAudio pushes captured chunks into a ring buffer from
+        its own thread, and the monitor thread only does segmentation, so capture
+        never waits on recognition or on queue consumers.
+        Set callback_mode=False to fall back to blocking stream.read() polling.
+
+        Recorded segments are queued as Utterance objects whose audio is an
+        AudioSegment view into the int16 ring buffer, which holds the last
+        `buffer_seconds` of audio; consumers must pick a segment up (or copy it
+        with tobytes()) before it is overwritten.
+
+        Silence is decided by a VoiceActivityDetector with an adaptive noise floor;
+        `threshold` is the lowest level ever treated as speech. Pass a configured
+        detector as `vad` to enable hangover tuning or spectral features.
+
+        Every recording starts `preroll` seconds before the first chunk detected
+        as speech, so quiet first syllables are not clipped. The pre-roll is read
+        from the ring buffer history, so it costs no copying.
+
+        Audio comes from `source` (an AudioSource), by default the live PyAudio
+        input. Pass e.g. a WavFileSource to replay recordings without a sound
+        card; its rate and channels then replace the ones given here.
         """
+        if source is None:
+            source = PyAudioSource(chunk=chunk, format=format, channels=channels, rate=rate,
+                                   callback_mode=callback_mode)
+        self.source = source
         self.chunk = chunk
         self.format = format
-        self.channels = channels
-        self.rate = rate
+        self.channels = source.channels
+        self.rate = source.rate
         self.threshold = threshold
         self.silence_duration = silence_duration
+        self.callback_mode = callback_mode
 
         self.audio_queue = queue.Queue()
         self.running = True
 
-        # Initialize PyAudio for input.
-        self.p = pyaudio.PyAudio()
-        self.stream = self.p.open(format=self.format,
-                                  channels=self.channels,
-                                  rate=self.rate,
-                                  input=True,
-                                  frames_per_buffer=self.chunk)
+        # Samples per chunk read by the monitor thread (int16 samples, paInt16 input).
+        self.chunk_samples = self.chunk * self.channels
+        self.ring = RingBuffer(int(buffer_seconds * self.rate) * self.channels, dtype=np.int16)
+        self.preroll_samples = int(preroll * self.rate) * self.channels
+        # Start position of the chunk last returned by _read_chunk().
+        self.chunk_start = 0
+        self.vad = vad if vad is not None else VoiceActivityDetector(
+            self.rate, min_level=self.threshold, frame_duration=self.chunk / self.rate)
+
+        # Capture metrics are read from the ring buffer at collection time,
+        # so the capture callback itself does no extra work.
+        METRICS.gauge("audio_captured_samples", "Samples captured from the audio source",
+                      function=lambda: self.ring.write_pos)
+        METRICS.gauge("audio_ring_overruns", "Times the monitor fell a full buffer behind capture",
+                      function=lambda: self.ring.overruns)
+        METRICS.gauge("audio_ring_backlog_samples", "Captured samples not yet segmented",
+                      function=self.ring.available)
+        self.segment_counter = METRICS.counter("audio_segments_total", "Recorded audio segments")
+        self.segment_seconds = METRICS.histogram("audio_segment_seconds", "Length of recorded segments",
+                                                 buckets=(0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0))
+
+        # Start capturing; in callback mode the source pushes chunks into the ring buffer.
+        self.source.start(self._capture_callback if callback_mode else None, pending=self.ring.available)
         # Start the monitoring thread.
         self.thread = threading.Thread(target=self._monitor, daemon=True)
         self.thread.start()
 
+    def _capture_callback(self, in_data):
+        """
+        Capture callback (called from the source's thread): copy the chunk into
+        the ring buffer. Must stay short and never block.
+        """
+        self.ring.write(in_data)
+
+    def _read_chunk(self, timeout=0.5):
+        """
+        Return the next captured chunk as a zero-copy int16 view into the ring buffer,
+        or None if nothing arrived within the timeout.
+        """
+        if not self.callback_mode:
+            self.ring.write(self.source.read(self.chunk))
+        start = self.ring.read(self.chunk_samples, timeout=timeout)
+        if start is None:
+            return None
+        self.chunk_start = start
+        return self.ring.view(start, start + self.chunk_samples)
+
+    def _preroll_start(self, start):
+        """
+        Move a recording start back by the pre-roll, as far as the ring buffer history allows.
+        """
+        oldest = max(0, self.ring.write_pos - self.ring.capacity + self.chunk_samples)
+        return max(start - self.preroll_samples, oldest, 0)
+
+    def _make_segment(self, start, end):
+        """
+        Describe the samples in [start, end) of the ring buffer as an AudioSegment.
+        """
+        segment = AudioSegment(self.ring, start, end, self.rate, self.channels)
+        self.segment_counter.inc()
+        self.segment_seconds.observe(segment.duration)
+        return segment
+
     def _is_silent(self, data):
         """
-        Returns True if the mean absolute amplitude of the audio data is below the threshold.
+        Returns True if the voice activity detector does not classify the chunk as speech.
         """
-        audio_data = np.frombuffer(data, dtype=np.int16)
-        return np.abs(audio_data).mean() < self.threshold
+        return not self.vad.is_speech(data)
 
     def _monitor(self):
         """
@@ -45,27 +130,31 @@ class Microphone:
         (This method is intended to be overridden in subclasses.)
         """
         while self.running:
-            data = self.stream.read(self.chunk)
+            data = self._read_chunk()
+            if data is None:
+                continue
             if not self._is_silent(data):
-                frames = [data]
+                start = self._preroll_start(self.chunk_start)
                 silence_time = 0.0
                 while self.running:
-                    data = self.stream.read(self.chunk)
-                    frames.append(data)
+                    data = self._read_chunk()
+                    if data is None:
+                        continue
                     if self._is_silent(data):
                         silence_time += self.chunk / self.rate
                     else:
                         silence_time = 0.0
                     if silence_time >= self.silence_duration:
                         break
-                audio_data = b''.join(frames)
-                self.audio_queue.put(audio_data)
-            else:
+                end = self.chunk_start + self.chunk_samples
+                if self.ring.is_valid(start):
+                    self.audio_queue.put(Utterance(self._make_segment(start, end)))
+            elif not self.callback_mode:
                 time.sleep(0.01)
 
     def get_audio(self, block=True, timeout=None):
         """
-        Retrieve the next recorded audio segment from the queue.
+        Retrieve the next recorded Utterance from the queue.
         """
         try:
             return self.audio_queue.get(block=block, timeout=timeout)
@@ -74,11 +163,10 @@ class Microphone:
 
     def stop(self):
         """
-        Stop monitoring, close the stream, and terminate PyAudio.
+        Stop monitoring and close the audio source.
         """
         self.running = False
+        self.ring.close()
         self.thread.join()
-        self.stream.stop_stream()
-        self.stream.close()
-        self.p.terminate()
+        self.source.close()
         print("Microphone stopped.")
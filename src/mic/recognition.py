@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class RecognitionPool:
+    def __init__(self, recognize, on_result, max_workers=2, max_pending=4):
+        """
+        Run speech recognition on a bounded thread pool so the capture thread
+        can hand recordings off and keep reading.
+
+        Results are delivered to `on_result(item, result)` in the order the
+        items were submitted, even when a later item is recognized first.
+
+        Parameters:
+        - recognize: Function that recognizes a submitted item (blocking).
+        - on_result: Called with (item, result) in submission order; result is
+          whatever `recognize` returned, or None if it raised.
+        - max_workers: Number of recognition threads.
+        - max_pending: Maximum number of items queued or in flight.
+          Further items are dropped instead of blocking the caller.
+        """
+        self.recognize = recognize
+        self.on_result = on_result
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="recognition")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.next_submit = 0
+        self.next_deliver = 0
+        self.results = {}
+        self.dropped = 0
+
+    def submit(self, item):
+        """
+        Queue an item for recognition without blocking.
+        Returns False if the pool is saturated and the item was dropped.
+        """
+        if not self.slots.acquire(blocking=False):
+            self.dropped += 1
+            print("Recognition is falling behind, dropping an audio segment.")
+            return False
+        with self.lock:
+            seq = self.next_submit
+            self.next_submit += 1
+        self.executor.submit(self._run, seq, item)
+        return True
+
+    def _run(self, seq, item):
+        try:
+            result = self.recognize(item)
+        except Exception as e:
+            print(f"Speech recognition failed: {e}")
+            result = None
+        finally:
+            self.slots.release()
+        with self.lock:
+            self.results[seq] = (item, result)
+            # Deliver every result that is now in order. Holding the lock keeps
+            # deliveries from different workers from interleaving.
+            while self.next_deliver in self.results:
+                ready_item, ready_result = self.results.pop(self.next_deliver)
+                self.next_deliver += 1
+                try:
+                    self.on_result(ready_item, ready_result)
+                except Exception as e:
+                    print(f"Error handling recognition result: {e}")
+
+    def pending(self):
+        """
+        Number of submitted items whose result has not been delivered yet.
+        """
+        with self.lock:
+            return self.next_submit - self.next_deliver
+
+    def close(self):
+        """
+        Stop accepting work and wait for in-flight recognitions to finish.
+        """
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,175 @@
+import json
+import threading
+import numpy as np
+import speech_recognition as sr
+
+class RecognizerBackend:
+    """
+    Speech-to-text engine used by AudioProc.
+    Subclasses implement transcribe(), which takes a speech_recognition.AudioData
+    and returns (text, confidence); confidence is None when the engine has none.
+    An empty text means nothing was recognized.
+    """
+    name = "base"
+
+    def transcribe(self, audio):
+        raise NotImplementedError
+
+
+class GoogleBackend(RecognizerBackend):
+    """
+    Google Web Speech API (network round trip per utterance).
+    """
+    name = "google"
+
+    def __init__(self, recognizer=None, language="en-US"):
+        self.recognizer = recognizer if recognizer is not None else sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, audio):
+        try:
+            result = self.recognizer.recognize_google(audio, language=self.language, show_all=True)
+        except sr.UnknownValueError:
+            # Raised for silence or noise, even with show_all.
+            return "", None
+        except sr.RequestError as e:
+            return f"Error: {e}", None
+        if not isinstance(result, dict) or not result.get("alternative"):
+            return "", None
+        # Same choice of hypothesis as recognize_google() without show_all.
+        alternatives = result["alternative"]
+        if "confidence" in alternatives[0]:
+            best = max(alternatives, key=lambda alternative: alternative.get("confidence", 0))
+        else:
+            best = alternatives[0]
+        return best.get("transcript", ""), best.get("confidence")
+
+
+class SphinxBackend(RecognizerBackend):
+    """
+    Offline CMU PocketSphinx through speech_recognition (needs the pocketsphinx package).
+    keyword_entries, e.g. [("hey gpt", 1e-20)], switches Sphinx to keyword spotting.
+    """
+    name = "sphinx"
+
+    def __init__(self, recognizer=None, language="en-US", keyword_entries=None):
+        self.recognizer = recognizer if recognizer is not None else sr.Recognizer()
+        self.language = language
+        self.keyword_entries = keyword_entries
+
+    def transcribe(self, audio):
+        try:
+            text = self.recognizer.recognize_sphinx(audio, language=self.language,
+                                                    keyword_entries=self.keyword_entries)
+        except sr.UnknownValueError:
+            return "", None
+        except sr.RequestError as e:
+            return f"Error: {e}", None
+        return text.strip(), None
+
+
+class VoskBackend(RecognizerBackend):
+    """
+    Offline Kaldi recognition with Vosk (needs the vosk package and a downloaded model).
+    """
+    name = "vosk"
+    sample_rate = 16000
+
+    def __init__(self, model_path="model"):
+        try:
+            import vosk
+        except ImportError:
+            raise ImportError("The vosk backend needs the vosk package: pip install vosk")
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        # Loading the model is the slow part, so it is done once and shared.
+        self.model = vosk.Model(model_path)
+
+    def transcribe(self, audio):
+        # A recognizer is cheap to create and is not thread-safe, so use one per call.
+        recognizer = self.vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+        words = result.get("result", [])
+        confidence = float(np.mean([word["conf"] for word in words])) if words else None
+        return result.get("text", ""), confidence
+
+
+class WhisperCppBackend(RecognizerBackend):
+    """
+    Offline whisper.cpp recognition through the pywhispercpp bindings.
+    """
+    name = "whispercpp"
+    sample_rate = 16000
+
+    def __init__(self, model="base.en", n_threads=4):
+        try:
+            from pywhispercpp.model import Model
+        except ImportError:
+            raise ImportError("The whispercpp backend needs pywhispercpp: pip install pywhispercpp")
+        self.model = Model(model, n_threads=n_threads, print_progress=False, print_realtime=False)
+        # The whisper.cpp context is not thread-safe.
+        self.lock = threading.Lock()
+
+    def transcribe(self, audio):
+        raw = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        with self.lock:
+            segments = self.model.transcribe(samples)
+        return " ".join(segment.text.strip() for segment in segments).strip(), None
+
+
+class StubBackend(RecognizerBackend):
+    """
+    Deterministic recognizer for tests and offline runs.
+
+    Parameters:
+    - responses: A list of transcripts returned in order (then `default`),
+      or a function called with the AudioData that returns the transcript.
+    - default: Transcript returned once the list is exhausted.
+    - confidence: Confidence reported with every transcript.
+    """
+    name = "stub"
+
+    def __init__(self, responses=None, default="", confidence=1.0):
+        self.responses = responses if responses is not None else []
+        self.default = default
+        self.confidence = confidence
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def transcribe(self, audio):
+        with self.lock:
+            index = self.calls
+            self.calls += 1
+        if callable(self.responses):
+            text = self.responses(audio)
+        elif index < len(self.responses):
+            text = self.responses[index]
+        else:
+            text = self.default
+        return text, self.confidence
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    SphinxBackend.name: SphinxBackend,
+    VoskBackend.name: VoskBackend,
+    WhisperCppBackend.name: WhisperCppBackend,
+    StubBackend.name: StubBackend,
+}
+
+def make_backend(backend=None, **options):
+    """
+    Return a RecognizerBackend from a backend instance, a backend name
+    ("google", "sphinx", "vosk", "whispercpp", "stub") or None (Google).
+    Extra keyword options are passed to the backend constructor.
+    """
+    if isinstance(backend, RecognizerBackend):
+        return backend
+    if backend is None:
+        backend = GoogleBackend.name
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown speech recognition backend: {backend}")
+    return BACKENDS[backend](**options)
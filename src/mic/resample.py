@@ -0,0 +1,74 @@
+from math import gcd
+import numpy as np
+
+def _polyphase_filter(up, down, half_width, beta):
+    """
+    Kaiser-windowed sinc low-pass for the upsampled rate, split into `up` phases.
+    Returns an (up, taps_per_phase) matrix with each row in reverse tap order.
+    """
+    max_rate = max(up, down)
+    n_taps = 2 * half_width * max_rate + 1
+    t = np.arange(n_taps) - (n_taps - 1) / 2
+    h = np.sinc(t / max_rate) / max_rate * np.kaiser(n_taps, beta) * up
+    taps = -(-n_taps // up)
+    h = np.concatenate((h, np.zeros(taps * up - n_taps)))
+    # Phase p uses taps h[p], h[p + up], h[p + 2 * up], ...
+    return h.reshape(taps, up).T[:, ::-1].copy(), (n_taps - 1) // 2
+
+def resample_poly(x, up, down, half_width=10, beta=5.0, block=8192):
+    """
+    Change the rate of `x` by up/down with a polyphase FIR filter.
+    Only the non-zero terms of the zero-stuffed signal are computed, and output
+    samples are produced in blocks to bound memory.
+    """
+    divisor = gcd(up, down)
+    up, down = up // divisor, down // divisor
+    x = np.asarray(x, dtype=np.float32)
+    if up == down:
+        return x.copy()
+    phases, center = _polyphase_filter(up, down, half_width, beta)
+    taps = phases.shape[1]
+    n_out = -(-len(x) * up // down)
+    padded = np.concatenate((np.zeros(taps - 1, dtype=np.float32), x,
+                             np.zeros(taps + center // up + 1, dtype=np.float32)))
+    # windows[i] holds x[i - taps + 1 .. i].
+    windows = np.lib.stride_tricks.sliding_window_view(padded, taps)
+    phases = phases.astype(np.float32)
+    y = np.empty(n_out, dtype=np.float32)
+    for first in range(0, n_out, block):
+        positions = np.arange(first, min(first + block, n_out)) * down + center
+        newest, phase = np.divmod(positions, up)
+        y[first:first + len(positions)] = np.einsum('ij,ij->i', windows[newest], phases[phase])
+    return y
+
+def resample_fft(x, orig_rate, target_rate):
+    """
+    Change the rate of `x` by truncating (or zero-padding) its spectrum.
+    Fast for short clips; assumes the clip is periodic at its edges.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    n_out = int(round(len(x) * target_rate / orig_rate))
+    spectrum = np.fft.rfft(x)
+    y = np.fft.irfft(spectrum[:n_out // 2 + 1], n_out) * (n_out / len(x))
+    return y.astype(np.float32)
+
+def resample(samples, orig_rate, target_rate, method="poly"):
+    """
+    Resample int16 samples from orig_rate to target_rate.
+
+    Parameters:
+      samples: int16 array (mono).
+      method (str): "poly" (polyphase FIR) or "fft".
+
+    Returns:
+      numpy.ndarray: int16 samples at target_rate.
+    """
+    if orig_rate == target_rate:
+        return np.asarray(samples, dtype=np.int16)
+    if method == "fft":
+        y = resample_fft(samples, orig_rate, target_rate)
+    elif method == "poly":
+        y = resample_poly(samples, target_rate, orig_rate)
+    else:
+        raise ValueError(f"Unknown resampling method: {method}")
+    return np.clip(np.round(y), -32768, 32767).astype(np.int16)
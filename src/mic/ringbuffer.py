@@ -0,0 +1,159 @@
+import threading
+import numpy as np
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.int16):
+        """
+        Fixed-capacity sample ring buffer shared between the PortAudio callback
+        (producer) and the segmentation thread (consumer).
+
+        Every sample is stored twice, at index i and i + capacity, so any window
+        of up to `capacity` samples is contiguous and can be handed out as a
+        NumPy view without copying, even when it wraps around the end.
+
+        The producer never blocks: when the consumer falls behind, the oldest
+        samples are overwritten and counted in `overruns`.
+
+        Parameters:
+        - capacity: Size of the buffer in samples.
+        - dtype: Sample type of the captured audio (int16 for paInt16).
+        """
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.data = np.zeros(2 * capacity, dtype=self.dtype)
+        # Absolute sample positions; the buffer index is position % capacity.
+        self.write_pos = 0
+        self.read_pos = 0
+        self.overruns = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def write(self, data):
+        """
+        Append samples (bytes or an array) to the buffer. Called from the PortAudio
+        callback thread, so it only copies samples and notifies the consumer.
+        """
+        samples = np.frombuffer(data, dtype=self.dtype) if not isinstance(data, np.ndarray) else data
+        size = len(samples)
+        if size > self.capacity:
+            # Only the newest `capacity` samples can be kept.
+            samples = samples[size - self.capacity:]
+            with self.cond:
+                self.write_pos += size - self.capacity
+            size = self.capacity
+        cap = self.capacity
+        start = self.write_pos % cap
+        self.data[start:start + size] = samples
+        head = min(size, cap - start)
+        # Mirror into the other half so windows never need to wrap.
+        self.data[start + cap:start + cap + head] = samples[:head]
+        if head < size:
+            self.data[:size - head] = samples[head:]
+        with self.cond:
+            self.write_pos += size
+            if self.write_pos - self.read_pos > cap:
+                self.overruns += 1
+                self.read_pos = self.write_pos - cap
+            self.cond.notify()
+
+    def read(self, size, timeout=None):
+        """
+        Consume `size` samples, waiting until they are available.
+        Returns the absolute start position of the consumed samples (see view()),
+        or None on timeout or when the buffer has been closed.
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.closed or self.write_pos - self.read_pos >= size,
+                                      timeout=timeout):
+                return None
+            if self.write_pos - self.read_pos < size:
+                return None
+            start = self.read_pos
+            self.read_pos += size
+            return start
+
+    def is_valid(self, start):
+        """
+        True while the samples from `start` onwards have not been overwritten.
+        """
+        return self.write_pos - start <= self.capacity
+
+    def view(self, start, end):
+        """
+        Return a read-only view of the samples in [start, end) without copying.
+        The view stays valid until the producer wraps around past `start`.
+        """
+        if end - start > self.capacity or not self.is_valid(start) or end > self.write_pos:
+            raise ValueError("Requested audio is no longer (or not yet) in the ring buffer.")
+        index = start % self.capacity
+        window = self.data[index:index + (end - start)]
+        window.flags.writeable = False
+        return window
+
+    def available(self):
+        """
+        Number of samples written but not yet read.
+        """
+        with self.cond:
+            return self.write_pos - self.read_pos
+
+    def close(self):
+        """
+        Wake up any waiting reader and stop accepting reads.
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class AudioSegment:
+    def __init__(self, ring, start, end, rate, channels=1):
+        """
+        A recorded utterance described by its offsets in a RingBuffer.
+        Segments are put on the audio queue instead of fresh bytes objects; the
+        samples are only copied when a consumer really needs bytes (e.g. for the
+        speech recognizer).
+
+        Parameters:
+        - ring: The RingBuffer holding the samples.
+        - start, end: Absolute sample positions of the segment.
+        - rate, channels: Audio format of the samples.
+        """
+        self.ring = ring
+        self.start = start
+        self.end = end
+        self.rate = rate
+        self.channels = channels
+
+    @property
+    def samples(self):
+        """
+        Zero-copy view of the segment samples.
+        """
+        return self.ring.view(self.start, self.end)
+
+    @property
+    def duration(self):
+        """
+        Length of the segment in seconds.
+        """
+        return (self.end - self.start) / (self.rate * self.channels)
+
+    def is_valid(self):
+        """
+        True while the segment has not been overwritten by newer audio.
+        """
+        return self.ring.is_valid(self.start)
+
+    def tobytes(self):
+        """
+        Copy the segment out as raw PCM bytes.
+        """
+        return self.samples.tobytes()
+
+    def __bytes__(self):
+        return self.tobytes()
+
+    def __len__(self):
+        # Length in bytes, like the raw audio bytes this replaces.
+        return (self.end - self.start) * self.ring.dtype.itemsize
@@ -8,21 +8,66 @@ import pyttsx3
 
 from mic.microphone import Microphone
 from mic.audioproc import AudioProc
+from mic.recognition import RecognitionPool
+from mic.utterance import Utterance
+from mic.kws import KeywordSpotter
+from metrics import METRICS
+from audiodevice import AUDIO
 
 class SmartMic(Microphone, AudioProc):
     def __init__(self, chunk=1024, format=pyaudio.paInt16, channels=1,
-                 rate=44100, threshold=500, silence_duration=1.0, wake_words=None):
+                 rate=44100, threshold=500, silence_duration=1.0, wake_words=None,
+                 callback_mode=True, buffer_seconds=60, recognition_workers=2,
+                 recognizer_backend=None, recognizer_options=None,
+                 wake_templates=None, keyword_spotter=None, command_timeout=5.0, vad=None,
+                 preroll=0.3, source=None):
         """
         SmartMic monitors the microphone and waits for wake-up words.
         Only after detecting a wake word does it record the subsequent command audio.
+
+        Recorded snippets are recognized on a small worker pool, so the monitor
+        thread keeps consuming audio while a phrase is being transcribed.
+        recognizer_backend/recognizer_options select the speech recognition engine
+        (see AudioProc), e.g. "vosk" to run wake-up checks and commands offline.
+
+        With wake_templates (a directory of WAV recordings such as hey_gpt_1.wav)
+        or a ready KeywordSpotter, wake-up words are spotted on the audio stream
+        itself and only the command that follows is sent to the recognizer.
+        command_timeout is how long to wait for the command to start after it.
+        vad is an optional VoiceActivityDetector shared with Microphone, and
+        preroll the seconds of audio kept before the start of speech.
+        source is an optional AudioSource replacing the live microphone (see Microphone).
         """
-        # Initialize the Microphone part.
-        Microphone.__init__(self, chunk=chunk, format=format, channels=channels,
-                              rate=rate, threshold=threshold, silence_duration=silence_duration)
-        # Initialize the AudioProc part.
-        AudioProc.__init__(self, chunk=chunk, format=format, channels=channels, rate=rate)
+        # Set up the wake-up state first: Microphone.__init__ already starts the monitor thread.
         self.wake_words = wake_words if wake_words is not None else ["hey gpt", "wake up", "hello"]
         self.talk_session_time = 0 #10 * 60  # 10 minutes
+        self.talk_session_tick = time.monotonic()
+        self.command_timeout = command_timeout
+        if source is not None:
+            rate, channels = source.rate, source.channels
+        if keyword_spotter is None and wake_templates is not None:
+            keyword_spotter = KeywordSpotter.from_directory(rate, wake_templates, self.wake_words)
+            if not keyword_spotter.has_templates():
+                print("No wake-up word recordings found in", wake_templates, "- using speech recognition instead.")
+                keyword_spotter = None
+        self.keyword_spotter = keyword_spotter
+        self.recognition = RecognitionPool(self._recognize_segment, self._on_recognized,
+                                           max_workers=recognition_workers,
+                                           max_pending=2 * recognition_workers)
+        # Initialize the AudioProc part.
+        AudioProc.__init__(self, chunk=chunk, format=format, channels=channels, rate=rate,
+                           backend=recognizer_backend, backend_options=recognizer_options)
+        # Initialize the Microphone part.
+        Microphone.__init__(self, chunk=chunk, format=format, channels=channels,
+                              rate=rate, threshold=threshold, silence_duration=silence_duration,
+                              callback_mode=callback_mode, buffer_seconds=buffer_seconds, vad=vad,
+                              preroll=preroll, source=source)
+                
+        self.recognition_seconds = METRICS.histogram("recognition_seconds", "Speech recognition time",
+                                                     backend=self.backend.name)
+        self.wake_counter = METRICS.counter("wake_words_total", "Detected wake-up words")
+        METRICS.gauge("recognition_dropped_total", "Segments dropped because recognition fell behind",
+                      function=lambda: self.recognition.dropped)
                 
         # Override the default monitoring thread with our smart monitoring.
         if not hasattr(self, 'thread') or not self.thread.is_alive():
@@ -33,51 +78,121 @@ class SmartMic(Microphone, AudioProc):
 
     def _monitor(self):
         """
-        Continuously monitor the microphone. When non-silent audio is detected,
-        capture an extended snippet (approx. 1 second) and convert it to text.
-        If a wake-up word is found, record the subsequent command (until 1 second of silence)
-        and add the command audio to the queue.
+        Continuously monitor the microphone.
+
+        With a keyword spotter, every chunk is scored for the wake-up words and
+        only the command recorded after a detected wake-up word is handed to the
+        recognition pool. Otherwise, when non-silent audio is detected, capture an
+        extended snippet (until 1 second of silence) and hand it to the recognition
+        pool; _on_recognized() then does the wake-up word gating on the text.
+        In both cases the monitor goes straight back to reading the microphone.
         """
-        counter = 0
         while self.running:
-            counter += 1
-            self.talk_session_monitoring(counter)
-            data = self.stream.read(self.chunk)
-            if not self._is_silent(data):
-                frames = [data]
-                silence_time = 0.0
-                while self.running:
-                    data = self.stream.read(self.chunk)
-                    frames.append(data)
-                    if self._is_silent(data):
-                        silence_time += self.chunk / self.rate
-                    else:
-                        silence_time = 0.0
-                    if silence_time >= self.silence_duration:
-                        print("Stopping recording since silence for 1 second.")
-                        break
-                    if len(frames) * self.chunk / self.rate >= 20:
-                        print("Maximum recording duration of 20 seconds reached, stopping recording.")
-                        break
-                audio_data = b''.join(frames)
-                text = self.convert_audio_to_text(audio_data)                
-                if self.detect_wakeup_words(text, self.wake_words) or self.get_talk_session():
-                    if not self.get_talk_session():
-                        print("Wake-up word detected: ", text)
-                    self.audio_queue.put(audio_data)
-            else:
+            self.talk_session_monitoring()
+            data = self._read_chunk()
+            if data is None:
+                continue
+            if self.keyword_spotter is not None and not self.get_talk_session():
+                # The VAD sees every chunk, so its noise floor is learned from the
+                # background while waiting, not from the command after the wake-up word.
+                self._is_silent(data)
+                wake_word = self.keyword_spotter.process(data[::self.channels])
+                if wake_word is None:
+                    continue
+                print("Wake-up word detected: ", wake_word)
+                # The command is detected on its own, not as the tail of the wake-up word.
+                self.vad.reset()
+                segment = self._record_segment(self.chunk_start, speech_timeout=self.command_timeout)
+                self.keyword_spotter.reset()
+                if segment is not None:
+                    utterance = Utterance(segment)
+                    utterance.wake_word = wake_word
+                    self.recognition.submit(utterance)
+            elif not self._is_silent(data):
+                segment = self._record_segment(self._preroll_start(self.chunk_start))
+                if segment is not None:
+                    self.recognition.submit(Utterance(segment))
+            elif not self.callback_mode:
                 time.sleep(0.01)
 
+    def _record_segment(self, start, speech_timeout=None):
+        """
+        Keep reading until 1 second of silence (or 20 seconds in total) and return
+        the audio from `start` as an AudioSegment, or None if it was lost.
+
+        With speech_timeout, silence only ends the recording once speech has been
+        heard; if none starts within speech_timeout seconds, None is returned.
+        """
+        max_samples = 20 * self.rate * self.channels
+        heard_speech = speech_timeout is None
+        silence_time = 0.0
+        while self.running:
+            data = self._read_chunk()
+            if data is None:
+                continue
+            if self._is_silent(data):
+                silence_time += self.chunk / self.rate
+            else:
+                silence_time = 0.0
+                heard_speech = True
+            if not heard_speech:
+                if silence_time >= speech_timeout:
+                    print("No command heard after the wake-up word.")
+                    return None
+                start = self._preroll_start(self.chunk_start)
+                continue
+            if silence_time >= self.silence_duration:
+                print("Stopping recording since silence for 1 second.")
+                break
+            if self.chunk_start + self.chunk_samples - start >= max_samples:
+                print("Maximum recording duration of 20 seconds reached, stopping recording.")
+                break
+        if not self.ring.is_valid(start):
+            print("Recording was overwritten before it could be processed, dropping it.")
+            return None
+        return self._make_segment(start, self.chunk_start + self.chunk_samples)
+
+    def _recognize_segment(self, utterance):
+        """
+        Recognition pool worker: transcribe a recorded utterance in place.
+        """
+        if not utterance.audio.is_valid():
+            print("Recording was overwritten before it could be recognized, dropping it.")
+            utterance.set_transcript("")
+            return utterance
+        with self.recognition_seconds.time():
+            text, confidence = self.transcribe(utterance.audio)
+        utterance.set_transcript(text, confidence)
+        return utterance
+
+    def _on_recognized(self, utterance, result):
+        """
+        Called by the recognition pool in recording order.
+        If a wake-up word was spotted or is found in the text (or a talk session
+        is active), queue the transcribed utterance so consumers can reuse its text.
+        """
+        text = utterance.text or ""
+        if utterance.wake_word is None:
+            utterance.wake_word = self.find_wakeup_word(text, self.wake_words)
+        elif not text:
+            # Wake-up word spotted, but the command could not be recognized.
+            return
+        if utterance.wake_word is not None or self.get_talk_session():
+            if not self.get_talk_session():
+                self.wake_counter.inc()
+                print("Wake-up word detected: ", text)
+            self.audio_queue.put(utterance)
+
     def stop(self):
         """
-        Stop monitoring, close the microphone stream, and terminate resources.
+        Stop monitoring, close the audio source, and terminate resources.
         """
         self.running = False
+        self.ring.close()
         self.thread.join()
-        self.stream.stop_stream()
-        self.stream.close()
-        self.p.terminate()
-        self.tts_engine.stop()
+        self.recognition.close()
+        self.source.close()
+        AUDIO.terminate()
         print("SmartMic stopped.")
 
     def set_talk_session(self, session):
@@ -101,9 +216,12 @@ class SmartMic(Microphone, AudioProc):
             talk_session = True
         return talk_session
 
-    def talk_session_monitoring(self, counter):
+    def talk_session_monitoring(self):
         #switch talk session to off after 10 minutes if talk session is on  
-        if counter % 100 == 0:  #the monitoring is every 10ms, so count 100 times for 1 second 
+        #the monitor loop runs at the chunk rate, so count down on the wall clock once per second
+        now = time.monotonic()
+        if now - self.talk_session_tick >= 1.0:
+            self.talk_session_tick = now
             if self.talk_session_time > 0:
                 self.talk_session_time -= 1
                 if self.talk_session_time <= 0:
@@ -115,11 +233,10 @@ class SmartMic(Microphone, AudioProc):
 #         smart_mic = SmartMic()
 #         print("SmartMic is active. Speak the wake-up word followed by your command.")
 #         while True:
-#             command_audio = smart_mic.get_audio(timeout=1)
-#             if command_audio is not None:
-#                 print("Received command audio ({} bytes). Converting to text...".format(len(command_audio)))
-#                 command_text = smart_mic.convert_audio_to_text(command_audio)
-#                 print("Command text:", command_text)
+#             utterance = smart_mic.get_audio(timeout=1)
+#             if utterance is not None:
+#                 print("Received command audio ({} bytes).".format(len(utterance.audio)))
+#                 print("Command text:", utterance.text)
 #     except KeyboardInterrupt:
 #         print("\nKeyboardInterrupt received. Stopping SmartMic...")
 #     finally:
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+import wave
+import numpy as np
+import pyaudio
+
+from audiodevice import AUDIO
+
+class AudioSource:
+    """
+    Where a Microphone gets its audio from.
+
+    A source delivers int16 chunks by calling on_chunk(data) from its own thread
+    once start() has been called (push mode), or hands them out through read()
+    for the blocking capture mode. `rate` and `channels` describe the audio.
+    """
+    rate = None
+    channels = None
+
+    def start(self, on_chunk, pending=None):
+        raise NotImplementedError
+
+    def read(self, frames):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyAudioSource(AudioSource):
+    def __init__(self, chunk=1024, format=pyaudio.paInt16, channels=1, rate=44100, callback_mode=True):
+        """
+        Live microphone input through PortAudio.
+        In callback mode PortAudio pushes every captured chunk to on_chunk from
+        its own thread; otherwise chunks are pulled with read().
+        """
+        self.chunk = chunk
+        self.format = format
+        self.channels = channels
+        self.rate = rate
+        self.callback_mode = callback_mode
+        self.on_chunk = None
+        self.stream = None
+
+    def start(self, on_chunk, pending=None):
+        self.on_chunk = on_chunk
+        self.stream = AUDIO.open(format=self.format,
+                                 channels=self.channels,
+                                 rate=self.rate,
+                                 input=True,
+                                 frames_per_buffer=self.chunk,
+                                 stream_callback=self._capture_callback if self.callback_mode else None)
+
+    def _capture_callback(self, in_data, frame_count, time_info, status_flags):
+        """
+        PortAudio stream callback: hand the captured chunk on.
+        Must stay short and never block.
+        """
+        self.on_chunk(in_data)
+        return (None, pyaudio.paContinue)
+
+    def read(self, frames):
+        return self.stream.read(frames, exception_on_overflow=False)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+
+class ArraySource(AudioSource):
+    def __init__(self, samples, rate, channels=1, chunk=1024, speed=0.0, tail_silence=2.0,
+                 max_pending=1.0):
+        """
+        Replay recorded int16 samples as if they came from a microphone.
+
+        Parameters:
+        - samples: Interleaved int16 samples.
+        - rate, channels: Format of the samples.
+        - chunk: Frames per delivered chunk.
+        - speed: 1.0 replays in real time, 2.0 twice as fast; 0 means as fast as
+          the consumer keeps up.
+        - tail_silence: Seconds of silence appended so the last utterance closes.
+        - max_pending: Seconds of undelivered audio allowed in the consumer's
+          buffer before the source waits (keeps fast replay from overrunning it).
+        """
+        tail = np.zeros(int(tail_silence * rate) * channels, dtype=np.int16)
+        self.samples = np.concatenate((np.asarray(samples, dtype=np.int16), tail))
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.speed = speed
+        self.max_pending = int(max_pending * rate) * channels
+        self.position = 0
+        self.finished = threading.Event()
+        self.closed = threading.Event()
+        # Wall-clock time at which each chunk was delivered, for latency reports.
+        self.delivered_at = []
+        self.thread = None
+
+    def start(self, on_chunk, pending=None):
+        if on_chunk is None:
+            # Blocking capture mode: chunks are pulled with read().
+            return
+        self.thread = threading.Thread(target=self._run, args=(on_chunk, pending), daemon=True)
+        self.thread.start()
+
+    def _run(self, on_chunk, pending):
+        step = self.chunk * self.channels
+        started = time.perf_counter()
+        for offset in range(0, len(self.samples) - step + 1, step):
+            if self.closed.is_set():
+                break
+            if self.speed > 0:
+                due = started + offset / self.channels / self.rate / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            elif pending is not None:
+                while pending() > self.max_pending and not self.closed.is_set():
+                    time.sleep(0.001)
+            self.delivered_at.append(time.time())
+            on_chunk(self.samples[offset:offset + step])
+            self.position = offset + step
+        self.finished.set()
+
+    def read(self, frames):
+        """
+        Blocking-mode read; returns silence once the recording is exhausted.
+        """
+        step = frames * self.channels
+        data = self.samples[self.position:self.position + step]
+        self.position += step
+        self.delivered_at.append(time.time())
+        if len(data) < step:
+            self.finished.set()
+            data = np.concatenate((data, np.zeros(step - len(data), dtype=np.int16)))
+        return data.tobytes()
+
+    def wall_time(self, sample_pos):
+        """
+        Wall-clock time at which the sample at `sample_pos` was delivered (None if not yet).
+        """
+        index = sample_pos // (self.chunk * self.channels)
+        if index < len(self.delivered_at):
+            return self.delivered_at[index]
+        return None
+
+    def wait(self, timeout=None):
+        """
+        Wait until the whole recording has been delivered.
+        """
+        return self.finished.wait(timeout)
+
+    def close(self):
+        self.closed.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+class WavFileSource(ArraySource):
+    def __init__(self, path, chunk=1024, speed=0.0, tail_silence=2.0):
+        """
+        Replay a 16-bit PCM WAV file (see ArraySource for the options).
+        """
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit PCM WAV files are supported.")
+            rate = wav.getframerate()
+            channels = wav.getnchannels()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        self.path = path
+        self.name = os.path.basename(path)
+        super().__init__(samples, rate, channels=channels, chunk=chunk, speed=speed,
+                         tail_silence=tail_silence)
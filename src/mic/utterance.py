@@ -0,0 +1,54 @@
+import time
+
+class Utterance:
+    def __init__(self, audio, text=None, confidence=None, captured_at=None):
+        """
+        A recorded utterance as it travels through the audio queue: the audio
+        segment plus everything already learned about it, so consumers reuse
+        the transcript instead of recognizing the same audio again.
+
+        Parameters:
+        - audio: The AudioSegment holding the recorded samples.
+        - text: Transcript, or None if the audio has not been recognized yet.
+        - confidence: Recognizer confidence (0..1), if the backend reports one.
+        - captured_at: Wall-clock time the recording was closed (defaults to now).
+        """
+        self.audio = audio
+        self.text = text
+        self.confidence = confidence
+        self.captured_at = captured_at if captured_at is not None else time.time()
+        self.recognized_at = None
+        self.wake_word = None
+
+    @property
+    def start_time(self):
+        """
+        Stream time (seconds since capture started) of the first sample.
+        """
+        return self.audio.start / (self.audio.rate * self.audio.channels)
+
+    @property
+    def end_time(self):
+        """
+        Stream time (seconds since capture started) just after the last sample.
+        """
+        return self.audio.end / (self.audio.rate * self.audio.channels)
+
+    @property
+    def duration(self):
+        return self.audio.duration
+
+    def set_transcript(self, text, confidence=None):
+        """
+        Record the recognition result and when it became available.
+        """
+        self.text = text
+        self.confidence = confidence
+        self.recognized_at = time.time()
+
+    def __bytes__(self):
+        return bytes(self.audio)
+
+    def __repr__(self):
+        return (f"Utterance(text={self.text!r}, confidence={self.confidence}, "
+                f"start={self.start_time:.2f}s, duration={self.duration:.2f}s)")
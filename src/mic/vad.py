@@ -0,0 +1,134 @@
+import numpy as np
+
+class VoiceActivityDetector:
+    def __init__(self, rate, min_level=500, start_ratio=3.0, stop_ratio=2.0, hangover=0.2,
+                 frame_duration=None, floor_rise=0.02, floor_fall=0.3, speech_floor_rise=0.001,
+                 spectral=False, max_zcr=0.35, band=(300, 3400), min_band_ratio=0.4):
+        """
+        Energy based voice activity detection with an adaptive noise floor.
+
+        The noise floor follows the mean absolute amplitude of non-speech frames
+        (quickly downwards, slowly upwards, and very slowly while speech is
+        active so a noisy room cannot keep a recording open forever). A frame
+        starts speech when its level exceeds start_ratio x floor and speech ends
+        once the level stays under stop_ratio x floor for `hangover` seconds.
+
+        Parameters:
+        - rate: Sample rate of the audio.
+        - min_level: Levels below this are never speech, whatever the floor
+          (the old fixed `threshold`).
+        - start_ratio, stop_ratio: Hysteresis thresholds relative to the floor.
+        - hangover: Seconds speech is held after the level drops.
+        - frame_duration: Frame length in seconds, used to convert hangover into
+          frames; taken from the first frame seen when not given.
+        - floor_rise, floor_fall, speech_floor_rise: Noise floor adaptation rates.
+        - spectral: Also require speech-like zero-crossing rate and band energy.
+        - max_zcr: Maximum zero-crossing rate (crossings per sample) of speech.
+        - band, min_band_ratio: Minimum share of energy in the speech band (Hz).
+        """
+        self.rate = rate
+        self.min_level = min_level
+        self.start_ratio = start_ratio
+        self.stop_ratio = stop_ratio
+        self.hangover = hangover
+        self.hangover_frames = None
+        if frame_duration is not None:
+            self.hangover_frames = int(round(hangover / frame_duration))
+        self.floor_rise = floor_rise
+        self.floor_fall = floor_fall
+        self.speech_floor_rise = speech_floor_rise
+        self.spectral = spectral
+        self.max_zcr = max_zcr
+        self.band = band
+        self.min_band_ratio = min_band_ratio
+
+        self.floor = None
+        self.speaking = False
+        self.quiet_frames = 0
+        self.scratch = np.zeros(0, dtype=np.float32)
+
+    def frame_features(self, frames):
+        """
+        Vectorized features for a (n_frames, frame_len) array of samples.
+
+        Returns:
+          tuple: (level, zcr, band_ratio) arrays; zcr and band_ratio are None
+          unless spectral features are enabled.
+        """
+        frames = np.asarray(frames, dtype=np.float32)
+        level = np.abs(frames).mean(axis=1)
+        if not self.spectral:
+            return level, None, None
+        signs = np.signbit(frames)
+        zcr = (signs[:, 1:] != signs[:, :-1]).mean(axis=1)
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        freqs = np.fft.rfftfreq(frames.shape[1], 1.0 / self.rate)
+        in_band = (freqs >= self.band[0]) & (freqs <= self.band[1])
+        band_ratio = power[:, in_band].sum(axis=1) / np.maximum(power.sum(axis=1), 1e-9)
+        return level, zcr, band_ratio
+
+    def classify(self, frames):
+        """
+        Classify many frames at once. Features are computed in one batch; only the
+        noise floor / hysteresis state machine runs per frame, on scalars.
+
+        Returns:
+          numpy.ndarray: Boolean array, True for frames that are speech.
+        """
+        frames = np.asarray(frames)
+        if self.hangover_frames is None:
+            self.hangover_frames = int(round(self.hangover * self.rate / frames.shape[1]))
+        level, zcr, band_ratio = self.frame_features(frames)
+        voiced = np.ones(len(level), dtype=bool)
+        if self.spectral:
+            voiced = (zcr <= self.max_zcr) & (band_ratio >= self.min_band_ratio)
+        return np.array([self._update(lvl, ok) for lvl, ok in zip(level.tolist(), voiced.tolist())],
+                        dtype=bool)
+
+    def is_speech(self, chunk):
+        """
+        Classify a single chunk of samples (bytes or an int16 array).
+        """
+        if not isinstance(chunk, np.ndarray):
+            chunk = np.frombuffer(chunk, dtype=np.int16)
+        if self.spectral:
+            return bool(self.classify(chunk[None, :])[0])
+        if self.hangover_frames is None:
+            self.hangover_frames = int(round(self.hangover * self.rate / len(chunk)))
+        # Level of one chunk without allocating: widen into reusable scratch space.
+        if len(self.scratch) < len(chunk):
+            self.scratch = np.zeros(len(chunk), dtype=np.float32)
+        level = self.scratch[:len(chunk)]
+        np.copyto(level, chunk)
+        np.abs(level, out=level)
+        return self._update(float(level.mean()), True)
+
+    def _update(self, level, voiced):
+        if self.floor is None:
+            self.floor = level
+        start_level = max(self.min_level, self.floor * self.start_ratio)
+        stop_level = max(self.min_level, self.floor * self.stop_ratio)
+        if not self.speaking:
+            if voiced and level >= start_level:
+                self.speaking = True
+                self.quiet_frames = 0
+        elif level < stop_level or not voiced:
+            self.quiet_frames += 1
+            if self.quiet_frames > self.hangover_frames:
+                self.speaking = False
+        else:
+            self.quiet_frames = 0
+
+        if self.speaking:
+            rate = self.speech_floor_rise
+        else:
+            rate = self.floor_rise if level > self.floor else self.floor_fall
+        self.floor += rate * (level - self.floor)
+        return self.speaking
+
+    def reset(self):
+        """
+        Forget the speech state (the learned noise floor is kept).
+        """
+        self.speaking = False
+        self.quiet_frames = 0
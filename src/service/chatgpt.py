@@ -1,13 +1,145 @@
-from openai import OpenAI
+import asyncio
+import concurrent.futures
+import threading
+import time
+from openai import AsyncOpenAI, OpenAI
+
+from metrics import METRICS
+from service.conversation import DEFAULT_SYSTEM_PROMPT, Conversation
+from service.responsecache import shared_response_cache
+
+class GPTStream:
+    def __init__(self, response=None, on_complete=None):
+        """
+        Iterable of text deltas from a streamed chat completion.
+        cancel() may be called from another thread; it closes the HTTP response
+        so the upstream generation stops as well. on_complete(text) is called
+        with the whole answer once the stream has been read to the end.
+        """
+        self.response = response
+        self.on_complete = on_complete
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+
+    def __iter__(self):
+        if self.response is None:
+            return
+        parts = []
+        try:
+            for chunk in self.response:
+                if self.cancelled.is_set():
+                    break
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        METRICS.histogram("gpt_first_token_seconds", "Time to the first streamed token").observe(
+                            time.perf_counter() - self.started)
+                    parts.append(delta)
+                    yield delta
+            if not self.cancelled.is_set() and parts and self.on_complete is not None:
+                self.on_complete("".join(parts))
+        except Exception as e:
+            if not self.cancelled.is_set():
+                METRICS.counter("gpt_errors_total", "Failed ChatGPT requests").inc()
+                print(f"An error occurred while streaming: {e}")
+        finally:
+            self.response.close()
+
+    def cancel(self):
+        """
+        Stop the stream, e.g. when playback is interrupted.
+        """
+        self.cancelled.set()
+        if self.response is not None:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+
+class AsyncGPTStream:
+    def __init__(self, response=None, loop=None, on_complete=None, read_timeout=30.0):
+        """
+        Text deltas from a chat completion streamed with AsyncOpenAI.
+        Iterate it with `async for` on its event loop, or with a plain `for`
+        from another thread (e.g. the playback feeder); cancel() may be called
+        from any thread. on_complete is as for GPTStream.
+        A plain `for` ends if the loop stops or no delta arrives within
+        `read_timeout` seconds, rather than waiting forever.
+        """
+        self.response = response
+        self.on_complete = on_complete
+        self.loop = loop
+        self.read_timeout = read_timeout
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+
+    async def __aiter__(self):
+        if self.response is None:
+            return
+        parts = []
+        try:
+            async for chunk in self.response:
+                if self.cancelled.is_set():
+                    break
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        METRICS.histogram("gpt_first_token_seconds", "Time to the first streamed token").observe(
+                            time.perf_counter() - self.started)
+                    parts.append(delta)
+                    yield delta
+            if not self.cancelled.is_set() and parts and self.on_complete is not None:
+                self.on_complete("".join(parts))
+        except Exception as e:
+            if not self.cancelled.is_set():
+                METRICS.counter("gpt_errors_total", "Failed ChatGPT requests").inc()
+                print(f"An error occurred while streaming: {e}")
+        finally:
+            await self.response.close()
+
+    def __iter__(self):
+        if self.response is None:
+            return
+        deltas = self.__aiter__()
+        try:
+            # A stopped loop would never run the coroutine.
+            while not self.cancelled.is_set() and self.loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(deltas.__anext__(), self.loop)
+                try:
+                    delta = future.result(self.read_timeout)
+                except StopAsyncIteration:
+                    break
+                except concurrent.futures.TimeoutError:
+                    future.cancel()
+                    print("The answer stream stalled, giving up on it")
+                    break
+                yield delta
+        finally:
+            if self.loop.is_running():
+                asyncio.run_coroutine_threadsafe(deltas.aclose(), self.loop)
+
+    def cancel(self):
+        """
+        Stop the stream, e.g. when playback is interrupted.
+        """
+        self.cancelled.set()
+        if self.response is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.response.close(), self.loop)
 
 class GPTClient:
-    def __init__(self, api_key=None, model=None):
+    def __init__(self, api_key=None, model=None, cache=None):
         """
         Initializes the GPTClient with your OpenAI API key.
         
         Parameters:
           api_key (str): Your OpenAI API key.
           model (str): The model to use, e.g. "gpt-3.5-turbo" or "gpt-4". Default is "gpt-3.5-turbo".
+          cache (ResponseCache): (Optional) Cache of answers to repeated questions,
+            or True for the shared one; default is no cache.
         """
         #if api_key is empty or none then use the default key
         if api_key is None or api_key == "":
@@ -18,31 +150,177 @@ class GPTClient:
             model = "gpt-4o-mini"
         self.model = model
         self.client = OpenAI(api_key=api_key)
+        # Used by the *_async methods (e.g. from HomeSpeaker's event loop).
+        self.async_client = AsyncOpenAI(api_key=api_key)
+        # Rolling history while a conversation is active (see start_conversation()).
+        self.conversation = None
+        self.cache = shared_response_cache() if cache is True else (cache or None)
+
+    def start_conversation(self, system_prompt=DEFAULT_SYSTEM_PROMPT, max_tokens=3000, summarize=True):
+        """
+        Keep the history of the following questions that use `system_prompt`,
+        within a budget of `max_tokens` (see Conversation).
+
+        Returns:
+          Conversation: The new conversation.
+        """
+        self.conversation = Conversation(system_prompt, max_tokens=max_tokens, model=self.model,
+                                         summarizer=self.summarize_history if summarize else None)
+        return self.conversation
+
+    def end_conversation(self):
+        self.conversation = None
 
-    def ask(self, question, system_prompt="You are a helpful assistant."):
+    def summarize_history(self, summary, messages):
+        """
+        Fold dropped conversation turns into a short running summary.
+        """
+        lines = [f"Summary so far: {summary}"] if summary else []
+        lines.extend(f"{message['role']}: {message['content']}" for message in messages)
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "Summarize this conversation in a few sentences, "
+                                              "keeping names, facts and open questions."},
+                {"role": "user", "content": "\n".join(lines)},
+            ],
+            temperature=0.2
+        )
+        return response.choices[0].message.content.strip()
+
+    def _conversation_for(self, system_prompt):
+        conversation = self.conversation
+        if conversation is not None and conversation.system_prompt == system_prompt:
+            return conversation
+        return None
+
+    def _messages(self, question, system_prompt):
+        conversation = self._conversation_for(system_prompt)
+        if conversation is not None:
+            return conversation.messages(question)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question},
+        ]
+
+    def _cache_namespace(self, system_prompt):
+        return f"gpt:{self.model}:{system_prompt}"
+
+    def _cached(self, question, system_prompt, cache):
+        """
+        The cached answer, if caching applies. Answers within a conversation
+        depend on its history, so they are neither looked up nor stored.
+        """
+        if not cache or self.cache is None or self._conversation_for(system_prompt) is not None:
+            return None
+        return self.cache.get(question, self._cache_namespace(system_prompt))
+
+    def _on_answer(self, question, system_prompt, cache):
+        """
+        Callback recording the answer to `question` in the active conversation,
+        or in the response cache.
+        """
+        conversation = self._conversation_for(system_prompt)
+        if conversation is not None:
+            return lambda answer: conversation.add_exchange(question, answer)
+        if cache and self.cache is not None:
+            return lambda answer: self.cache.put(question, answer, self._cache_namespace(system_prompt))
+        return None
+
+    def ask(self, question, system_prompt=DEFAULT_SYSTEM_PROMPT, stream=False, cache=True):
         """
         Sends a question to ChatGPT and returns the response.
         
         Parameters:
           question (str): The question or prompt for ChatGPT.
           system_prompt (str): (Optional) A system prompt to set the assistant's behavior.
+          stream (bool): (Optional) Return the answer incrementally as a GPTStream.
+          cache (bool): (Optional) Answer from / store in the response cache.
         
         Returns:
-          str: The ChatGPT response.
+          str: The ChatGPT response, or a GPTStream of text deltas when stream=True.
         """
+        if stream:
+            return self.ask_stream(question, system_prompt, cache)
+        cached = self._cached(question, system_prompt, cache)
+        if cached is not None:
+            return cached
+        try:
+            with METRICS.timer("gpt_request_seconds", "ChatGPT request time"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    store=True,
+                    messages=self._messages(question, system_prompt),
+                    temperature=0.7  # You can adjust the temperature if needed
+                )
+            answer = response.choices[0].message.content.strip()
+        except Exception as e:
+            METRICS.counter("gpt_errors_total", "Failed ChatGPT requests").inc()
+            return f"An error occurred: {e}"
+        on_answer = self._on_answer(question, system_prompt, cache)
+        if on_answer is not None:
+            on_answer(answer)
+        return answer
+
+    def ask_stream(self, question, system_prompt=DEFAULT_SYSTEM_PROMPT, cache=True):
+        """
+        Sends a question to ChatGPT and streams the response.
+
+        Returns:
+          GPTStream: Iterable of text deltas; empty if the request failed.
+          A cached answer is returned as a single delta.
+        """
+        cached = self._cached(question, system_prompt, cache)
+        if cached is not None:
+            return iter([cached])
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
                 store=True,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": question},
-                ],
-                temperature=0.7  # You can adjust the temperature if needed
+                messages=self._messages(question, system_prompt),
+                temperature=0.7,
+                stream=True
             )
-            return response.choices[0].message.content.strip()
         except Exception as e:
+            METRICS.counter("gpt_errors_total", "Failed ChatGPT requests").inc()
+            print(f"An error occurred: {e}")
+            return GPTStream()
+        return GPTStream(response, self._on_answer(question, system_prompt, cache))
+
+    async def ask_async(self, question, system_prompt=DEFAULT_SYSTEM_PROMPT, stream=False, cache=True):
+        """
+        Coroutine version of ask(), using AsyncOpenAI so that awaiting it does
+        not block the event loop and cancelling it aborts the request.
+
+        Returns:
+          str: The ChatGPT response, or an AsyncGPTStream of text deltas when stream=True.
+        """
+        cached = self._cached(question, system_prompt, cache)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+        try:
+            with METRICS.timer("gpt_request_seconds", "ChatGPT request time"):
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    store=True,
+                    messages=self._messages(question, system_prompt),
+                    temperature=0.7,
+                    stream=stream
+                )
+        except Exception as e:
+            METRICS.counter("gpt_errors_total", "Failed ChatGPT requests").inc()
+            if stream:
+                print(f"An error occurred: {e}")
+                return AsyncGPTStream()
             return f"An error occurred: {e}"
+        if stream:
+            return AsyncGPTStream(response, asyncio.get_running_loop(),
+                                  self._on_answer(question, system_prompt, cache))
+        answer = response.choices[0].message.content.strip()
+        on_answer = self._on_answer(question, system_prompt, cache)
+        if on_answer is not None:
+            on_answer(answer)
+        return answer
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # Token counts are estimated without it (see estimate_tokens()).
+    tiktoken = None
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+# Tokens the API adds around every message.
+MESSAGE_OVERHEAD = 4
+
+_encodings = {}
+_warned = False
+
+def estimate_tokens(text):
+    """
+    Token count without a tokenizer: about four ASCII characters per token,
+    and a token for every other character, so non-English text is not undercounted.
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return max(1, (ascii_chars + 3) // 4 + len(text) - ascii_chars)
+
+
+def _encoding(model):
+    global _warned
+    if model in _encodings:
+        return _encodings[model]
+    encoding = None
+    if tiktoken is not None:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model or "")
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # E.g. the encoding could not be downloaded.
+            print(f"Failed to load the tiktoken encoding: {e}")
+    if encoding is None and not _warned:
+        _warned = True
+        print("tiktoken is not available, token counts are estimated (pip install tiktoken)")
+    _encodings[model] = encoding
+    return encoding
+
+
+def count_tokens(text, model=None):
+    """
+    Number of tokens in `text` for `model`, using tiktoken when it is available
+    and estimate_tokens() otherwise.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
+
+
+class Conversation:
+    def __init__(self, system_prompt=DEFAULT_SYSTEM_PROMPT, max_tokens=3000, reserve_tokens=500,
+                 trim_to=0.5, model=None, summarizer=None):
+        """
+        Rolling chat history kept within a token budget (e.g. for talk mode).
+
+        The system prompt always comes first and never changes, and old turns
+        are dropped in batches rather than one per turn, so consecutive
+        requests share a long identical prefix and the provider's prompt
+        caching applies.
+
+        Parameters:
+        - system_prompt: Stable first message.
+        - max_tokens: Budget for the prompt (system prompt, summary and history).
+        - reserve_tokens: Room kept free for the next question.
+        - trim_to: When over budget, drop the oldest turns down to this fraction of it.
+        - model: Model name used to pick the tokenizer.
+        - summarizer: Optional callable(summary, messages) -> str folding dropped
+          turns into a running summary; it runs in the background.
+        """
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.reserve_tokens = reserve_tokens
+        self.trim_to = trim_to
+        self.model = model
+        self.summarizer = summarizer
+        self.system_tokens = count_tokens(system_prompt, model) + MESSAGE_OVERHEAD
+        # List of (message, tokens).
+        self.history = []
+        self.summary = None
+        self.summary_tokens = 0
+        self.lock = threading.Lock()
+
+    def messages(self, question):
+        """
+        The messages to send for a new question.
+        """
+        messages = [{"role": "system", "content": self.system_prompt}]
+        with self.lock:
+            if self.summary:
+                messages.append({"role": "system",
+                                 "content": f"Summary of the earlier conversation: {self.summary}"})
+            messages.extend(message for message, _ in self.history)
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def tokens(self):
+        with self.lock:
+            return self.system_tokens + self.summary_tokens + sum(tokens for _, tokens in self.history)
+
+    def add_exchange(self, question, answer):
+        """
+        Record a question and its answer, trimming the history if it is over budget.
+        """
+        with self.lock:
+            for role, content in (("user", question), ("assistant", answer)):
+                message = {"role": role, "content": content}
+                self.history.append((message, count_tokens(content, self.model) + MESSAGE_OVERHEAD))
+        self.trim()
+
+    def trim(self):
+        with self.lock:
+            used = self.system_tokens + self.summary_tokens + sum(tokens for _, tokens in self.history)
+            if used + self.reserve_tokens <= self.max_tokens:
+                return
+            target = self.max_tokens * self.trim_to
+            dropped = []
+            # Drop whole question/answer pairs, oldest first.
+            while self.history and used > target:
+                for _ in range(2):
+                    if self.history:
+                        message, tokens = self.history.pop(0)
+                        dropped.append(message)
+                        used -= tokens
+            summary = self.summary
+        if dropped and self.summarizer is not None:
+            threading.Thread(target=self._summarize, args=(summary, dropped), daemon=True).start()
+
+    def _summarize(self, summary, dropped):
+        try:
+            summary = self.summarizer(summary, dropped)
+        except Exception as e:
+            print(f"Failed to summarize the conversation: {e}")
+            return
+        if summary:
+            with self.lock:
+                self.summary = summary
+                self.summary_tokens = count_tokens(summary, self.model) + MESSAGE_OVERHEAD
+
+    def clear(self):
+        with self.lock:
+            self.history = []
+            self.summary = None
+            self.summary_tokens = 0
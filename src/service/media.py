@@ -0,0 +1,423 @@
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from metrics import METRICS
+
+class MediaError(Exception):
+    pass
+
+
+class MediaBackend:
+    """
+    Where videos are played. Methods that a backend cannot do return False.
+    """
+    name = "media"
+    # Plays separate video and audio streams together (see play(audio_url=...)).
+    merges_streams = False
+
+    def start(self):
+        """
+        Get ready to play, e.g. start a resident process.
+        """
+        pass
+
+    def play(self, url, title=None, audio_url=None):
+        """
+        Play `url` now; audio_url is its separate audio stream, if any.
+        """
+        raise NotImplementedError
+
+    def enqueue(self, url, title=None, audio_url=None):
+        """
+        Play `url` after the current video.
+        """
+        return self.play(url, title, audio_url)
+
+    def pause(self):
+        return False
+
+    def resume(self):
+        return False
+
+    def stop(self):
+        pass
+
+    def add_end_listener(self, listener):
+        """
+        Call listener(error) when playback ends on its own: error is None once
+        the playlist is done, or the reason a video failed to load. Backends
+        that cannot tell never call it.
+        """
+        pass
+
+    def duck(self, ducked):
+        """
+        Lower the volume while the speaker talks over the video (see
+        PlaybackScheduler.add_duck_listener).
+        """
+        pass
+
+    def close(self):
+        """
+        Release the backend; the current video may keep playing.
+        """
+        pass
+
+
+class MpvBackend(MediaBackend):
+    name = "mpv"
+    merges_streams = True
+
+    def __init__(self, path=None, socket_path=None, volume=100, duck_volume=30, timeout=2.0, args=()):
+        """
+        A resident mpv player controlled over its JSON IPC socket. The process
+        is started once, idles between videos and is restarted if it exits,
+        so play, pause, resume and stop take milliseconds instead of a
+        browser cold start.
+
+        Parameters:
+        - path: mpv executable (default: found on PATH).
+        - socket_path: IPC socket, or named pipe on Windows (default: per process).
+        - volume, duck_volume: Volume (0-100) normally and while ducked.
+        - timeout: Seconds to wait for the process to start and for each reply.
+        - args: Extra mpv command line arguments.
+        """
+        self.path = path or self.find()
+        if not self.path:
+            raise MediaError("mpv not found. Please install mpv or provide its full path.")
+        if socket_path is None:
+            if platform.system() == "Windows":
+                socket_path = rf"\\.\pipe\voicegpt-mpv-{os.getpid()}"
+            else:
+                socket_path = os.path.join(tempfile.gettempdir(), f"voicegpt-mpv-{os.getpid()}.sock")
+        self.socket_path = socket_path
+        self.volume = volume
+        self.duck_volume = duck_volume
+        self.timeout = timeout
+        self.args = list(args)
+        self.process = None
+        self.conn = None
+        self.request_id = 0
+        self.lock = threading.Lock()
+        # Second connection, read by a thread, for the events of the player.
+        self.events = None
+        self.end_listeners = []
+        # Set by play() until the new file starts, so an idle event from the
+        # stop before it is not taken for the end of the new video.
+        self.loading = False
+
+    @staticmethod
+    def find():
+        return shutil.which("mpv")
+
+    def start(self):
+        """
+        Start the player process if it is not running (e.g. ahead of the first video).
+        """
+        with self.lock:
+            self._connect()
+
+    def _connect(self):
+        if self.conn is not None and self.process is not None and self.process.poll() is None:
+            return
+        self._disconnect()
+        if self.process is None or self.process.poll() is not None:
+            if os.path.exists(self.socket_path) and not self.socket_path.startswith("\\\\"):
+                os.remove(self.socket_path)
+            with METRICS.timer("media_start_seconds", "Media player start time"):
+                self.process = subprocess.Popen(
+                    [self.path, "--idle=yes", "--no-terminal", "--keep-open=no",
+                     f"--volume={self.volume}", f"--input-ipc-server={self.socket_path}"] + self.args,
+                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # The socket appears once mpv has started.
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self.conn = self._open()
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    raise MediaError("Could not connect to mpv")
+                time.sleep(0.02)
+        try:
+            self.events = self._open(timeout=None)
+            self.events.write(b'{"command": ["observe_property", 1, "idle-active"]}\n')
+            self.events.flush()
+        except OSError as e:
+            # Commands still work; only the end of videos goes unnoticed.
+            print(f"Failed to watch mpv events: {e}")
+            self.events = None
+            return
+        threading.Thread(target=self._read_events, args=(self.events,), daemon=True).start()
+
+    def _open(self, timeout=-1):
+        if platform.system() == "Windows":
+            return open(self.socket_path, "r+b", buffering=0)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(self.timeout if timeout == -1 else timeout)
+        return sock.makefile("rwb")
+
+    def _disconnect(self):
+        for conn in (self.conn, self.events):
+            if conn is not None:
+                try:
+                    conn.close()
+                except OSError:
+                    pass
+        self.conn = None
+        self.events = None
+
+    def _read_events(self, conn):
+        try:
+            for line in conn:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                self._on_event(event)
+        except (OSError, ValueError):
+            # Closed by _disconnect(), or the player exited.
+            pass
+
+    def _on_event(self, event):
+        name = event.get("event")
+        if name == "start-file":
+            self.loading = False
+        elif name == "end-file" and event.get("reason") == "error":
+            METRICS.counter("media_errors_total", "Videos the media player failed to load").inc()
+            self._ended(event.get("file_error") or "unknown error")
+        elif name == "property-change" and event.get("name") == "idle-active":
+            if event.get("data") and not self.loading:
+                self._ended(None)
+
+    def _ended(self, error):
+        for listener in list(self.end_listeners):
+            try:
+                listener(error)
+            except Exception as e:
+                print(f"Media end listener failed: {e}")
+
+    def add_end_listener(self, listener):
+        self.end_listeners.append(listener)
+
+    def command(self, *args, start=True):
+        """
+        Send one IPC command and return its data.
+        Replies are read in turn; events in between are skipped.
+        """
+        with self.lock:
+            if start:
+                self._connect()
+            elif self.conn is None:
+                return None
+            self.request_id += 1
+            request_id = self.request_id
+            try:
+                with METRICS.timer("media_command_seconds", "Media player command time"):
+                    self.conn.write(json.dumps({"command": list(args), "request_id": request_id}).encode() + b"\n")
+                    self.conn.flush()
+                    while True:
+                        line = self.conn.readline()
+                        if not line:
+                            raise OSError("mpv closed the connection")
+                        reply = json.loads(line)
+                        if reply.get("request_id") == request_id:
+                            break
+            except (OSError, ValueError) as e:
+                self._disconnect()
+                raise MediaError(f"mpv command {args[0]} failed: {e}")
+        if reply.get("error") != "success":
+            raise MediaError(f"mpv command {args[0]} failed: {reply.get('error')}")
+        return reply.get("data")
+
+    @staticmethod
+    def _merged(url, audio_url):
+        """
+        One mpv EDL source with the video and audio streams, the way mpv's own
+        ytdl hook plays them.
+        """
+        if audio_url is None:
+            return url
+        streams = [f"!no_clip;!no_chapters;%{len(u.encode())}%{u};" for u in (url, audio_url)]
+        return "edl://" + "!new_stream;".join(streams)
+
+    def play(self, url, title=None, audio_url=None):
+        """
+        Start `url` now. It loads in the background: if it cannot be played,
+        the end listeners are called with the error.
+        """
+        self.loading = True
+        try:
+            self.command("loadfile", self._merged(url, audio_url), "replace")
+        except MediaError:
+            self.loading = False
+            raise
+        self.command("set_property", "pause", False)
+        return True
+
+    def enqueue(self, url, title=None, audio_url=None):
+        # Starts right away if nothing is playing.
+        self.command("loadfile", self._merged(url, audio_url), "append-play")
+        return True
+
+    def pause(self):
+        self.command("set_property", "pause", True, start=False)
+        return True
+
+    def resume(self):
+        self.command("set_property", "pause", False, start=False)
+        return True
+
+    def stop(self):
+        """
+        Stop and clear the playlist; the process stays up for the next video.
+        """
+        try:
+            self.command("stop", start=False)
+        except MediaError as e:
+            print(f"Failed to stop mpv: {e}")
+
+    def duck(self, ducked):
+        try:
+            self.command("set_property", "volume", self.duck_volume if ducked else self.volume, start=False)
+        except MediaError as e:
+            print(f"Failed to set the mpv volume: {e}")
+
+    def close(self):
+        try:
+            self.command("quit", start=False)
+        except MediaError:
+            pass
+        with self.lock:
+            self._disconnect()
+            if self.process is not None:
+                try:
+                    self.process.wait(timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                self.process = None
+
+
+class BrowserBackend(MediaBackend):
+    name = "browser"
+
+    def __init__(self):
+        """
+        Opens each video in a new browser window: Microsoft Edge on Windows,
+        Chrome (chromium-browser) on Linux and macOS.
+        """
+        self.browser_process = None
+        self.system = platform.system()
+        if self.system == "Windows":
+            # On Windows, use Microsoft Edge.
+            self.browser_cmd = self._find_edge_windows()
+            if not self.browser_cmd:
+                raise Exception("Microsoft Edge not found on Windows. Please install Edge or provide its full path.")
+        elif self.system == "Linux":
+            # On Linux, use Google Chrome.
+            self.browser_cmd = self._find_chrome_linux()
+            if not self.browser_cmd:
+                raise Exception("Google Chrome not found on Linux. Please install Chrome or provide its full path.")
+        elif self.system == "Darwin":
+            # On macOS, use Google Chrome.
+            self.browser_cmd = self._find_chrome_mac()
+            if not self.browser_cmd:
+                raise Exception("Google Chrome not found on macOS. Please install Chrome or provide its full path.")
+        else:
+            raise Exception("Unsupported OS")
+
+    def _find_edge_windows(self):
+        edge_path = shutil.which("msedge")
+        if edge_path:
+            return edge_path
+        potential_paths = [
+            r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
+            r"C:\Program Files\Microsoft\Edge\Application\msedge.exe"
+        ]
+        for path in potential_paths:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _find_chrome_linux(self):
+        try:
+            # Check if chromium-browser is installed
+            result = subprocess.run(['which', 'chromium-browser'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+            # If the result is empty, chromium-browser is not installed
+            if not result.stdout:
+                raise EnvironmentError("chromium-browser is not installed on this system.")
+                return None
+            else:
+                path = result.stdout.decode().strip()
+                print(f"chromium-browser is installed at: {path}")
+                return path
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    def _find_chrome_mac(self):
+        path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+        return path if os.path.exists(path) else None
+
+    def play(self, url, title=None, audio_url=None):
+        if self.system == "Windows":
+            creationflags = subprocess.CREATE_NEW_PROCESS_GROUP
+            self.browser_process = subprocess.Popen(
+                [self.browser_cmd, "--new-window", url],
+                creationflags=creationflags
+            )
+        else:
+            self.browser_process = subprocess.Popen(
+                [self.browser_cmd, "--new-window", url]
+            )
+        return True
+
+    def stop(self):
+        """
+        Attempts to close the browser window that is displaying YouTube.
+        On Windows, enumerates all top-level windows and sends WM_CLOSE to any whose title
+        contains "YouTube".
+        On Linux/macOS, calls terminate() on the stored process.
+        """
+        if self.browser_process:
+            print("Attempting to close the video...")
+            if self.system == "Windows":
+                try:
+                    import win32gui
+                    import win32con
+
+                    def enum_callback(hwnd, results):
+                        title = win32gui.GetWindowText(hwnd)
+                        if "YouTube" in title:
+                            results.append(hwnd)
+
+                    windows = []
+                    win32gui.EnumWindows(enum_callback, windows)
+                    if windows:
+                        for hwnd in windows:
+                            print(f"Closing window: {win32gui.GetWindowText(hwnd)}")
+                            win32gui.PostMessage(hwnd, win32con.WM_CLOSE, 0, 0)
+                        # Wait a bit for windows to close
+                        time.sleep(2)
+                    else:
+                        print("Warning: No window with 'YouTube' found to close.")
+                except Exception as e:
+                    print("Error using win32gui to close window:", e)
+            else:
+                self.browser_process.terminate()
+            self.browser_process = None
+        else:
+            print("No video process is currently open.")
@@ -0,0 +1,197 @@
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+from metrics import METRICS
+from service.responsecache import normalize
+from service.smartnews import NO_NEWS
+
+class NewsPrefetcher:
+    def __init__(self, news, topics=None, interval=30 * 60, max_age=None, max_workers=2,
+                 recent_limit=8, recent_ttl=6 * 3600, prerender=None):
+        """
+        Keeps ready-to-speak news summaries warm, so "news" commands are
+        answered from memory instead of waiting for NewsAPI and GPT.
+        Configured topics and the topics asked about recently are refreshed
+        in the background every `interval` seconds, at most `max_workers` at a time.
+
+        Parameters:
+        - news: SmartNews used to fetch and summarize.
+        - topics: Topics to keep warm (default: VOICEGPT_NEWS_TOPICS, comma separated).
+        - interval: Seconds between refreshes of a topic.
+        - max_age: Oldest summary (seconds) lookup() still returns (default 2 * interval).
+        - max_workers: Bound on concurrent refreshes.
+        - recent_limit, recent_ttl: How many recently requested topics are kept
+          warm, and for how long after they were last asked for.
+        - prerender: Optional callable(summary) run after each refresh, e.g. to
+          render the summary to speech ahead of time (see HomeSpeaker).
+        """
+        if topics is None:
+            topics = [topic for topic in os.environ.get("VOICEGPT_NEWS_TOPICS", "").split(",") if topic.strip()]
+        self.news = news
+        self.topics = [normalize(topic) for topic in topics]
+        self.interval = interval
+        self.max_age = max_age if max_age is not None else 2 * interval
+        self.recent_limit = recent_limit
+        self.recent_ttl = recent_ttl
+        self.prerender = prerender
+        # normalized topic -> (summary, fetched_at)
+        self.store = {}
+        # normalized topic -> time last requested
+        self.recent = collections.OrderedDict()
+        # normalized topic -> Future of the fetch in flight, shared by fetch() and refresh().
+        self.refreshing = {}
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix="news-prefetch")
+        self.stop_event = threading.Event()
+        self.thread = None
+        METRICS.gauge("news_store_topics", "News summaries kept warm", function=lambda: len(self.store))
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.refresh_due()
+            # Check a few times per interval so new recent topics are picked up soon.
+            self.stop_event.wait(min(60.0, self.interval / 4))
+
+    def due_topics(self):
+        """
+        Topics whose summary is missing or older than `interval`.
+        """
+        now = time.time()
+        with self.lock:
+            for topic in [topic for topic, asked in self.recent.items() if now - asked > self.recent_ttl]:
+                del self.recent[topic]
+            wanted = list(dict.fromkeys(self.topics + list(self.recent)))
+            # Forget stale summaries of topics nobody asks about anymore.
+            for topic in [topic for topic, (_, fetched_at) in self.store.items()
+                          if topic not in wanted and now - fetched_at > self.max_age]:
+                del self.store[topic]
+            return [topic for topic in wanted
+                    if topic not in self.refreshing
+                    and (topic not in self.store or now - self.store[topic][1] >= self.interval)]
+
+    def refresh_due(self):
+        for topic in self.due_topics():
+            self.refresh(topic)
+
+    def _claim(self, topic):
+        """
+        The future of the fetch of `topic` in flight, and whether the caller
+        started it (and must run it) or joins one already running.
+        """
+        with self.lock:
+            future = self.refreshing.get(topic)
+            if future is not None:
+                return future, False
+            future = concurrent.futures.Future()
+            self.refreshing[topic] = future
+            return future, True
+
+    def refresh(self, topic):
+        """
+        Fetch and summarize `topic` in the background.
+
+        Returns:
+          concurrent.futures.Future: Resolves to the summary (None if it failed);
+          the one in flight if `topic` is already being fetched, or None if shut down.
+        """
+        topic = normalize(topic)
+        future, started = self._claim(topic)
+        if not started:
+            return future
+        try:
+            self.executor.submit(self._refresh, topic, future, True)
+        except RuntimeError:  # Shut down.
+            with self.lock:
+                del self.refreshing[topic]
+            future.cancel()
+            return None
+        return future
+
+    def fetch(self, query):
+        """
+        Blocking on-demand fetch and summary of `query`, on the calling thread.
+        If the topic is already being fetched (e.g. by a background refresh),
+        that result is waited for instead of fetching it twice.
+
+        Returns:
+          str: The summary, as returned by SmartNews.get_news(), or None if it failed.
+        """
+        topic = normalize(query)
+        future, started = self._claim(topic)
+        if started:
+            self._refresh(topic, future, False)
+        return future.result()
+
+    def _refresh(self, topic, future, refresh):
+        summary = None
+        try:
+            with METRICS.timer("news_prefetch_seconds", "Time to fetch and summarize a news topic"):
+                summary = self.news.get_news(topic, refresh=refresh)
+            if not summary or summary == NO_NEWS or summary.startswith("An error occurred"):
+                METRICS.counter("news_prefetch_total", "News fetches", result="empty").inc()
+                return
+            with self.lock:
+                self.store[topic] = (summary, time.time())
+            METRICS.counter("news_prefetch_total", "News fetches", result="stored").inc()
+        except Exception as e:
+            METRICS.counter("news_prefetch_total", "News fetches", result="error").inc()
+            print(f"Failed to fetch news for {topic!r}: {e}")
+            return
+        finally:
+            # Waiters get the summary without waiting for the pre-render.
+            with self.lock:
+                self.refreshing.pop(topic, None)
+            future.set_result(summary)
+        if refresh and self.prerender is not None:
+            try:
+                self.prerender(summary)
+            except Exception as e:
+                print(f"Failed to pre-render news for {topic!r}: {e}")
+
+    def remember(self, query, summary):
+        """
+        Store a summary fetched on demand, so the topic is warm from now on.
+        It is only returned for the same query (see lookup()).
+        """
+        if summary and summary != NO_NEWS and not summary.startswith("An error occurred"):
+            with self.lock:
+                self.store[normalize(query)] = (summary, time.time())
+
+    def lookup(self, query):
+        """
+        A warm summary for the topic of `query`, or None.
+        The query matches a stored topic exactly (normalized), or contains a
+        configured topic, e.g. "what is the news about technology" matches
+        "technology"; the longest matching topic wins. Queries stored by
+        remember() only match exactly, so a generic "news" summary is never
+        returned for "news about bitcoin".
+        """
+        query = normalize(query)
+        now = time.time()
+        padded = f" {query} "
+        with self.lock:
+            self.recent[query] = now
+            self.recent.move_to_end(query)
+            while len(self.recent) > self.recent_limit:
+                self.recent.popitem(last=False)
+            candidates = [(topic, summary) for topic, (summary, fetched_at) in self.store.items()
+                          if now - fetched_at <= self.max_age
+                          and (topic == query or (topic in self.topics and f" {topic} " in padded))]
+        if not candidates:
+            METRICS.counter("news_store_lookups_total", "Warm news store lookups", result="miss").inc()
+            return None
+        METRICS.counter("news_store_lookups_total", "Warm news store lookups", result="hit").inc()
+        return max(candidates, key=lambda candidate: len(candidate[0]))[1]
+
+    def stop(self):
+        self.stop_event.set()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,83 @@
+import re
+
+from service.conversation import count_tokens
+from service.responsecache import char_ngrams, normalize
+
+NEWS_INSTRUCTION = "Summarize the following news articles in a concise manner:"
+URL = re.compile(r"https?://\S+|www\.\S+")
+# NewsAPI cuts long texts with a marker like "… [+1234 chars]".
+TRUNCATION_MARK = re.compile(r"\s*(…|\.\.\.)?\s*\[\+\d+ chars\]$")
+SOURCE_SUFFIX = re.compile(r"\s+-\s+[^-]+$")
+
+def clean_text(text):
+    """
+    Article text without URLs, truncation markers and extra whitespace.
+    """
+    text = URL.sub("", text or "")
+    text = TRUNCATION_MARK.sub("", text)
+    return " ".join(text.split())
+
+
+def similarity(a, b, n=3):
+    """
+    Jaccard similarity of the character n-grams of two normalized texts.
+    """
+    grams_a, grams_b = set(char_ngrams(a, n)), set(char_ngrams(b, n))
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def dedupe_articles(articles, threshold=0.7):
+    """
+    Drop articles whose title is the same as, or nearly the same as, an earlier
+    one (the same story syndicated by several sources).
+    """
+    kept = []
+    seen = []
+    for article in articles:
+        # Syndicated titles often end with " - Source name".
+        title = normalize(SOURCE_SUFFIX.sub("", clean_text(article.get("title"))))
+        if not title or title == "removed":
+            continue
+        if any(title == other or similarity(title, other) >= threshold for other in seen):
+            continue
+        seen.append(title)
+        kept.append(article)
+    return kept
+
+
+def pack_articles(articles, token_budget=1200, model=None, threshold=0.7):
+    """
+    Article titles and descriptions, deduplicated and without URLs, packed
+    whole (never cut mid-article) in their original order until `token_budget`
+    tokens are used, as counted by conversation.count_tokens() (tiktoken, or
+    a conservative estimate without it).
+
+    Returns:
+      str: One "Title: ...\\nDescription: ..." block per article.
+    """
+    blocks = []
+    used = 0
+    for article in dedupe_articles(articles, threshold):
+        title = clean_text(article.get("title")) or "No title"
+        description = clean_text(article.get("description"))
+        if description and normalize(description) == normalize(title):
+            description = ""
+        block = f"Title: {title}\nDescription: {description}\n" if description else f"Title: {title}\n"
+        # Blocks are joined with a blank line, which costs a token too.
+        tokens = count_tokens(block, model) + (1 if blocks else 0)
+        if used + tokens > token_budget:
+            # An article that does not fit is skipped; a shorter later one may still fit.
+            continue
+        blocks.append(block)
+        used += tokens
+    return "\n".join(blocks)
+
+
+def build_news_prompt(articles, token_budget=1200, model=None, instruction=NEWS_INSTRUCTION):
+    """
+    Summary prompt for `articles` within `token_budget` tokens (instruction included).
+    """
+    budget = token_budget - count_tokens(instruction, model) - 2
+    return f"{instruction}\n\n{pack_articles(articles, budget, model)}"
@@ -0,0 +1,344 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+
+from metrics import METRICS
+
+# Default persistence file, overridable with VOICEGPT_RESPONSE_CACHE.
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "voicegpt", "responses.json")
+# Answers to questions with these words depend on when they are asked, so they are never cached.
+VOLATILE_WORDS = {"now", "today", "tonight", "tomorrow", "yesterday", "time", "date", "day", "days",
+                  "week", "weeks", "month", "months", "year", "years", "hours", "minutes", "until", "ago",
+                  "old", "weekday", "weekend", "morning", "afternoon", "evening", "weather", "forecast",
+                  "latest", "news", "current", "currently", "score", "price", "recent", "recently",
+                  "next", "last"}
+# Words that do not change what is asked; a fuzzy match must agree on all the others.
+FILLER_WORDS = {"a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "what", "whats",
+                "please", "tell", "me", "us", "can", "could", "would", "you", "i", "want", "to", "know",
+                "hey", "ok", "okay", "so", "then", "just", "again"}
+
+def normalize(text):
+    """
+    Lowercase, drop punctuation and collapse whitespace, so "What's the weather?"
+    and "whats the weather" are the same question.
+    """
+    text = re.sub(r"[^\w\s]", "", text.lower())
+    return " ".join(text.split())
+
+
+def content_words(normalized):
+    """
+    The words of a normalized question that carry its meaning (numbers included), in order.
+    """
+    return [word for word in normalized.split() if word not in FILLER_WORDS]
+
+
+def char_ngrams(text, n=3):
+    padded = f" {text} "
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+class TTLCache:
+    def __init__(self, ttl=300, max_entries=128):
+        """
+        Small in-memory cache keyed by normalized text, e.g. NewsAPI results by topic.
+        Beyond `max_entries`, the least recently used entries are dropped.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # normalized key -> (expires, value)
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        key = normalize(key)
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self.entries[key]
+                return None
+            # Move it to the end, the most recently used.
+            self.entries[key] = self.entries.pop(key)
+            return item[1]
+
+    def put(self, key, value, ttl=None):
+        now = time.time()
+        with self.lock:
+            key = normalize(key)
+            self.entries.pop(key, None)
+            self.entries[key] = (now + (ttl if ttl is not None else self.ttl), value)
+            if len(self.entries) > self.max_entries:
+                for stale in [k for k, (expires, _) in self.entries.items() if expires <= now]:
+                    del self.entries[stale]
+            while len(self.entries) > self.max_entries:
+                # Dicts keep insertion order, so the first key is the least recently used.
+                del self.entries[next(iter(self.entries))]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ResponseCache:
+    def __init__(self, path=None, max_entries=512, ttl=24 * 3600, save_delay=5.0,
+                 fuzzy=False, threshold=0.88, ngram=3, fuzzy_max_chars=200):
+        """
+        Cache of answers to questions that are asked again. A lookup tries the
+        exact text, then the normalized text and, with fuzzy=True, the most
+        similar cached question by cosine similarity of character n-gram
+        TF-IDF vectors. A fuzzy match must still have the same content words
+        and numbers (only filler words may differ), since "2 plus 3" and
+        "2 plus 4" are similar text but different questions.
+
+        Questions with VOLATILE_WORDS (e.g. "what day is it") are neither
+        looked up nor stored. Entries live in namespaces (e.g. one per model and
+        system prompt), expire after their TTL, are evicted least recently used
+        beyond `max_entries` and are persisted to a JSON file by a timer thread,
+        at most once per `save_delay`, so put() never writes on the caller's
+        thread (e.g. an event loop).
+
+        Parameters:
+        - path: Persistence file; None uses VOICEGPT_RESPONSE_CACHE or
+          ~/.cache/voicegpt/responses.json, an empty string keeps the cache in memory.
+        - max_entries: Size bound.
+        - ttl: Default time to live (seconds).
+        - save_delay: Seconds changes are batched before they are written (see flush()).
+        - fuzzy: Also match near-duplicate questions (off by default).
+        - threshold: Minimum cosine similarity of a fuzzy match.
+        - ngram: Character n-gram length.
+        - fuzzy_max_chars: Longer questions (e.g. prompts with articles) only match exactly.
+        """
+        if path is None:
+            path = os.environ.get("VOICEGPT_RESPONSE_CACHE", DEFAULT_PATH)
+        self.path = path or None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.save_delay = save_delay
+        self.fuzzy = fuzzy
+        self.threshold = threshold
+        self.ngram = ngram
+        self.fuzzy_max_chars = fuzzy_max_chars
+        # (namespace, normalized question) -> entry dict.
+        self.entries = {}
+        self.stats = {"exact": 0, "normalized": 0, "fuzzy": 0, "miss": 0}
+        self.lock = threading.Lock()
+        # TF-IDF matrix over the cached questions, rebuilt after changes.
+        self.index = None
+        # Pending write of the changes (see _schedule_save()).
+        self.dirty = False
+        self.save_timer = None
+        self.load()
+        if self.path:
+            atexit.register(self.flush)
+
+    def _namespace(self, namespace):
+        # Long namespaces (e.g. a system prompt) are stored as a hash.
+        if len(namespace) > 64:
+            return hashlib.sha1(namespace.encode("utf-8")).hexdigest()
+        return namespace
+
+    @staticmethod
+    def cacheable(normalized):
+        """
+        False for questions whose answer depends on when they are asked.
+        """
+        return not VOLATILE_WORDS.intersection(normalized.split())
+
+    def get(self, question, namespace="default"):
+        """
+        The cached answer to `question`, or None.
+        """
+        namespace = self._namespace(namespace)
+        normalized = normalize(question)
+        if not self.cacheable(normalized):
+            METRICS.counter("response_cache_total", "Response cache lookups, by result", result="volatile").inc()
+            return None
+        now = time.time()
+        with self.lock:
+            result = "miss"
+            entry = self.entries.get((namespace, normalized))
+            if entry is not None and entry["expires"] > now:
+                result = "exact" if entry["question"] == question else "normalized"
+            elif self.fuzzy and len(normalized) <= self.fuzzy_max_chars:
+                entry = self._nearest(namespace, normalized, now)
+                if entry is not None:
+                    result = "fuzzy"
+            else:
+                entry = None
+            self.stats[result] += 1
+            if entry is not None:
+                entry["used"] = now
+                entry["hits"] += 1
+        METRICS.counter("response_cache_total", "Response cache lookups, by result", result=result).inc()
+        return entry["answer"] if entry is not None else None
+
+    def put(self, question, answer, namespace="default", ttl=None):
+        """
+        Cache `answer` for `question`; ttl overrides the default time to live.
+        Volatile questions (see cacheable()) are not cached.
+        """
+        normalized = normalize(question)
+        if not answer or not self.cacheable(normalized):
+            return
+        namespace = self._namespace(namespace)
+        now = time.time()
+        with self.lock:
+            self.entries[(namespace, normalized)] = {
+                "namespace": namespace, "question": question, "normalized": normalized,
+                "answer": answer, "expires": now + (ttl if ttl is not None else self.ttl),
+                "used": now, "hits": 0,
+            }
+            self._evict(now)
+            self.index = None
+        self._schedule_save()
+
+    def _evict(self, now):
+        for key in [key for key, entry in self.entries.items() if entry["expires"] <= now]:
+            del self.entries[key]
+        if len(self.entries) > self.max_entries:
+            by_use = sorted(self.entries, key=lambda key: self.entries[key]["used"])
+            for key in by_use[:len(self.entries) - self.max_entries]:
+                del self.entries[key]
+
+    def _build_index(self):
+        keys = [key for key, entry in self.entries.items() if len(entry["normalized"]) <= self.fuzzy_max_chars]
+        vocabulary = {}
+        rows, cols, counts = [], [], []
+        for row, key in enumerate(keys):
+            grams = {}
+            for gram in char_ngrams(key[1], self.ngram):
+                grams[gram] = grams.get(gram, 0) + 1
+            for gram, count in grams.items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(gram, len(vocabulary)))
+                counts.append(count)
+        matrix = np.zeros((len(keys), len(vocabulary)), dtype=np.float32)
+        matrix[rows, cols] = counts
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        idf = np.log((1 + len(keys)) / (1 + document_frequency)).astype(np.float32) + 1.0
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+        self.index = (keys, vocabulary, idf, matrix)
+
+    def _nearest(self, namespace, normalized, now):
+        if not self.entries:
+            return None
+        if self.index is None:
+            self._build_index()
+        keys, vocabulary, idf, matrix = self.index
+        if not keys:
+            return None
+        query = np.zeros(len(vocabulary), dtype=np.float32)
+        for gram in char_ngrams(normalized, self.ngram):
+            column = vocabulary.get(gram)
+            if column is not None:
+                query[column] += 1
+        query *= idf
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        scores = matrix @ (query / norm)
+        words = content_words(normalized)
+        # Only consider live entries of the same namespace asking for the same thing.
+        for row in np.argsort(scores)[::-1]:
+            if scores[row] < self.threshold:
+                return None
+            entry = self.entries.get(keys[row])
+            if (entry is not None and keys[row][0] == namespace and entry["expires"] > now
+                    and content_words(keys[row][1]) == words):
+                return entry
+        return None
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load the response cache: {e}")
+            return
+        now = time.time()
+        with self.lock:
+            for entry in entries:
+                if entry.get("expires", 0) > now and self.cacheable(entry["normalized"]):
+                    self.entries[(entry["namespace"], entry["normalized"])] = entry
+            self._evict(now)
+            self.index = None
+
+    def _schedule_save(self):
+        if not self.path:
+            return
+        with self.lock:
+            self.dirty = True
+            if self.save_timer is not None:
+                return
+            self.save_timer = threading.Timer(self.save_delay, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        """
+        Write pending changes now (also done at exit).
+        """
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+            if not self.dirty:
+                return
+            self.dirty = False
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            entries = list(self.entries.values())
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Write a temporary file first so a crash never leaves a truncated cache.
+            partial = self.path + ".part"
+            with open(partial, "w") as f:
+                json.dump(entries, f)
+            os.replace(partial, self.path)
+        except OSError as e:
+            print(f"Failed to save the response cache: {e}")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.index = None
+        self._schedule_save()
+
+    def report_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        lookups = stats["exact"] + stats["normalized"] + stats["fuzzy"] + stats["miss"]
+        hit_rate = (lookups - stats["miss"]) / lookups if lookups else 0.0
+        print(f"Response cache: {stats['entries']} entries, {lookups} lookups, hit rate {hit_rate:.0%} "
+              f"(exact {stats['exact']}, normalized {stats['normalized']}, fuzzy {stats['fuzzy']})")
+        return stats
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def shared_response_cache():
+    """
+    The process-wide ResponseCache, loaded on first use.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
@@ -1,34 +1,65 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Assuming GPTClient is part of chatgpt module, import it
 from service.chatgpt import GPTClient
+from service.responsecache import TTLCache
+from service.newsprompt import build_news_prompt
+from metrics import METRICS
+
+NO_NEWS = "No news articles found."
 
 class SmartNews(GPTClient):
-    def __init__(self, openai_api_key=None, news_api_key=None, model=None):
+    def __init__(self, openai_api_key=None, news_api_key=None, model=None, cache=None, ttl=15 * 60,
+                 articles_ttl=5 * 60, timeout=(3.05, 10), retries=3, prompt_tokens=1200):
         """
         Initializes SmartNews with both an OpenAI API key and a NewsAPI key.
+        Create it once and keep it: its HTTP session and clients keep their
+        connections alive between requests.
         
         Parameters:
           openai_api_key (str): Your OpenAI API key.
           news_api_key (str): Your NewsAPI key.
           model (str): The GPT model to use.
+          cache (ResponseCache): (Optional) Response cache of GPTClient; summaries are not stored in it.
+          ttl (float): (Optional) Seconds a news summary is reused for the same topic.
+          articles_ttl (float): (Optional) Seconds NewsAPI results are reused for the same topic.
+          timeout (tuple): (Optional) Connect and read timeouts of NewsAPI requests.
+          retries (int): (Optional) Retries of failed NewsAPI requests, with exponential backoff.
+          prompt_tokens (int): (Optional) Token budget of the summary prompt.
         """
-        super().__init__(openai_api_key, model=model)
+        super().__init__(openai_api_key, model=model, cache=cache)
+        self.ttl = ttl
         if news_api_key is None:
             news_api_key = "your api key here"
         self.news_api_key = news_api_key
+        self.timeout = timeout
+        self.prompt_tokens = prompt_tokens
+        self.articles = TTLCache(articles_ttl)
+        # Summaries by exact normalized topic; similar topics ("texas", "tesla") are different news.
+        self.summaries = TTLCache(ttl)
+        # Pooled keep-alive connections; transient errors are retried with backoff.
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(max_retries=retry, pool_connections=2, pool_maxsize=4))
 
-    def search_latest_news(self, query, pageSize=5):
+    def search_latest_news(self, query, pageSize=5, refresh=False):
         """
         Uses the NewsAPI to search for the latest news articles matching the query.
         
         Parameters:
           query (str): The news topic to search for.
           pageSize (int): The maximum number of articles to retrieve.
+          refresh (bool): Skip the cached results.
         
         Returns:
           list: A list of article dictionaries containing keys like "title", "description", and "url".
         """
+        cached = None if refresh else self.articles.get(f"{query}|{pageSize}")
+        if cached is not None:
+            return cached
         url = "https://newsapi.org/v2/everything"
         params = {
             "q": query,
@@ -37,44 +68,56 @@ class SmartNews(GPTClient):
             "apiKey": self.news_api_key,
             "language": "en"
         }
-        response = requests.get(url, params=params)
+        try:
+            with METRICS.timer("newsapi_request_seconds", "NewsAPI request time"):
+                response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            METRICS.counter("newsapi_errors_total", "Failed NewsAPI requests").inc()
+            print(f"Error fetching news: {e}")
+            return []
         if response.status_code == 200:
             data = response.json()
             articles = data.get("articles", [])
+            if articles:
+                self.articles.put(f"{query}|{pageSize}", articles)
             return articles            
         else:
+            METRICS.counter("newsapi_errors_total", "Failed NewsAPI requests").inc()
             print(f"Error fetching news: {response.status_code} - {response.text}")
             return []
 
-    def get_news(self, query):
+    def get_news(self, query, refresh=False):
         """
         Searches for the latest news on the given topic, then uses ChatGPT to generate a summary.
         
         Parameters:
           query (str): The news topic.
+          refresh (bool): Fetch and summarize again instead of using the caches.
         
         Returns:
           str: A concise summary of the latest news.
         """
-        articles = self.search_latest_news(query)
+        # The same topic asked again shortly after shares the summary.
+        if not refresh:
+            cached = self.summaries.get(query)
+            if cached is not None:
+                return cached
+        articles = self.search_latest_news(query, refresh=refresh)
         if not articles:
-            return "No news articles found."
+            return NO_NEWS
 
-        # Build a string with the headlines, descriptions, and URLs.
-        news_content = ""
-        for article in articles:
-            title = article.get("title", "No title")
-            description = article.get("description", "")
-            url = article.get("url", "")
-            news_content += f"Title: {title}\nDescription: {description}\nURL: {url}\n\n"
-
-        prompt = f"Summarize the following news articles in a concise manner (no web link):\n\n{news_content}"
-        if len(prompt) > 4096:
-            prompt = prompt[:4096]
-        #if return from ask is none then return the prompt, otherwise return the news_content
-        summary = self.ask(prompt) or news_content
+        # Deduplicated headlines and descriptions, without URLs, packed whole up to the token budget.
+        prompt = build_news_prompt(articles, self.prompt_tokens, self.model)
+        #if return from ask is none then return the articles, otherwise return the summary
+        # The prompt is cached by topic above, not by the article text.
+        summary = self.ask(prompt, cache=False) or prompt.split("\n\n", 1)[-1]
+        if not summary.startswith("An error occurred"):
+            self.summaries.put(query, summary)
         return summary
 
+    def close(self):
+        self.session.close()
+
 
 # Example usage:
 if __name__ == "__main__":
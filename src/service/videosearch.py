@@ -0,0 +1,255 @@
+import concurrent.futures
+import json
+import threading
+import time
+
+from metrics import METRICS
+from service.responsecache import TTLCache
+
+try:
+    import yt_dlp
+except ImportError:  # Only RecordedExtractor works without it.
+    yt_dlp = None
+
+YDL_OPTIONS = {
+    'quiet': True,
+    'noplaylist': True,
+    # Search results only, without resolving every video page.
+    'extract_flat': 'in_playlist',
+    'skip_download': True,
+    # The best video and audio, as separate streams for a player that merges them (mpv).
+    'format': 'bestvideo*+bestaudio/best',
+}
+# A single stream with audio (and video, if any), for a player that can only open one.
+MUXED_FORMAT = 'best[acodec!=none][vcodec!=none]/bestaudio/best'
+
+class VideoResult:
+    def __init__(self, video_id, title=None):
+        self.id = video_id
+        self.title = title or "Unknown Title"
+
+    @property
+    def url(self):
+        return f"https://www.youtube.com/watch?v={self.id}"
+
+
+class RecordedExtractor:
+    def __init__(self, responses, delay=0.0):
+        """
+        Stand-in for yt_dlp.YoutubeDL that replays recorded extract_info()
+        responses, for tests, benchmarks and offline runs.
+
+        Parameters:
+        - responses: dict of search or video URL (e.g. "ytsearch1:lofi") -> info dict,
+          or the path of a JSON file with one (see record()).
+        - delay: Seconds each extraction takes, like a network round trip.
+        """
+        if isinstance(responses, str):
+            with open(responses) as f:
+                responses = json.load(f)
+        self.responses = responses
+        self.delay = delay
+        self.calls = []
+
+    def extract_info(self, url, download=False):
+        self.calls.append(url)
+        time.sleep(self.delay)
+        if url not in self.responses:
+            raise KeyError(f"No recorded response for {url!r}")
+        return self.responses[url]
+
+    @staticmethod
+    def record(queries, path, options=None):
+        """
+        Run real searches for `queries` and save the responses to `path`.
+        """
+        responses = {}
+        with yt_dlp.YoutubeDL(options or YDL_OPTIONS) as ydl:
+            for query in queries:
+                url = f"ytsearch1:{query}"
+                responses[url] = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        with open(path, "w") as f:
+            json.dump(responses, f)
+        return responses
+
+
+class YouTubeSearch:
+    def __init__(self, extractor_factory=None, ttl=24 * 3600, max_entries=256, stream_ttl=30 * 60, format=None):
+        """
+        Finds the YouTube video for a spoken query with one long-lived, warmed
+        yt_dlp extractor on a worker thread, and remembers query -> video so a
+        repeated "play" skips the search entirely.
+
+        Parameters:
+        - extractor_factory: Callable returning an object with
+          extract_info(url, download=False), e.g. a RecordedExtractor
+          (default: yt_dlp.YoutubeDL with YDL_OPTIONS).
+        - format: yt_dlp format of resolved streams, e.g. MUXED_FORMAT
+          (default: the one in YDL_OPTIONS).
+        - ttl: Seconds a query -> video result is reused.
+        - max_entries: Results kept, least recently used dropped first.
+        - stream_ttl: Seconds a resolved stream URL is reused (they expire after a few hours).
+        """
+        options = dict(YDL_OPTIONS, format=format) if format else YDL_OPTIONS
+        self.extractor_factory = extractor_factory or (lambda: yt_dlp.YoutubeDL(options))
+        self.extractor = None
+        self.results = TTLCache(ttl, max_entries)
+        self.streams = TTLCache(stream_ttl, max_entries)
+        # yt_dlp is not thread-safe, so a single thread does every extraction.
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="youtube-search")
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def warm(self):
+        """
+        Create the extractor in the background, before the first search.
+        """
+        try:
+            return self.executor.submit(self._extractor)
+        except RuntimeError:  # Closed.
+            return None
+
+    def _extractor(self):
+        if self.extractor is None:
+            with METRICS.timer("youtube_init_seconds", "yt_dlp extractor initialization time"):
+                self.extractor = self.extractor_factory()
+                # Load the extractors used for searches now rather than on the first query.
+                get_info_extractor = getattr(self.extractor, "get_info_extractor", None)
+                if get_info_extractor is not None:
+                    for name in ("YoutubeSearch", "Youtube"):
+                        get_info_extractor(name)
+        return self.extractor
+
+    def search(self, query):
+        """
+        Look up the video for `query` off the calling thread.
+
+        Returns:
+          concurrent.futures.Future: Resolves to a VideoResult, or None if nothing
+          was found. It is already done on a cache hit, and cancel() (or
+          cancel_all()) drops the result even while the search is running.
+        """
+        cached = self.results.get(query)
+        if cached is not None:
+            METRICS.counter("youtube_search_total", "YouTube searches, by result", result="cached").inc()
+            return self._done(cached)
+        return self._submit(self._search, query)
+
+    def resolve(self, video):
+        """
+        Look up the direct stream URLs of `video` off the calling thread, for a
+        media player that should not run its own extraction.
+
+        Returns:
+          concurrent.futures.Future: Resolves to (url, audio_url), where audio_url
+          is None for a single stream, or to None if there is none; cancellable
+          like search().
+        """
+        cached = self.streams.get(video.id)
+        if cached is not None:
+            return self._done(cached)
+        return self._submit(self._resolve, video)
+
+    def _done(self, result):
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        future.set_result(result)
+        return future
+
+    def _submit(self, function, *args):
+        future = concurrent.futures.Future()
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._discard)
+        try:
+            self.executor.submit(self._call, future, function, args)
+        except RuntimeError:  # Closed.
+            future.cancel()
+        return future
+
+    def _discard(self, future):
+        with self.lock:
+            self.pending.discard(future)
+
+    def _call(self, future, function, args):
+        # The future stays pending while the call runs, so it can be cancelled at any time.
+        if future.cancelled():
+            return
+        try:
+            result = function(*args)
+        except Exception as e:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(e)
+            return
+        if future.set_running_or_notify_cancel():
+            future.set_result(result)
+        else:
+            METRICS.counter("youtube_cancelled_total", "YouTube lookups cancelled while running").inc()
+
+    def _search(self, query):
+        try:
+            with METRICS.timer("youtube_search_seconds", "YouTube search time"):
+                info = self._extractor().extract_info(f"ytsearch1:{query}", download=False)
+        except Exception:
+            METRICS.counter("youtube_search_total", "YouTube searches, by result", result="error").inc()
+            raise
+        entries = info.get("entries") if "entries" in info else [info]
+        entry = next((entry for entry in entries or [] if entry and entry.get("id")), None)
+        if entry is None:
+            METRICS.counter("youtube_search_total", "YouTube searches, by result", result="empty").inc()
+            return None
+        result = VideoResult(entry["id"], entry.get("title"))
+        self.results.put(query, result)
+        METRICS.counter("youtube_search_total", "YouTube searches, by result", result="found").inc()
+        return result
+
+    def _resolve(self, video):
+        with METRICS.timer("youtube_resolve_seconds", "YouTube stream URL lookup time"):
+            info = self._extractor().extract_info(video.url, download=False)
+        # Separate video and audio come as requested_formats, a single stream as url.
+        urls = [f.get("url") for f in info.get("requested_formats") or [info]]
+        if not all(urls):
+            return None
+        stream = (urls[0], urls[1] if len(urls) > 1 else None)
+        self.streams.put(video.id, stream)
+        return stream
+
+    def find(self, query, timeout=None):
+        """
+        Blocking search().
+
+        Returns:
+          VideoResult or None if nothing was found or the search was cancelled.
+        """
+        try:
+            return self.search(query).result(timeout)
+        except concurrent.futures.CancelledError:
+            return None
+
+    def stream_url(self, video, timeout=None):
+        """
+        Blocking resolve().
+
+        Returns:
+          (url, audio_url) or None if it could not be resolved or the lookup was cancelled.
+        """
+        try:
+            return self.resolve(video).result(timeout)
+        except concurrent.futures.CancelledError:
+            return None
+        except Exception as e:
+            print(f"Failed to resolve the stream of {video.url}: {e}")
+            return None
+
+    def cancel_all(self):
+        """
+        Cancel the pending searches, e.g. on "stop".
+        """
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.cancel()
+
+    def close(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False)
@@ -1,131 +1,164 @@
-import os
-import subprocess
-import platform
-import yt_dlp
-import shutil
-import time
+import threading
+
+from metrics import METRICS
+from service.media import BrowserBackend, MediaError, MpvBackend
+from service.videosearch import MUXED_FORMAT, YouTubeSearch
 
 class YouTube:
-    def __init__(self):
-        self.browser_process = None
-        self.system = platform.system()
+    def __init__(self, search=None, player=None, browser=None):
+        """
+        Parameters:
+          search (YouTubeSearch): (Optional) Video search; by default a new one,
+            warmed in the background.
+          player (MediaBackend): (Optional) Resident media player; by default mpv
+            if it is installed, False for none.
+          browser (MediaBackend): (Optional) Fallback when there is no player or it
+            fails; by default a BrowserBackend, False for none.
+        """
+        if player is None:
+            player = MpvBackend() if MpvBackend.find() else None
+        self.player = player or None
+        if search is None:
+            # Separate video and audio streams only if the player can merge them.
+            merges = self.player is not None and self.player.merges_streams
+            search = YouTubeSearch(format=None if merges else MUXED_FORMAT)
+        self.search = search
+        self.search.warm()
+        if browser is None:
+            try:
+                browser = BrowserBackend()
+            except Exception:
+                # The browser is only required when there is no player.
+                if self.player is None:
+                    raise
+        self.browser = browser or None
+        if self.player is not None:
+            # Notice videos that finish, or fail to load, in the player.
+            self.player.add_end_listener(self._player_ended)
+            # Start the player now rather than on the first video.
+            try:
+                self.player.start()
+            except MediaError as e:
+                print(f"Failed to start {self.player.name}: {e}")
+        # The backend playing the current video.
+        self.backend = None
+        # Incremented by close_video(), so a play it overtook is dropped.
+        self.generation = 0
+        # Orders starting a video in the player with the player's end events.
+        self.lock = threading.Lock()
         self.youtube_url = None  # Store the URL for matching
-        if self.system == "Windows":
-            # On Windows, use Microsoft Edge.
-            self.browser_cmd = self._find_edge_windows()
-            if not self.browser_cmd:
-                raise Exception("Microsoft Edge not found on Windows. Please install Edge or provide its full path.")
-        elif self.system == "Linux":
-            # On Linux, use Google Chrome.
-            self.browser_cmd = self._find_chrome_linux()
-            if not self.browser_cmd:
-                raise Exception("Google Chrome not found on Linux. Please install Chrome or provide its full path.")
-        elif self.system == "Darwin":
-            # On macOS, use Google Chrome.
-            self.browser_cmd = self._find_chrome_mac()
-            if not self.browser_cmd:
-                raise Exception("Google Chrome not found on macOS. Please install Chrome or provide its full path.")
-        else:
-            raise Exception("Unsupported OS")
-    
-    def _find_edge_windows(self):
-        edge_path = shutil.which("msedge")
-        if edge_path:
-            return edge_path
-        potential_paths = [
-            r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
-            r"C:\Program Files\Microsoft\Edge\Application\msedge.exe"
-        ]
-        for path in potential_paths:
-            if os.path.exists(path):
-                return path
-        return None
 
-    def _find_chrome_linux(self):
-        try:
-            # Check if chromium-browser is installed
-            result = subprocess.run(['which', 'chromium-browser'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
-            # If the result is empty, chromium-browser is not installed
-            if not result.stdout:
-                raise EnvironmentError("chromium-browser is not installed on this system.")
-                return None
-            else:
-                path = result.stdout.decode().strip()
-                print(f"chromium-browser is installed at: {path}")
-                return path
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            return None
-    
-    def _find_chrome_mac(self):
-        path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-        return path if os.path.exists(path) else None
-
-    def play_video(self, query):
+    def play_video(self, query, enqueue=False):
         """
-        Searches YouTube for a video matching the query and opens the YouTube URL directly
-        in the browser. On Windows, Microsoft Edge is used.
+        Searches YouTube for a video matching the query and plays it in the
+        resident player, or opens the YouTube URL in the browser if there is
+        no player or it fails.
+
+        Parameters:
+          enqueue (bool): (Optional) Play it after the current video instead.
         """
-        search_query = f"ytsearch1:{query}"
-        ydl_opts = {'quiet': True, 'noplaylist': True, 'cachedir': False}
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(search_query, download=False)
-            video_info = info['entries'][0] if 'entries' in info else info
+        generation = self.generation
+        video = self.search.find(query)
+        if video is None:
+            # Nothing found, or the search was cancelled by close_video().
+            print(f"No video found for: {query}")
+            return
+        self.youtube_url = video.url
+        print(f"✅ Found video: {video.title}")
 
-        video_id = video_info.get("id")
-        self.youtube_url = f"https://www.youtube.com/watch?v={video_id}"
-        video_title = video_info.get("title", "Unknown Title")
-        print(f"✅ Found video: {video_title}")
-        print(f"Opening URL: {self.youtube_url}")
+        if self.player is not None:
+            # Resolved stream URLs spare the player its own extraction.
+            url, audio_url = self.search.stream_url(video) or (video.url, None)
+            if generation != self.generation:
+                return
+            try:
+                with self.lock:
+                    if enqueue and self.backend is self.player:
+                        self.player.enqueue(url, video.title, audio_url)
+                    else:
+                        self.player.play(url, video.title, audio_url)
+                    self.backend = self.player
+                METRICS.counter("youtube_plays_total", "Videos opened", backend=self.player.name).inc()
+                return
+            except MediaError as e:
+                print(f"Failed to play in {self.player.name}, opening the browser instead: {e}")
+        self._open_in_browser(video.url, video.title)
 
-        if self.system == "Windows":
-            creationflags = subprocess.CREATE_NEW_PROCESS_GROUP
-            self.browser_process = subprocess.Popen(
-                [self.browser_cmd, "--new-window", self.youtube_url],
-                creationflags=creationflags
-            )
-        else:
-            self.browser_process = subprocess.Popen(
-                [self.browser_cmd, "--new-window", self.youtube_url]
-            )
+    def _open_in_browser(self, url, title=None):
+        if self.browser is None:
+            return
+        print(f"Opening URL: {url}")
+        self.browser.play(url, title)
+        self.backend = self.browser
+        METRICS.counter("youtube_plays_total", "Videos opened", backend=self.browser.name).inc()
 
-    def close_video(self):
+    def _player_ended(self, error):
         """
-        Attempts to close the browser window that is displaying YouTube.
-        On Windows, enumerates all top-level windows and sends WM_CLOSE to any whose title
-        contains "YouTube".
-        On Linux/macOS, calls terminate() on the stored process.
+        End listener of the player: the video finished, or could not be loaded
+        and is opened in the browser instead.
         """
-        if self.browser_process:
-            print("Attempting to close the video...")
-            if self.system == "Windows":
-                try:
-                    import win32gui
-                    import win32con
+        with self.lock:
+            if self.backend is not self.player:
+                return
+            if error is None and getattr(self.player, "loading", False):
+                # Idle from the stop before the video being started.
+                return
+            self.backend = None
+            if error is not None:
+                print(f"{self.player.name} could not play the video, opening the browser instead: {error}")
+                if self.youtube_url is not None:
+                    self._open_in_browser(self.youtube_url)
 
-                    def enum_callback(hwnd, results):
-                        title = win32gui.GetWindowText(hwnd)
-                        if "YouTube" in title:
-                            results.append(hwnd)
+    @property
+    def playing(self):
+        """
+        True while a video is playing (or paused): started, not finished and not closed.
+        """
+        return self.backend is not None
 
-                    windows = []
-                    win32gui.EnumWindows(enum_callback, windows)
-                    if windows:
-                        for hwnd in windows:
-                            print(f"Closing window: {win32gui.GetWindowText(hwnd)}")
-                            win32gui.PostMessage(hwnd, win32con.WM_CLOSE, 0, 0)
-                        # Wait a bit for windows to close
-                        time.sleep(2)
-                    else:
-                        print("Warning: No window with 'YouTube' found to close.")
-                except Exception as e:
-                    print("Error using win32gui to close window:", e)
-            else:
-                self.browser_process.terminate()
-            self.browser_process = None
-        else:
+    def pause(self):
+        """
+        Pause the current video; returns False if its backend cannot.
+        """
+        return self._control("pause")
+
+    def resume(self):
+        return self._control("resume")
+
+    def _control(self, action):
+        if self.backend is None:
+            return False
+        try:
+            return getattr(self.backend, action)()
+        except MediaError as e:
+            print(f"Failed to {action} the video: {e}")
+            return False
+
+    def duck(self, ducked):
+        """
+        Duck listener for the playback scheduler (see PlaybackScheduler.add_duck_listener).
+        """
+        if self.backend is not None:
+            self.backend.duck(ducked)
+
+    def close_video(self):
+        """
+        Stops the current video: the player stops and stays resident, the browser
+        window is closed. A search still in progress is cancelled.
+        """
+        self.generation += 1
+        self.search.cancel_all()
+        if self.backend is None:
             print("No video process is currently open.")
+            return
+        self.backend.stop()
+        self.backend = None
+
+    def close(self):
+        self.search.close()
+        for backend in (self.player, self.browser):
+            if backend is not None:
+                backend.close()
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+import re
+
+# Sentence end: terminal punctuation followed by whitespace, or a line break.
+SENTENCE_END = re.compile(r'([.!?。！？；;:：])\s+|\n+')
+# Words whose trailing period does not end a sentence.
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "vs", "etc", "e.g", "i.e", "no", "approx"}
+
+
+class SentenceChunker:
+    def __init__(self, min_chars=20):
+        """
+        Split streamed text deltas into sentences that can be spoken one by one.
+
+        Parameters:
+        - min_chars: Sentences shorter than this are merged with the next one,
+          so the speaker does not stutter over fragments like "Sure."
+        """
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, delta):
+        """
+        Add a text delta and return the list of sentences completed by it.
+        """
+        self.buffer += delta
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            end = match.end(1) if match.group(1) else match.start()
+            candidate = self.buffer[start:end].strip()
+            if match.group(1) == "." and self._is_abbreviation(candidate):
+                continue
+            if len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """
+        Return whatever text is left once the stream has ended.
+        """
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+    def _is_abbreviation(self, text):
+        words = text.rsplit(None, 1)
+        last = words[-1].rstrip(".").lower() if words else ""
+        return last in ABBREVIATIONS or (len(last) == 1 and last.isalpha())
+
+
+def iter_sentences(deltas, min_chars=20):
+    """
+    Yield complete sentences from an iterable of text deltas.
+    """
+    chunker = SentenceChunker(min_chars)
+    for delta in deltas:
+        for sentence in chunker.feed(delta):
+            yield sentence
+    for sentence in chunker.flush():
+        yield sentence
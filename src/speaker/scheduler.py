@@ -0,0 +1,352 @@
+import heapq
+import itertools
+import queue
+import threading
+import pyaudio
+
+from metrics import METRICS
+from audiodevice import AUDIO
+from speaker.chunker import iter_sentences
+from speaker.tts import shared_worker
+from speaker.speechcache import shared_cache
+
+# Priority classes; a lower value preempts a higher one.
+ALERT = 0
+ANSWER = 1
+MEDIA = 2
+PRIORITY_NAMES = {ALERT: "alert", ANSWER: "answer", MEDIA: "media"}
+
+class PlaybackItem:
+    def __init__(self, priority):
+        """
+        Something queued on the PlaybackScheduler.
+        An item that is preempted keeps its progress and resumes from there.
+        """
+        self.priority = priority
+        self.seq = None
+        self.preempted = False
+        self.cancelled = False
+        self.done = threading.Event()
+
+    @property
+    def stopped(self):
+        return self.preempted or self.cancelled
+
+    def stop(self, scheduler):
+        """
+        Stop whatever is playing right now (called from any thread).
+        """
+
+    def wait(self, timeout=None):
+        """
+        Returns:
+          bool: True if the item was played to the end.
+        """
+        self.done.wait(timeout)
+        return self.done.is_set() and not self.cancelled
+
+
+class AudioItem(PlaybackItem):
+    def __init__(self, audio_data, rate, channels, priority=ANSWER):
+        super().__init__(priority)
+        if not isinstance(audio_data, bytes):
+            # Recorded AudioSegment views are copied out once before playback.
+            audio_data = bytes(audio_data)
+        self.audio_data = audio_data
+        self.rate = rate
+        self.channels = channels
+        self.position = 0
+
+
+class TextItem(PlaybackItem):
+    def __init__(self, text=None, deltas=None, fallback=None, cache=False, priority=ANSWER):
+        """
+        Text spoken sentence by sentence. With `deltas` the sentences arrive
+        while earlier ones are being spoken (fed by the scheduler's feeder thread).
+        A preempted item resumes at the sentence it was interrupted in.
+        """
+        super().__init__(priority)
+        self.sentences = [text] if text is not None else []
+        self.complete = deltas is None
+        self.deltas = deltas
+        self.fallback = fallback
+        self.cache = cache
+        self.index = 0
+        self.request = None
+        self.cond = threading.Condition()
+
+    def add_sentence(self, sentence):
+        with self.cond:
+            self.sentences.append(sentence)
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.complete = True
+            self.cond.notify_all()
+
+    def next_sentence(self, timeout=0.1):
+        """
+        The sentence to speak next, "" while it has not arrived yet, or None at the end.
+        """
+        with self.cond:
+            if self.index >= len(self.sentences) and not self.complete:
+                self.cond.wait(timeout)
+            if self.index < len(self.sentences):
+                return self.sentences[self.index]
+            return None if self.complete else ""
+
+    def stop(self, scheduler):
+        request = self.request
+        if request is not None:
+            scheduler.tts.cancel(request)
+        if self.cancelled and self.deltas is not None and hasattr(self.deltas, "cancel"):
+            self.deltas.cancel()
+
+
+class PlaybackScheduler:
+    def __init__(self, chunk=1024, format=pyaudio.paInt16, max_queued=16, tts=None,
+                 speech_cache=None, audio=None):
+        """
+        Plays everything the speaker says, one item at a time, on one worker thread.
+        Items are ordered by priority class (ALERT, ANSWER, MEDIA) and then
+        by arrival. A higher-priority item preempts the one playing, which is
+        queued again and resumes afterwards. Registered duck listeners are told
+        when alerts or answers start and end, so external media players can
+        lower their volume.
+
+        Parameters:
+        - chunk: Frames written to the output stream at a time.
+        - format: Sample format of raw audio items.
+        - max_queued: Bound of the queue; when full, the lowest-priority,
+          newest item is dropped.
+        - tts, speech_cache, audio: TTSWorker, SpeechCache and AudioDevice to use
+          (default: the shared ones).
+        """
+        self.chunk = chunk
+        self.format = format
+        self.max_queued = max_queued
+        self.tts = tts if tts is not None else shared_worker()
+        self.speech_cache = speech_cache if speech_cache is not None else shared_cache()
+        self.audio = audio if audio is not None else AUDIO
+        self.heap = []
+        self.sequence = itertools.count()
+        self.current = None
+        self.ducked = False
+        self.duck_listeners = []
+        self.cond = threading.Condition()
+        self.running = True
+        self.streams = queue.Queue()
+        METRICS.gauge("playback_queue_depth", "Items waiting to be played", function=lambda: len(self.heap))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        # Streamed text is split into sentences here, so playback never waits on the network.
+        self.feeder = threading.Thread(target=self._feed, daemon=True)
+        self.feeder.start()
+
+    def submit(self, item):
+        """
+        Queue an item, preempting the current one if it has a lower priority.
+
+        Returns:
+          PlaybackItem: The item, or a cancelled item if the queue was full.
+        """
+        with self.cond:
+            item.seq = next(self.sequence)
+            heapq.heappush(self.heap, (item.priority, item.seq, item))
+            if len(self.heap) > self.max_queued:
+                # Drop the least important, most recent item.
+                dropped = max(self.heap, key=lambda entry: (entry[0], entry[1]))
+                self.heap.remove(dropped)
+                heapq.heapify(self.heap)
+                self._cancel_item(dropped[2])
+                METRICS.counter("playback_dropped_total", "Playback items dropped from a full queue").inc()
+            if not item.cancelled and isinstance(item, TextItem) and not item.complete:
+                self.streams.put(item)
+            current = self.current
+            if current is not None and item.priority < current.priority and not item.cancelled:
+                current.preempted = True
+                current.stop(self)
+                METRICS.counter("playback_preemptions_total", "Playback preempted by a higher priority",
+                                priority=PRIORITY_NAMES.get(current.priority, current.priority)).inc()
+            self.cond.notify_all()
+        return item
+
+    def cancel(self, priority=None):
+        """
+        Cancel the current and queued items (of one priority class, or all).
+        """
+        with self.cond:
+            keep = []
+            for entry in self.heap:
+                if priority is None or entry[0] == priority:
+                    self._cancel_item(entry[2])
+                else:
+                    keep.append(entry)
+            heapq.heapify(keep)
+            self.heap = keep
+            current = self.current
+            if current is not None and (priority is None or current.priority == priority):
+                current.cancelled = True
+                current.stop(self)
+            self.cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """
+        Wait until nothing is playing or queued.
+
+        Returns:
+          bool: False if it timed out.
+        """
+        with self.cond:
+            return self.cond.wait_for(lambda: self.current is None and not self.heap, timeout)
+
+    def _cancel_item(self, item):
+        item.cancelled = True
+        item.stop(self)
+        if isinstance(item, TextItem):
+            item.finish()
+        item.done.set()
+
+    def add_duck_listener(self, listener):
+        """
+        Call listener(True) when an alert or answer starts over media and
+        listener(False) once none are left.
+        """
+        self.duck_listeners.append(listener)
+
+    def _set_ducked(self, ducked):
+        if ducked == self.ducked:
+            return
+        self.ducked = ducked
+        for listener in list(self.duck_listeners):
+            try:
+                listener(ducked)
+            except Exception as e:
+                print(f"Duck listener failed: {e}")
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.heap:
+                    self.current = None
+                    self.cond.wait()
+                if not self.running:
+                    self.current = None
+                    return
+                _, _, item = heapq.heappop(self.heap)
+                item.preempted = False
+                self.current = item
+            self._set_ducked(item.priority < MEDIA)
+            if isinstance(item, AudioItem):
+                finished = self._play_audio(item)
+            else:
+                finished = self._play_text(item)
+            with self.cond:
+                self.current = None
+                self.cond.notify_all()
+                if item.preempted and not item.cancelled:
+                    # Resume after the items that preempted it.
+                    heapq.heappush(self.heap, (item.priority, item.seq, item))
+                    continue
+                if not any(entry[0] < MEDIA for entry in self.heap):
+                    ducked = False
+                else:
+                    ducked = self.ducked
+            if not finished:
+                item.cancelled = True
+            item.done.set()
+            self._set_ducked(ducked)
+
+    def _play_audio(self, item, owner=None):
+        # `owner` is the item whose preemption stops this audio (e.g. cached speech of a TextItem).
+        owner = owner or item
+        # For paInt16, each frame is 2 bytes.
+        bytes_per_chunk = self.chunk * 2 * item.channels
+        try:
+            with self.audio.output(self.format, item.channels, item.rate) as stream:
+                with METRICS.timer("audio_playback_seconds", "Raw audio playback time"):
+                    while item.position < len(item.audio_data) and not owner.stopped:
+                        stream.write(item.audio_data[item.position: item.position + bytes_per_chunk])
+                        item.position += bytes_per_chunk
+        except OSError as e:
+            # E.g. the stream was closed by AUDIO.terminate().
+            print(f"Audio playback failed: {e}")
+            return False
+        return item.position >= len(item.audio_data)
+
+    def _play_text(self, item):
+        spoken = item.index > 0
+        while not item.stopped:
+            sentence = item.next_sentence()
+            if sentence is None:
+                break
+            if not sentence:
+                continue
+            print(f"Playing text: {sentence}")
+            if not self._speak(item, sentence):
+                return False
+            item.index += 1
+            spoken = True
+        if item.stopped:
+            return False
+        if not spoken and item.fallback:
+            item.cache = True
+            return self._speak(item, item.fallback)
+        return True
+
+    def _speak(self, item, text):
+        if item.cache:
+            speech = self.speech_cache.get(text)
+            if speech is not None:
+                audio = AudioItem(speech.pcm, speech.rate, speech.channels, item.priority)
+                return self._play_audio(audio, owner=item) and not item.stopped
+            self.speech_cache.prefetch(text)
+        request = self.tts.say(text)
+        item.request = request
+        if item.stopped:
+            # Stopped before the request was registered.
+            self.tts.cancel(request)
+        finished = request.wait()
+        item.request = None
+        return finished and not item.stopped
+
+    def _feed(self):
+        while True:
+            item = self.streams.get()
+            if item is None:
+                return
+            try:
+                if item.cancelled:
+                    continue
+                for sentence in iter_sentences(item.deltas):
+                    if item.cancelled:
+                        break
+                    item.add_sentence(sentence)
+            except Exception as e:
+                print(f"Failed to read the text stream: {e}")
+            finally:
+                item.finish()
+
+    def close(self):
+        self.cancel()
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.streams.put(None)
+        self.thread.join(timeout=2.0)
+
+
+_shared_scheduler = None
+_shared_lock = threading.Lock()
+
+def shared_scheduler(**options):
+    """
+    The process-wide PlaybackScheduler, started on first use (with `options`).
+    All speakers share it so their playback is ordered instead of overlapping.
+    """
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = PlaybackScheduler(**options)
+        return _shared_scheduler
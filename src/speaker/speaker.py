@@ -1,7 +1,8 @@
-import threading
 import time
 import pyaudio
-import pyttsx3
+
+from audiodevice import AUDIO
+from speaker.scheduler import ALERT, ANSWER, MEDIA, AudioItem, TextItem, shared_scheduler
 
 class Speaker:
     def __init__(self, chunk=1024, format=pyaudio.paInt16, channels=1, rate=44100):
@@ -10,6 +11,8 @@ class Speaker:
         
         Features:
         - Play text (TTS) and raw audio.
+        - Prioritize alerts over answers over media; a higher priority preempts
+          and the preempted playback resumes afterwards.
         - Interrupt current playback.
         """
         self.chunk = chunk
@@ -17,109 +20,87 @@ class Speaker:
         self.channels = channels
         self.rate = rate
         
-        # Initialize PyAudio for audio playback.
-        self.p = pyaudio.PyAudio()
-        
-        # Thread management.
-        self.playback_thread = None
-        self.stop_event = threading.Event()
-        self.lock = threading.Lock()
+        # Audio playback goes through the shared device and its warm output streams.
+        self.audio = AUDIO
+        self.audio.warm(self.format, self.channels, self.rate)
         
-        # Holds the current TTS engine instance (for interruption).
-        self.current_tts_engine = None
+        # All speakers share one scheduler, so their playback is ordered instead of overlapping.
+        self.scheduler = shared_scheduler(chunk=chunk, format=format)
+        # Text-to-speech runs on a long-lived worker with a warm engine.
+        self.tts = self.scheduler.tts
+        # Rendered speech for phrases that repeat (see play_text(cache=True)).
+        self.speech_cache = self.scheduler.speech_cache
 
-    def _play_audio_thread(self, audio_data):
-        """
-        Internal function to play raw audio data in small chunks.
-        Checks periodically for an interrupt signal.
-        """
-        stream = self.p.open(format=self.format,
-                             channels=self.channels,
-                             rate=self.rate,
-                             output=True)
-        # For paInt16, each frame is 2 bytes.
-        bytes_per_chunk = self.chunk * 2  
-        pos = 0
-        while pos < len(audio_data) and not self.stop_event.is_set():
-            chunk_data = audio_data[pos: pos + bytes_per_chunk]
-            stream.write(chunk_data)
-            pos += bytes_per_chunk
-        stream.stop_stream()
-        stream.close()
-
-    def _play_text_thread(self, text):
-        """
-        Internal function to convert text to speech and play it.
-        A new TTS engine is created for each call to avoid conflicts.
+    def interrupt_playback(self, priority=None):
         """
-        local_engine = pyttsx3.init()
-        local_engine.setProperty('rate', 130)  # Set speaking speed (default is usually around 200)
-        voices = local_engine.getProperty('voices')
-        for voice in voices:
-            #print(f"Voice ID: {voice.id}, Name: {voice.name}, Languages: {voice.languages}")
-            if 'zh' in voice.languages:  # Check if the voice supports Chinese
-                local_engine.setProperty('voice', voice.id)
-                break
-        self.current_tts_engine = local_engine
-        local_engine.say(text)
-        local_engine.runAndWait()
-        local_engine.stop()
-        self.current_tts_engine = None
-
-    def interrupt_playback(self):
-        """
-        Interrupt only the current audio/TTS playback without shutting down the entire system.
+        Interrupt the current and queued audio/TTS playback without shutting down the entire system.
+        A text stream being spoken is cancelled upstream as well.
+
+        Parameters:
+        - priority: Only interrupt this priority class (ALERT, ANSWER or MEDIA).
         """
-        with self.lock:
-            self.stop_event.set()
-            if self.current_tts_engine is not None:
-                self.current_tts_engine.stop()
-            if self.playback_thread is not None and self.playback_thread.is_alive():
-                self.playback_thread.join(timeout=0.1)
-            self.playback_thread = None
-
-    def play_audio(self, audio_data):
+        self.scheduler.cancel(priority)
+
+    def play_audio(self, audio_data, rate=None, channels=None, priority=ANSWER):
         """
-        Play raw audio data. Interrupts any ongoing playback.
+        Queue raw audio data for playback.
         
         Parameters:
-        - audio_data: A bytes object containing raw audio.
+        - audio_data: A bytes object (or AudioSegment) containing raw audio.
+        - rate, channels: Format of audio_data if it differs from the speaker's.
+        - priority: ALERT, ANSWER or MEDIA.
+
+        Returns:
+          PlaybackItem: Handle to wait for the playback.
         """
-        self.interrupt_playback()  # Interrupt current playback.
-        self.stop_event.clear()
-        self.playback_thread = threading.Thread(
-            target=self._play_audio_thread, args=(audio_data,), daemon=True
-        )
-        self.playback_thread.start()
-
-    def play_text(self, text):
+        return self.scheduler.submit(AudioItem(audio_data, rate or self.rate, channels or self.channels, priority))
+
+    def play_text(self, text, cache=False, priority=ANSWER):
         """
-        Convert text to speech and play it. Interrupts any ongoing playback.
+        Convert text to speech and queue it for playback.
         
         Parameters:
         - text: The string to be spoken.
+        - cache: The text is likely to be spoken again; play it from the speech
+          cache, rendering it in the background the first time.
+        - priority: ALERT, ANSWER or MEDIA.
+
+        Returns:
+          PlaybackItem: Handle to wait for the playback.
+        """
+        return self.scheduler.submit(TextItem(text, cache=cache, priority=priority))
+
+    def play_text_stream(self, deltas, fallback=None, priority=ANSWER):
+        """
+        Speak text as it arrives (e.g. a GPTStream), starting after the first
+        complete sentence. Interrupting this playback cancels the stream.
+
+        Parameters:
+        - deltas: Iterable of text fragments.
+        - fallback: Text spoken if the stream produces nothing.
+        - priority: ALERT, ANSWER or MEDIA.
+
+        Returns:
+          PlaybackItem: Handle to wait for the playback.
         """
-        print(f"Playing text: {text}")
-        self.interrupt_playback()  # Interrupt current playback.
-        self.stop_event.clear()
-        self.playback_thread = threading.Thread(
-            target=self._play_text_thread, args=(text,), daemon=True
-        )
-        self.playback_thread.start()
+        return self.scheduler.submit(TextItem(deltas=deltas, fallback=fallback, priority=priority))
 
     def stop(self):
         """
         A general stop method that interrupts playback and cleans up audio resources.
         (For systems like HomeSpeaker, use interrupt_playback() to avoid stopping the whole system.)
+        Returns once the scheduler has let go of its output stream, so the
+        audio device can be terminated safely afterwards.
         """
         self.interrupt_playback()
+        self.scheduler.wait_idle(timeout=2.0)
 
     def close(self):
         """
-        Clean up and terminate audio resources.
+        Clean up audio resources.
+        The shared audio device is left to its owner (see AUDIO.terminate()).
         """
         self.interrupt_playback()
-        self.p.terminate()
 
 
 
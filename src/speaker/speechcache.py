@@ -0,0 +1,237 @@
+import collections
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import wave
+
+from metrics import METRICS
+from speaker.tts import BACKGROUND, LIVE, shared_worker
+
+# Default on-disk tier, overridable with VOICEGPT_TTS_CACHE.
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "voicegpt", "tts")
+
+class CachedSpeech:
+    def __init__(self, pcm, rate, channels=1):
+        """
+        Rendered speech as 16-bit PCM, ready for Speaker.play_audio.
+        """
+        self.pcm = pcm
+        self.rate = rate
+        self.channels = channels
+
+    def __len__(self):
+        return len(self.pcm)
+
+    @classmethod
+    def from_wav(cls, path):
+        """
+        Load a 16-bit WAV file; returns None if it is missing or not 16-bit PCM.
+        """
+        try:
+            with wave.open(path, "rb") as wf:
+                if wf.getsampwidth() != 2:
+                    return None
+                return cls(wf.readframes(wf.getnframes()), wf.getframerate(), wf.getnchannels())
+        except (OSError, EOFError, wave.Error):
+            return None
+
+
+class SpeechCache:
+    def __init__(self, worker=None, directory=None, max_bytes=32 * 1024 * 1024,
+                 max_disk_bytes=256 * 1024 * 1024, renderer=None, voice=None, rate=None, max_prefetch=32):
+        """
+        Content-addressed cache of synthesized speech for phrases that repeat
+        (fallback answers, greetings, calendar reminders).
+        Entries are keyed by (text, voice, rate), kept in memory up to
+        `max_bytes` (least recently used evicted first) and as WAV files in
+        `directory`, which survive restarts.
+
+        Parameters:
+        - worker: TTSWorker used to render speech (default: the shared worker).
+        - directory: On-disk tier; None uses VOICEGPT_TTS_CACHE or ~/.cache/voicegpt/tts,
+          an empty string disables it.
+        - max_bytes, max_disk_bytes: Size bounds of the memory and disk tiers.
+        - renderer: Callable(text, path) -> bool writing a WAV file, instead of the worker.
+        - voice, rate: Key components when a custom renderer is used.
+        - max_prefetch: Prefetches waiting to be rendered; more are dropped.
+        """
+        self.worker = worker if worker is not None or renderer is not None else shared_worker()
+        if self.worker is not None and renderer is None:
+            # The configured voice, not the one the engine picks once it has started,
+            # so keys are the same before and after startup.
+            voice = self.worker.voice or f"language:{self.worker.language}"
+            rate = self.worker.rate
+        if directory is None:
+            directory = os.environ.get("VOICEGPT_TTS_CACHE", DEFAULT_DIRECTORY)
+        self.directory = directory or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.renderer = renderer
+        self._voice = voice
+        self._rate = rate
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        # Keys queued or being rendered by prefetch().
+        self.rendering = set()
+        self.prefetches = queue.Queue(maxsize=max_prefetch)
+        self.prefetch_thread = None
+        self.lock = threading.Lock()
+        METRICS.gauge("tts_cache_bytes", "Synthesized speech held in memory", function=lambda: self.size)
+
+    def key(self, text):
+        return hashlib.sha1(f"{self._voice}\0{self._rate}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".wav")
+
+    def get(self, text):
+        """
+        Cached speech for `text`, or None if it has not been rendered yet.
+        """
+        key = self.key(text)
+        with self.lock:
+            speech = self.entries.get(key)
+            if speech is not None:
+                self.entries.move_to_end(key)
+        if speech is not None:
+            METRICS.counter("tts_cache_total", "Speech cache lookups, by result", result="memory").inc()
+            return speech
+        if self.directory:
+            path = self._path(key)
+            speech = CachedSpeech.from_wav(path)
+            if speech is not None:
+                try:
+                    os.utime(path)  # Mark as recently used for disk eviction.
+                except OSError:
+                    pass
+                self._put(key, speech)
+                METRICS.counter("tts_cache_total", "Speech cache lookups, by result", result="disk").inc()
+                return speech
+        METRICS.counter("tts_cache_total", "Speech cache lookups, by result", result="miss").inc()
+        return None
+
+    def render(self, text, priority=LIVE):
+        """
+        Render `text` into the cache (blocking) and return it, or None on failure.
+        With priority=BACKGROUND the worker renders it only when no live speech is waiting.
+        """
+        speech = self.get(text)
+        if speech is not None:
+            return speech
+        key = self.key(text)
+        if self.directory:
+            path = self._path(key)
+        else:
+            fd, path = tempfile.mkstemp(suffix=".wav")
+            os.close(fd)
+        # Render to a temporary name so a partial file is never picked up.
+        partial = path[:-len(".wav")] + ".part.wav"
+        try:
+            if self.renderer is not None:
+                rendered = self.renderer(text, partial)
+            else:
+                rendered = self.worker.render(text, partial, priority).wait()
+            if not rendered:
+                return None
+            os.replace(partial, path)
+            speech = CachedSpeech.from_wav(path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+            if not self.directory and os.path.exists(path):
+                os.remove(path)
+        if speech is None:
+            return None
+        self._put(key, speech)
+        if self.directory:
+            self._trim_disk()
+        return speech
+
+    def prefetch(self, text):
+        """
+        Render `text` in the background so later requests hit the cache.
+        Prefetches are rendered one at a time on a single thread, and live
+        speech on the same worker goes first. Text already queued or being
+        rendered is skipped, and so is everything once `max_prefetch` are waiting.
+        """
+        key = self.key(text)
+        with self.lock:
+            if key in self.entries or key in self.rendering:
+                return
+            try:
+                self.prefetches.put_nowait((key, text))
+            except queue.Full:
+                METRICS.counter("tts_prefetch_dropped_total", "Speech prefetches dropped, queue full").inc()
+                return
+            self.rendering.add(key)
+            if self.prefetch_thread is None:
+                self.prefetch_thread = threading.Thread(target=self._run_prefetches, daemon=True,
+                                                        name="speech-prefetch")
+                self.prefetch_thread.start()
+
+    def _run_prefetches(self):
+        while True:
+            key, text = self.prefetches.get()
+            try:
+                self.render(text, BACKGROUND)
+            except Exception as e:
+                print(f"Failed to prefetch speech: {e}")
+            finally:
+                with self.lock:
+                    self.rendering.discard(key)
+
+    def _put(self, key, speech):
+        if len(speech) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = speech
+            self.size += len(speech)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def _trim_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".wav"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def shared_cache():
+    """
+    The process-wide SpeechCache, created on first use.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = SpeechCache()
+        return _shared_cache
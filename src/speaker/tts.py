@@ -0,0 +1,210 @@
+import itertools
+import queue
+import threading
+import time
+import pyttsx3
+
+from metrics import METRICS
+
+# Request priorities: live speech goes before background renders (e.g. cache prefetches).
+LIVE = 0
+BACKGROUND = 1
+
+class TTSRequest:
+    def __init__(self, text, path=None, priority=LIVE):
+        """
+        One piece of text queued on a TTSWorker, spoken or (with `path`)
+        rendered to an audio file. wait() blocks until it is done or cancelled.
+        """
+        self.text = text
+        self.path = path
+        self.priority = priority
+        self.requested = time.perf_counter()
+        self.cancelled = False
+        # Set when a live request interrupts this background one; it is run again later.
+        self.preempted = False
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Returns:
+          bool: True if the text was spoken to the end.
+        """
+        self.done.wait(timeout)
+        return self.done.is_set() and not self.cancelled
+
+
+class TTSWorker:
+    def __init__(self, rate=130, language='zh', voice=None, engine_factory=None):
+        """
+        Long-lived text-to-speech thread owning a single engine.
+        The engine is initialized and the voice chosen once, then each say()
+        only queues the text, so speech starts without the engine setup cost.
+        Background requests wait for live ones, and a live request interrupts
+        a background render, which is restarted afterwards.
+
+        Parameters:
+        - rate: Speaking speed (default for pyttsx3 is usually around 200).
+        - language: Prefer the first voice supporting this language.
+        - voice: Voice id to use instead of searching by language.
+        - engine_factory: Callable returning a pyttsx3-compatible engine (default pyttsx3.init).
+        """
+        self.rate = rate
+        self.language = language
+        # The configured voice; the one chosen by language is engine_voice.
+        self.voice = voice
+        self.engine_voice = voice
+        self.engine_factory = engine_factory or pyttsx3.init
+        self.engine = None
+        self.current = None
+        self.requests = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _init_engine(self):
+        engine = self.engine_factory()
+        engine.setProperty('rate', self.rate)
+        if self.engine_voice is None:
+            for voice in engine.getProperty('voices'):
+                if self.language in voice.languages:
+                    self.engine_voice = voice.id
+                    break
+        if self.engine_voice is not None:
+            engine.setProperty('voice', self.engine_voice)
+        start_latency = METRICS.histogram("tts_start_seconds", "Time from a TTS request to speech starting")
+
+        def on_start(name):
+            current = self.current
+            if current is not None:
+                start_latency.observe(time.perf_counter() - current.requested)
+
+        engine.connect('started-utterance', on_start)
+        return engine
+
+    def _run(self):
+        try:
+            with METRICS.timer("tts_init_seconds", "Text-to-speech engine initialization time"):
+                self.engine = self._init_engine()
+        except Exception as e:
+            print(f"Failed to initialize the TTS engine: {e}")
+        self.ready.set()
+        while True:
+            _, _, request = self.requests.get()
+            if request is None:
+                break
+            with self.lock:
+                if request.cancelled or self.engine is None:
+                    request.cancelled = True
+                    request.done.set()
+                    continue
+                self.current = request
+            try:
+                if request.path is not None:
+                    self.engine.save_to_file(request.text, request.path)
+                else:
+                    self.engine.say(request.text)
+                if not request.cancelled:
+                    if request.path is not None:
+                        timer = METRICS.timer("tts_render_seconds", "Text-to-speech rendering time")
+                    else:
+                        timer = METRICS.timer("tts_seconds", "Text-to-speech playback time")
+                    with timer:
+                        self.engine.runAndWait()
+            except Exception as e:
+                print(f"TTS failed for {request.text!r}: {e}")
+                request.cancelled = True
+            with self.lock:
+                self.current = None
+                if request.preempted and not request.cancelled:
+                    request.preempted = False
+                    self._put(request)
+                    continue
+            request.done.set()
+
+    def _put(self, request):
+        self.requests.put((request.priority, next(self.sequence), request))
+
+    def _submit(self, request):
+        with self.lock:
+            self._put(request)
+            current = self.current
+            if (request.priority == LIVE and current is not None and current.priority != LIVE
+                    and not current.cancelled and self.engine is not None):
+                # Live speech should not wait for a background render to finish.
+                current.preempted = True
+                self.engine.stop()
+        return request
+
+    def say(self, text):
+        """
+        Queue text to be spoken after any earlier requests.
+
+        Returns:
+          TTSRequest: Handle to wait for or cancel the request.
+        """
+        return self._submit(TTSRequest(text))
+
+    def render(self, text, path, priority=LIVE):
+        """
+        Queue text to be rendered to the audio file `path` instead of spoken;
+        priority=BACKGROUND lets live requests go first.
+
+        Returns:
+          TTSRequest: Handle to wait for or cancel the request.
+        """
+        return self._submit(TTSRequest(text, path, priority))
+
+    def speak(self, text, timeout=None):
+        """
+        Speak text and block until it has been spoken or cancelled.
+        """
+        return self.say(text).wait(timeout)
+
+    def cancel(self, request=None):
+        """
+        Cancel one request, or the current and all queued ones.
+        Speech in progress is stopped; the engine is kept for the next request.
+        """
+        with self.lock:
+            if request is None:
+                while True:
+                    try:
+                        entry = self.requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    pending = entry[2]
+                    if pending is None:
+                        # Keep a pending close() request.
+                        self.requests.put(entry)
+                        break
+                    pending.cancelled = True
+                    pending.done.set()
+                request = self.current
+            if request is None:
+                return
+            request.cancelled = True
+            if request is self.current and self.engine is not None:
+                self.engine.stop()
+
+    def close(self, timeout=2.0):
+        self.cancel()
+        self.requests.put((LIVE, next(self.sequence), None))
+        self.thread.join(timeout)
+
+
+_shared_worker = None
+_shared_lock = threading.Lock()
+
+def shared_worker():
+    """
+    The process-wide TTSWorker, started on first use.
+    pyttsx3 keeps one engine per driver, so all speakers go through one worker.
+    """
+    global _shared_worker
+    with _shared_lock:
+        if _shared_worker is None:
+            _shared_worker = TTSWorker()
+        return _shared_worker
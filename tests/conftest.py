@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live in src/ and import each other from there (as src/bench does).
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
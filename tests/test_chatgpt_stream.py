@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+
+from service.chatgpt import AsyncGPTStream
+
+
+class FakeResponse:
+    """
+    Async stream of chat completion chunks; waits forever after `deltas`.
+    """
+    def __init__(self, deltas):
+        self.deltas = list(deltas)
+        self.closed = threading.Event()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.deltas:
+            delta = self.deltas.pop(0)
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+        await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed.set()
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    if loop.is_running():
+        loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=1)
+    loop.close()
+
+
+def test_stalled_stream_ends_after_read_timeout(loop):
+    response = FakeResponse(["Hello."])
+    stream = AsyncGPTStream(response, loop, read_timeout=0.2)
+    started = time.monotonic()
+    assert list(stream) == ["Hello."]
+    assert time.monotonic() - started < 1
+    assert response.closed.wait(1)
+
+
+def test_cancel_closes_the_response_on_a_running_loop(loop):
+    response = FakeResponse([])
+    stream = AsyncGPTStream(response, loop)
+    stream.cancel()
+    assert response.closed.wait(1)
+    assert list(stream) == []
+
+
+def test_stopped_loop_does_not_block(loop):
+    loop.call_soon_threadsafe(loop.stop)
+    while loop.is_running():
+        time.sleep(0.01)
+    stream = AsyncGPTStream(FakeResponse(["Hello."]), loop)
+    stream.cancel()
+    assert list(stream) == []
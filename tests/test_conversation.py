@@ -0,0 +1,23 @@
+import pytest
+
+from service import conversation
+from service.conversation import count_tokens, estimate_tokens
+
+
+def test_estimate_counts_english_by_characters():
+    assert estimate_tokens("hello world, this is english") == 7
+
+
+@pytest.mark.parametrize("text", ["你好世界，今天天气很好。", "Привет, как дела?"])
+def test_estimate_does_not_undercount_other_scripts(text):
+    # Tokenizers use at most about one token per character of these scripts.
+    assert estimate_tokens(text) >= len(text.replace(" ", "")) - 2
+
+
+def test_fallback_is_reported_once(monkeypatch, capsys):
+    monkeypatch.setattr(conversation, "tiktoken", None)
+    monkeypatch.setattr(conversation, "_encodings", {})
+    monkeypatch.setattr(conversation, "_warned", False)
+    assert count_tokens("abcdefgh", "model-a") == 2
+    assert count_tokens("abcdefgh", "model-b") == 2
+    assert capsys.readouterr().out.count("token counts are estimated") == 1
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pyaudio")
+pytest.importorskip("openai")
+
+from homespeaker import HomeSpeaker
+
+
+class Media:
+    def __init__(self, playing):
+        self.playing = playing
+
+
+class Commands:
+    """
+    Just the state classify_intent() reads.
+    """
+    wake_words = ["hey gpt", "wake up", "hello"]
+    classify_intent = HomeSpeaker.classify_intent
+
+    handle_command = HomeSpeaker.handle_command
+    _count_command = HomeSpeaker._count_command
+    command_timeouts = {"gpt": 1.0}
+
+    def __init__(self, playing):
+        self.yt = Media(playing)
+        self.spoken = []
+
+    def play_text(self, text, cache=False):
+        self.spoken.append(text)
+
+    async def ask_gpt(self, question):
+        raise RuntimeError("API unavailable")
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("pause", "pause"),
+    ("pause the video", "pause"),
+    ("hey gpt, pause", "pause"),
+    ("resume", "resume"),
+    ("resume playing", "resume"),
+    ("how do i write a good resume", "gpt"),
+    ("what does pause mean in music", "gpt"),
+    ("paused time is what", "gpt"),
+    ("play jazz", "play"),
+    ("stop", "stop"),
+])
+def test_intents_while_a_video_plays(text, intent):
+    assert Commands(playing=True).classify_intent(text) == intent
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("pause", "gpt"),
+    ("resume", "gpt"),
+    ("how do i write a good resume", "gpt"),
+    ("play jazz", "play"),
+])
+def test_media_commands_need_a_video(text, intent):
+    assert Commands(playing=False).classify_intent(text) == intent
+
+
+def test_failed_command_speaks_a_fallback():
+    commands = Commands(playing=False)
+    asyncio.run(commands.handle_command("what is the capital of france"))
+    assert commands.spoken == ["sorry, something went wrong"]
@@ -0,0 +1,104 @@
+import wave
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyaudio")
+
+from mic.microphone import Microphone
+from mic.source import ArraySource, WavFileSource
+
+RATE = 16000
+CHUNK = 512
+PREROLL = 0.3
+
+
+def speech(seconds, fade_in=0.0, amplitude=8000, frequency=440):
+    """
+    A tone standing in for speech, optionally fading in like a quiet first syllable.
+    """
+    t = np.arange(int(seconds * RATE)) / RATE
+    envelope = np.ones_like(t)
+    if fade_in:
+        ramp = t < fade_in
+        envelope[ramp] = t[ramp] / fade_in
+    return amplitude * envelope * np.sin(2 * np.pi * frequency * t)
+
+
+def recording(parts, seed=0):
+    """
+    Low background noise with speech at known onsets.
+
+    Returns:
+      (samples, onsets): int16 samples and the onset (seconds) of each part.
+    """
+    length = max(onset + len(part) / RATE for onset, part in parts) + 1.5
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 20, int(length * RATE))
+    for onset, part in parts:
+        start = int(onset * RATE)
+        samples[start:start + len(part)] += part
+    return np.clip(samples, -32768, 32767).astype(np.int16), [onset for onset, _ in parts]
+
+
+def segments(source, count):
+    mic = Microphone(chunk=CHUNK, rate=RATE, silence_duration=0.5, preroll=PREROLL, source=source)
+    try:
+        utterances = []
+        for _ in range(count):
+            utterance = mic.get_audio(timeout=10)
+            assert utterance is not None
+            samples = np.frombuffer(bytes(utterance.audio), dtype=np.int16)
+            utterances.append((utterance.start_time, utterance.end_time, samples))
+        assert mic.get_audio(timeout=0.5) is None
+        return utterances
+    finally:
+        mic.stop()
+
+
+def write_wav(path, samples):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+
+
+@pytest.fixture(params=["array", "wav"])
+def make_source(request, tmp_path):
+    def make(samples):
+        if request.param == "array":
+            return ArraySource(samples, RATE, chunk=CHUNK)
+        path = tmp_path / "fixture.wav"
+        write_wav(path, samples)
+        return WavFileSource(str(path), chunk=CHUNK)
+    return make
+
+
+def test_segments_start_preroll_before_onset(make_source):
+    samples, onsets = recording([(1.0, speech(0.8)), (3.05, speech(0.6))])
+    utterances = segments(make_source(samples), len(onsets))
+    for onset, (start, end, audio) in zip(onsets, utterances):
+        assert start <= onset - PREROLL
+        # Nothing but pre-roll ahead of the onset: at most a chunk more than asked for.
+        assert onset - start <= PREROLL + CHUNK / RATE + 1e-9
+        assert end >= onset + 0.6
+
+
+def test_no_leading_audio_clipped(make_source):
+    # The quiet start of the fade-in is below the speech threshold.
+    part = speech(0.8, fade_in=0.2)
+    samples, (onset,) = recording([(1.2, part)])
+    ((start, _, audio),) = segments(make_source(samples), 1)
+    # Speech is only detected partway into the fade-in; the pre-roll still covers its start.
+    assert start < onset
+    offset = int(round((onset - start) * RATE))
+    original = samples[int(onset * RATE):int(onset * RATE) + len(part)]
+    np.testing.assert_array_equal(audio[offset:offset + len(part)], original)
+
+
+def test_preroll_clamped_at_stream_start(make_source):
+    samples, (onset,) = recording([(0.1, speech(0.5))])
+    ((start, _, audio),) = segments(make_source(samples), 1)
+    assert start == 0.0
+    np.testing.assert_array_equal(audio[:int(0.6 * RATE)], samples[:int(0.6 * RATE)])
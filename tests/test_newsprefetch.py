@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+from service.newsprefetch import NewsPrefetcher
+
+
+class StubNews:
+    def __init__(self):
+        self.queries = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_news(self, query, refresh=False):
+        self.queries.append(query)
+        self.release.wait(5)
+        return f"Summary of {query}"
+
+
+@pytest.fixture
+def prefetcher():
+    prefetcher = NewsPrefetcher(StubNews(), topics=["technology", "world cup"])
+    yield prefetcher
+    prefetcher.stop()
+
+
+def test_specific_query_misses_when_only_a_generic_one_is_stored(prefetcher):
+    prefetcher.remember("news", "Generic headlines")
+    assert prefetcher.lookup("news about bitcoin") is None
+    assert prefetcher.lookup("what is the news about the election") is None
+    assert prefetcher.lookup("News?") == "Generic headlines"
+
+
+def test_remembered_queries_match_exactly(prefetcher):
+    prefetcher.remember("news about bitcoin", "Bitcoin headlines")
+    assert prefetcher.lookup("News about Bitcoin") == "Bitcoin headlines"
+    assert prefetcher.lookup("news about bitcoin etfs") is None
+
+
+def test_configured_topics_match_as_keywords(prefetcher):
+    for topic in ("technology", "world cup"):
+        prefetcher.refresh(topic).result(timeout=5)
+    assert prefetcher.lookup("what is the news about technology") == "Summary of technology"
+    assert prefetcher.lookup("latest world cup news") == "Summary of world cup"
+    assert prefetcher.lookup("news about biotechnology") is None
+
+
+def test_stale_summaries_miss(prefetcher):
+    prefetcher.max_age = -1
+    prefetcher.remember("news", "Generic headlines")
+    assert prefetcher.lookup("news") is None
+
+
+def test_on_demand_fetch_joins_a_refresh_in_flight(prefetcher):
+    prefetcher.news.release.clear()
+    refresh = prefetcher.refresh("bitcoin")
+    results = []
+    fetch = threading.Thread(target=lambda: results.append(prefetcher.fetch("Bitcoin!")))
+    fetch.start()
+    assert prefetcher.refresh("bitcoin") is refresh
+    prefetcher.news.release.set()
+    fetch.join(5)
+    assert results == ["Summary of bitcoin"]
+    assert refresh.result(timeout=5) == "Summary of bitcoin"
+    assert prefetcher.news.queries == ["bitcoin"]
+    assert prefetcher.lookup("bitcoin") == "Summary of bitcoin"
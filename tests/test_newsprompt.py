@@ -0,0 +1,20 @@
+import pytest
+
+from service import conversation
+from service.conversation import count_tokens
+from service.newsprompt import build_news_prompt
+
+ARTICLES = [
+    {"title": "Акции технологических компаний выросли", "description": "Рынки закрылись на рекордном уровне после отчётов."},
+    {"title": "全球气候峰会在巴黎开幕", "description": "各国领导人讨论减排目标和资金安排。"},
+    {"title": "Markets rally on tech earnings", "description": "Stocks closed at a record high after strong reports."},
+] * 5
+
+
+@pytest.mark.parametrize("budget", [40, 120, 400])
+def test_prompt_fits_the_budget_without_tiktoken(monkeypatch, budget):
+    monkeypatch.setattr(conversation, "tiktoken", None)
+    monkeypatch.setattr(conversation, "_encodings", {})
+    prompt = build_news_prompt([dict(article, title=f"{article['title']} {i}") for i, article in enumerate(ARTICLES)],
+                               token_budget=budget)
+    assert count_tokens(prompt) <= budget
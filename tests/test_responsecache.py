@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from service.responsecache import ResponseCache
+
+# Similar text, different questions: must never share an answer.
+DIFFERENT = [
+    ("what is 2 plus 3", "what is 2 plus 4"),
+    ("what is 15 times 12", "what is 15 times 13"),
+    ("what is 2 minus 3", "what is 3 minus 2"),
+    ("what is the capital of austria", "what is the capital of australia"),
+    ("spell the word cat", "spell the word bat"),
+]
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(path="")
+
+
+@pytest.fixture
+def fuzzy_cache():
+    return ResponseCache(path="", fuzzy=True)
+
+
+def test_exact_and_normalized_hits(cache):
+    cache.put("What's the capital of France?", "Paris.")
+    assert cache.get("What's the capital of France?") == "Paris."
+    assert cache.get("whats the capital of france") == "Paris."
+    assert cache.stats["exact"] == 1
+    assert cache.stats["normalized"] == 1
+
+
+def test_fuzzy_matching_is_off_by_default(cache):
+    cache.put("what is the capital of france", "Paris.")
+    assert cache.get("tell me what is the capital of france please") is None
+
+
+@pytest.mark.parametrize("cached, asked", DIFFERENT)
+def test_no_match_when_content_differs(cache, fuzzy_cache, cached, asked):
+    for c in (cache, fuzzy_cache):
+        c.put(cached, f"Answer to {cached}")
+        assert c.get(asked) is None
+
+
+def test_fuzzy_match_ignores_filler_words(fuzzy_cache):
+    fuzzy_cache.put("what is the capital of france", "Paris.")
+    assert fuzzy_cache.get("tell me what is the capital of france please") == "Paris."
+    assert fuzzy_cache.stats["fuzzy"] == 1
+
+
+def test_namespaces_are_separate(fuzzy_cache):
+    fuzzy_cache.put("what is the capital of france", "Paris.", namespace="a")
+    assert fuzzy_cache.get("what is the capital of france", namespace="b") is None
+
+
+def test_expired_entries_miss(cache):
+    cache.put("what is the capital of france", "Paris.", ttl=-1)
+    assert cache.get("what is the capital of france") is None
+
+
+@pytest.mark.parametrize("question", ["what day is it", "what time is it", "how many days until christmas",
+                                      "what's the weather tomorrow"])
+def test_volatile_questions_are_not_cached(cache, question):
+    cache.put(question, "Stale answer.")
+    assert cache.get(question) is None
+    assert not cache.entries
+
+
+def test_saves_are_batched_off_the_caller(tmp_path):
+    path = str(tmp_path / "responses.json")
+    cache = ResponseCache(path=path, save_delay=60)
+    cache.put("what is the capital of france", "Paris.")
+    cache.put("what is the capital of italy", "Rome.")
+    assert not os.path.exists(path)
+    cache.flush()
+    assert ResponseCache(path=path).get("what is the capital of italy") == "Rome."
+    assert cache.save_timer is None
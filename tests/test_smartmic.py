@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyaudio")
+
+from mic.smartmic import SmartMic
+from mic.source import ArraySource
+
+RATE = 16000
+CHUNK = 512
+
+
+class NeverSpotter:
+    """
+    Keyword spotter that never hears its wake-up word.
+    """
+    def __init__(self):
+        self.chunks = 0
+
+    def process(self, samples):
+        self.chunks += 1
+        return None
+
+    def reset(self):
+        pass
+
+
+def test_noise_floor_is_learned_while_waiting_for_the_wake_word():
+    noise = np.random.default_rng(0).normal(0, 200, 2 * RATE).astype(np.int16)
+    source = ArraySource(noise, RATE, chunk=CHUNK, tail_silence=0)
+    spotter = NeverSpotter()
+    mic = SmartMic(chunk=CHUNK, rate=RATE, keyword_spotter=spotter, recognizer_backend="stub", source=source)
+    try:
+        assert source.finished.wait(10)
+        for _ in range(100):
+            if spotter.chunks >= len(noise) // CHUNK:
+                break
+            source.finished.wait(0.05)
+        # Mean absolute amplitude of the noise is about 0.8 x its standard deviation.
+        assert mic.vad.floor == pytest.approx(160, rel=0.25)
+    finally:
+        mic.stop()
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+from service.smartnews import SmartNews
+
+
+class OfflineNews(SmartNews):
+    """
+    SmartNews with NewsAPI and GPT replaced by canned answers.
+    """
+    def __init__(self, **kwargs):
+        super().__init__("key", "key", cache=False, **kwargs)
+        self.summarized = []
+
+    def search_latest_news(self, query, pageSize=5, refresh=False):
+        return [{"title": f"Headline about {query}", "description": f"Story on {query}."}]
+
+    def ask(self, question, *args, **kwargs):
+        self.summarized.append(question)
+        return f"Summary {len(self.summarized)}"
+
+
+def test_summary_reused_for_the_same_normalized_topic():
+    news = OfflineNews()
+    assert news.get_news("latest news about tesla") == "Summary 1"
+    assert news.get_news("Latest news about Tesla?") == "Summary 1"
+    assert len(news.summarized) == 1
+
+
+def test_similar_topic_is_summarized_again():
+    news = OfflineNews()
+    news.get_news("latest news about tesla")
+    assert news.get_news("latest news about texas") == "Summary 2"
+    assert "texas" in news.summarized[-1]
+
+
+def test_refresh_and_expiry():
+    news = OfflineNews(ttl=-1)
+    news.get_news("tesla")
+    assert news.get_news("tesla") == "Summary 2"
+    fresh = OfflineNews()
+    fresh.get_news("tesla")
+    assert fresh.get_news("tesla", refresh=True) == "Summary 2"
@@ -0,0 +1,62 @@
+import threading
+import wave
+
+import pytest
+
+pytest.importorskip("pyttsx3")
+
+from speaker.speechcache import SpeechCache
+
+
+class Renderer:
+    """
+    Writes a short silent WAV once `release` is set.
+    """
+    def __init__(self):
+        self.release = threading.Event()
+        self.texts = []
+
+    def __call__(self, text, path):
+        self.release.wait(5)
+        self.texts.append(text)
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(b"\0\0" * 160)
+        return True
+
+
+def wait_rendered(cache):
+    for _ in range(500):
+        with cache.lock:
+            if not cache.rendering:
+                return
+        threading.Event().wait(0.01)
+    raise AssertionError("prefetches did not finish")
+
+
+def test_prefetch_renders_each_text_once_on_one_thread():
+    renderer = Renderer()
+    cache = SpeechCache(directory="", renderer=renderer)
+    threads = threading.active_count()
+    for _ in range(3):
+        cache.prefetch("hello")
+        cache.prefetch("goodbye")
+    assert threading.active_count() == threads + 1
+    renderer.release.set()
+    wait_rendered(cache)
+    assert sorted(renderer.texts) == ["goodbye", "hello"]
+    assert cache.get("hello") is not None
+
+
+def test_prefetch_queue_is_bounded():
+    renderer = Renderer()
+    cache = SpeechCache(directory="", renderer=renderer, max_prefetch=2)
+    for i in range(10):
+        cache.prefetch(f"phrase {i}")
+    # One being rendered, two waiting.
+    assert len(cache.rendering) <= 3
+    renderer.release.set()
+    wait_rendered(cache)
+    assert len(renderer.texts) <= 3
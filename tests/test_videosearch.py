@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from service.videosearch import RecordedExtractor, YouTubeSearch
+
+RESPONSES = {
+    "ytsearch1:lofi beats": {"entries": [{"id": "lofi1", "title": "Lofi beats"}]},
+    "ytsearch1:jazz": {"entries": [{"id": "jazz1", "title": "Jazz"}]},
+    "ytsearch1:rock": {"entries": [{"id": "rock1", "title": "Rock"}]},
+    "ytsearch1:nothing": {"entries": []},
+}
+
+
+def make_search(delay=0.0, **options):
+    extractor = RecordedExtractor(RESPONSES, delay=delay)
+    return YouTubeSearch(lambda: extractor, **options), extractor
+
+
+@pytest.fixture
+def search():
+    search, extractor = make_search()
+    yield search, extractor
+    search.close()
+
+
+def test_cache_hit_on_normalized_query(search):
+    search, extractor = search
+    assert search.find("lofi beats").id == "lofi1"
+    video = search.find("Lofi Beats!")
+    assert video.id == "lofi1"
+    assert video.url == "https://www.youtube.com/watch?v=lofi1"
+    assert extractor.calls == ["ytsearch1:lofi beats"]
+
+
+def test_nothing_found(search):
+    search, _ = search
+    assert search.find("nothing") is None
+
+
+def test_least_recently_used_result_is_evicted():
+    search, extractor = make_search(max_entries=2)
+    try:
+        search.find("lofi beats")
+        search.find("jazz")
+        search.find("lofi beats")  # Now jazz is the least recently used.
+        search.find("rock")
+        extractor.calls.clear()
+        search.find("lofi beats")
+        search.find("jazz")
+        assert extractor.calls == ["ytsearch1:jazz"]
+    finally:
+        search.close()
+
+
+def test_results_expire():
+    search, extractor = make_search(ttl=0.05)
+    try:
+        search.find("jazz")
+        search.find("jazz")
+        assert len(extractor.calls) == 1
+        time.sleep(0.1)
+        search.find("jazz")
+        assert len(extractor.calls) == 2
+    finally:
+        search.close()
+
+
+def test_cancel_in_flight_lookup_returns_none_without_blocking():
+    search, _ = make_search(delay=1.0)
+    try:
+        search.warm().result(timeout=5)
+        threading.Timer(0.1, search.cancel_all).start()
+        started = time.perf_counter()
+        assert search.find("jazz") is None
+        # The command thread is released on cancel, not when the extraction finishes.
+        assert time.perf_counter() - started < 0.5
+        assert not search.pending
+    finally:
+        search.close()
+
+
+def test_search_does_not_block_the_calling_thread():
+    search, _ = make_search(delay=0.3)
+    try:
+        started = time.perf_counter()
+        future = search.search("rock")
+        assert time.perf_counter() - started < 0.1
+        assert future.result(timeout=5).id == "rock1"
+    finally:
+        search.close()
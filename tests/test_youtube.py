@@ -0,0 +1,104 @@
+import pytest
+
+from service.media import MediaBackend, MpvBackend
+from service.videosearch import RecordedExtractor, YouTubeSearch
+from service.youtube import YouTube
+
+RESPONSES = {
+    "ytsearch1:jazz": {"entries": [{"id": "jazz1", "title": "Jazz"}]},
+    "https://www.youtube.com/watch?v=jazz1": {"url": "https://stream.example/jazz1"},
+    "ytsearch1:rock": {"entries": [{"id": "rock1", "title": "Rock"}]},
+    "https://www.youtube.com/watch?v=rock1": {"requested_formats": [
+        {"url": "https://stream.example/rock1.video"}, {"url": "https://stream.example/rock1.audio"}]},
+}
+
+
+class Player(MediaBackend):
+    name = "player"
+
+    def __init__(self):
+        self.listeners = []
+        self.loading = False
+        self.played = []
+
+    def add_end_listener(self, listener):
+        self.listeners.append(listener)
+
+    def play(self, url, title=None, audio_url=None):
+        self.played.append((url, audio_url))
+        return True
+
+    def end(self, error=None):
+        for listener in self.listeners:
+            listener(error)
+
+
+class Browser(MediaBackend):
+    name = "browser"
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, url, title=None, audio_url=None):
+        self.played.append(url)
+        return True
+
+
+@pytest.fixture
+def yt():
+    extractor = RecordedExtractor(RESPONSES)
+    yt = YouTube(YouTubeSearch(lambda: extractor), Player(), Browser())
+    yield yt
+    yt.close()
+
+
+def test_playing_ends_with_the_video(yt):
+    yt.play_video("jazz")
+    assert yt.playing
+    assert yt.player.played == [("https://stream.example/jazz1", None)]
+    yt.player.end()
+    assert not yt.playing
+
+
+def test_idle_while_loading_is_not_the_end(yt):
+    yt.play_video("jazz")
+    yt.player.loading = True
+    yt.player.end()
+    assert yt.playing
+
+
+def test_load_error_falls_back_to_the_browser(yt):
+    yt.play_video("jazz")
+    yt.player.end("loading failed")
+    assert yt.backend is yt.browser
+    assert yt.browser.played == ["https://www.youtube.com/watch?v=jazz1"]
+    # The idle event that follows the error leaves the browser alone.
+    yt.player.end()
+    assert yt.playing
+
+
+def test_mpv_events():
+    mpv = MpvBackend(path="mpv")
+    ended = []
+    mpv.add_end_listener(ended.append)
+    mpv.loading = True
+    mpv._on_event({"event": "property-change", "name": "idle-active", "data": True})
+    assert ended == []
+    mpv._on_event({"event": "start-file"})
+    mpv._on_event({"event": "end-file", "reason": "error", "file_error": "loading failed"})
+    mpv._on_event({"event": "property-change", "name": "idle-active", "data": True})
+    assert ended == ["loading failed", None]
+    mpv._on_event({"event": "end-file", "reason": "stop"})
+    mpv._on_event({"event": "property-change", "name": "idle-active", "data": False})
+    assert ended == ["loading failed", None]
+
+
+def test_separate_streams_go_to_the_player_together(yt):
+    yt.play_video("rock")
+    assert yt.player.played == [("https://stream.example/rock1.video", "https://stream.example/rock1.audio")]
+
+
+def test_mpv_merges_separate_streams():
+    assert MpvBackend._merged("https://v", None) == "https://v"
+    assert MpvBackend._merged("https://v", "https://a") == \
+        "edl://!no_clip;!no_chapters;%9%https://v;!new_stream;!no_clip;!no_chapters;%9%https://a;"